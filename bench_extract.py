@@ -0,0 +1,333 @@
+"""
+Benchmark ของ pdf_reader.extract_text_by_page บน PDF สังเคราะห์ (สร้างด้วย PyMuPDF ไม่ต้องใช้ไฟล์ลูกค้า)
+
+    python bench_extract.py --out bench.json
+    python bench_extract.py --out new.json --compare bench.json
+    python bench_extract.py --cases text_only,dieline --workers 4
+
+แต่ละเคสรันใน process ใหม่ (peak RSS วัดแยกกันได้) และรายงาน:
+หน้า/วินาที, จำนวนการเรียก OCR ต่อหน้า, peak RSS (MB), recall เทียบ ground truth, เวลาต่อขั้นตอน
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+
+A4 = (595.0, 842.0)
+A0 = (2384.0, 3370.0)
+
+WARNING_LABEL = [
+    "WARNING:",
+    "CHOKING HAZARD - Small parts.",
+    "Not for children under 3 yrs.",
+]
+
+BODY_LINES = [
+    "Made in China",
+    "Keep this information for future reference.",
+    "Contents may vary from pictures.",
+    "Please remove all packaging before giving to a child.",
+    "Distributed by Example Toys Ltd, 1 Sample Road, London",
+    "Colours and details may vary.",
+    "Adult assembly required.",
+    "Batteries not included.",
+]
+
+
+# ---------- ตัวช่วยสร้างหน้า ----------
+
+def _insert_lines(page, lines, x, y, size, leading=1.5, fontname="helv"):
+    for t in lines:
+        page.insert_text((x, y), t, fontsize=size, fontname=fontname)
+        y += size * leading
+    return y
+
+def _label_pixmap(lines, size=14, dpi=200):
+    """ป้ายข้อความเป็นภาพ (เหมือนป้ายคำเตือนที่วางเป็น bitmap)"""
+    tmp = fitz.open()
+    w = max(len(t) for t in lines) * size * 0.55 + 20
+    h = len(lines) * size * 1.5 + 16
+    p = tmp.new_page(width=w, height=h)
+    p.draw_rect(p.rect, color=(0, 0, 0), width=1.5)
+    _insert_lines(p, lines, 10, 8 + size, size, fontname="hebo")
+    pix = p.get_pixmap(dpi=dpi, alpha=False)
+    tmp.close()
+    return pix, w, h
+
+def _place_outlined(page, lines, x, y, size):
+    """วางข้อความที่แปลงเป็น outline (path) ผ่าน SVG text_as_path → PDF"""
+    tmp = fitz.open()
+    w = max(len(t) for t in lines) * size * 0.6 + 10
+    h = len(lines) * size * 1.5 + 10
+    p = tmp.new_page(width=w, height=h)
+    _insert_lines(p, lines, 4, 4 + size, size)
+    svg = p.get_svg_image(text_as_path=True)
+    tmp.close()
+    src = fitz.open(stream=svg.encode("utf-8"), filetype="svg")
+    pdf = fitz.open("pdf", src.convert_to_pdf())
+    page.show_pdf_page(fitz.Rect(x, y, x + w, y + h), pdf, 0)
+    src.close()
+    pdf.close()
+
+def _draw_plus(page, cx, cy, arm, width=1.2):
+    page.draw_line((cx - arm, cy), (cx + arm, cy), color=(0, 0, 0), width=width)
+    page.draw_line((cx, cy - arm), (cx, cy + arm), color=(0, 0, 0), width=width)
+
+
+# ---------- ชนิดหน้า: คืน ground truth [{"page", "text", "underline"?}] ----------
+
+def _page_text_only(doc, n):
+    truth = []
+    for i in range(n):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        _insert_lines(page, ["PART NO. ABC12", "Rev A1"], 40, 50, 14, fontname="hebo")
+        _insert_lines(page, BODY_LINES, 40, 110, 9)
+        truth += [{"page": page.number + 1, "text": t} for t in ["ABC12"] + BODY_LINES]
+    return truth
+
+def _page_raster_label(doc, n):
+    truth = []
+    pix, w, h = _label_pixmap(WARNING_LABEL)
+    for i in range(n):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        _insert_lines(page, BODY_LINES, 40, 60, 9)
+        page.insert_image(fitz.Rect(60, 400, 60 + w, 400 + h), pixmap=pix)
+        truth += [{"page": page.number + 1, "text": t} for t in BODY_LINES + WARNING_LABEL[1:]]
+    return truth
+
+def _page_outlined(doc, n):
+    truth = []
+    for i in range(n):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        _place_outlined(page, WARNING_LABEL, 50, 80, 12)
+        _place_outlined(page, BODY_LINES[:3], 50, 300, 8)
+        truth += [{"page": page.number + 1, "text": t} for t in WARNING_LABEL[1:] + BODY_LINES[:3]]
+    return truth
+
+def _page_vector_3plus(doc, n):
+    truth = []
+    for i in range(n):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        _insert_lines(page, BODY_LINES[:4], 40, 60, 9)
+        page.insert_text((100, 300), "3", fontsize=24, fontname="hebo")
+        _draw_plus(page, 100 + 24 * 0.6 + 8, 300 - 24 * 0.35, 6)
+        truth += [{"page": page.number + 1, "text": "3+"}]
+    return truth
+
+def _page_underlined(doc, n):
+    truth = []
+    for i in range(n):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        y = 80
+        for t in BODY_LINES[:4]:
+            page.insert_text((40, y), t, fontsize=10, fontname="helv")
+            tw = fitz.get_text_length(t, fontname="helv", fontsize=10)
+            page.draw_line((40, y + 2), (40 + tw, y + 2), color=(0, 0, 0), width=0.6)
+            truth.append({"page": page.number + 1, "text": t, "underline": True})
+            y += 20
+        _insert_lines(page, BODY_LINES[4:], 40, y + 20, 10)
+        truth += [{"page": page.number + 1, "text": t} for t in BODY_LINES[4:]]
+    return truth
+
+def _page_dieline(doc, n):
+    truth = []
+    pix, w, h = _label_pixmap(WARNING_LABEL, size=18)
+    for i in range(n):
+        page = doc.new_page(width=A0[0], height=A0[1])
+        # เส้นพับ/ตัดของ dieline
+        for k in range(1, 4):
+            page.draw_line((k * A0[0] / 4, 0), (k * A0[0] / 4, A0[1]), color=(1, 0, 1), width=0.5, dashes="[6] 0")
+            page.draw_line((0, k * A0[1] / 4), (A0[0], k * A0[1] / 4), color=(1, 0, 1), width=0.5, dashes="[6] 0")
+        for j, (x, y) in enumerate([(120, 200), (1300, 200), (120, 1900), (1300, 1900)]):
+            _insert_lines(page, BODY_LINES, x, y, 10)
+        page.insert_image(fitz.Rect(1300, 2800, 1300 + w, 2800 + h), pixmap=pix)
+        _place_outlined(page, ["Small parts.", "Not for children under 3 yrs."], 300, 2900, 14)
+        truth += [{"page": page.number + 1, "text": t} for t in BODY_LINES + WARNING_LABEL[1:]]
+    return truth
+
+CASES = {
+    "text_only":    (_page_text_only, 6),
+    "raster_label": (_page_raster_label, 4),
+    "outlined":     (_page_outlined, 3),
+    "vector_3plus": (_page_vector_3plus, 3),
+    "underlined":   (_page_underlined, 3),
+    "dieline":      (_page_dieline, 1),
+}
+
+def build_case_pdf(name, path):
+    make, n = CASES[name]
+    doc = fitz.open()
+    truth = make(doc, n)
+    doc.save(path)
+    doc.close()
+    return truth
+
+
+# ---------- วัดผล ----------
+
+def _norm(s):
+    s = (s or "").lower().replace(" ", " ").replace("＋", "+")
+    s = re.sub(r"[^\w+]+", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+def score(pages, truth):
+    page_text = {i + 1: _norm(" ".join((it.get("text") or "") for it in items)) for i, items in enumerate(pages)}
+    found = 0
+    ul_total = ul_found = 0
+    missing = []
+    for t in truth:
+        want = _norm(t["text"])
+        ok = want in page_text.get(t["page"], "")
+        found += ok
+        if not ok:
+            missing.append(t)
+        if t.get("underline"):
+            ul_total += 1
+            items = pages[t["page"] - 1] if t["page"] - 1 < len(pages) else []
+            if any(it.get("underline") and want in _norm(it.get("text")) for it in items):
+                ul_found += 1
+    out = {"found": found, "total": len(truth), "recall": round(found / len(truth), 4) if truth else None,
+           "missing": missing[:20]}
+    if ul_total:
+        out["underline_recall"] = round(ul_found / ul_total, 4)
+    return out
+
+def _peak_rss_mb():
+    """peak RSS ของ process นี้ + child process ที่จบแล้ว (process pool)"""
+    try:
+        import resource
+        self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        div = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0   # macOS รายงานเป็น byte
+        return round(max(self_kb, child_kb) / div, 1)
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class _PMC(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        pmc = _PMC()
+        pmc.cb = ctypes.sizeof(_PMC)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(pmc), pmc.cb)
+        return round(pmc.PeakWorkingSetSize / (1024.0 * 1024.0), 1)
+    except Exception:
+        return None
+
+def run_case(name, workdir, opts):
+    """รันใน process ใหม่ต่อเคส"""
+    from pdf_reader import extract_text_by_page
+    import ocr_engine
+
+    path = os.path.join(workdir, f"{name}.pdf")
+    truth = build_case_pdf(name, path)
+
+    t0 = time.perf_counter()
+    pages, stats = extract_text_by_page(
+        path,
+        enable_ocr=opts["ocr"],
+        ocr_lang=opts["lang"],
+        workers=opts["workers"],
+        with_stats=True,
+    )
+    seconds = time.perf_counter() - t0
+    ocr_engine.shutdown()
+
+    totals = stats.totals()
+    n_pages = len(pages)
+    return {
+        "pages": n_pages,
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(n_pages / seconds, 3) if seconds > 0 else None,
+        "ocr_calls": totals["ocr_calls"],
+        "ocr_calls_per_page": round(totals["ocr_calls"] / n_pages, 2) if n_pages else None,
+        "ocr_seconds": totals["ocr_seconds"],
+        "items": sum(len(p) for p in pages),
+        "peak_rss_mb": _peak_rss_mb(),
+        "accuracy": score(pages, truth),
+        "stages": totals["stages"],
+        "counters": totals["counters"],
+    }
+
+def compare(new, old):
+    rows = []
+    for name, cur in new["cases"].items():
+        prev = old.get("cases", {}).get(name)
+        if not prev or "error" in cur or "error" in prev:
+            continue
+        def _d(key, sub=None):
+            a = prev.get(key) if sub is None else (prev.get(key) or {}).get(sub)
+            b = cur.get(key) if sub is None else (cur.get(key) or {}).get(sub)
+            if a is None or b is None:
+                return "-"
+            return f"{a} → {b}" + (f" ({(b - a) / a:+.0%})" if a else "")
+        rows.append((name, _d("pages_per_s"), _d("ocr_calls_per_page"), _d("peak_rss_mb"), _d("accuracy", "recall")))
+    print(f"{'case':<14} {'pages/s':<26} {'ocr/page':<26} {'peak MB':<26} recall")
+    for r in rows:
+        print(f"{r[0]:<14} {r[1]:<26} {r[2]:<26} {r[3]:<26} {r[4]}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Synthetic-artwork benchmark for extract_text_by_page")
+    ap.add_argument("--out", default="bench_extract.json", help="เขียนผลเป็น JSON")
+    ap.add_argument("--cases", default=",".join(CASES), help="ชื่อเคสคั่นด้วย comma: " + ", ".join(CASES))
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--lang", default="eng")
+    ap.add_argument("--no-ocr", action="store_true")
+    ap.add_argument("--compare", help="JSON ผลรอบก่อนสำหรับเทียบ")
+    args = ap.parse_args(argv)
+
+    names = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+
+    opts = {"ocr": not args.no_ocr, "lang": args.lang, "workers": args.workers}
+    result = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pymupdf": getattr(fitz, "VersionBind", None),
+            "options": opts,
+        },
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="dso_bench_") as workdir:
+        for name in names:
+            # process ใหม่ต่อเคส → peak RSS ไม่ปนกัน และ engine/ภาพของเคสก่อนไม่ค้าง
+            with ProcessPoolExecutor(max_workers=1) as ex:
+                try:
+                    res = ex.submit(run_case, name, workdir, opts).result()
+                except Exception as e:
+                    res = {"error": f"{type(e).__name__}: {e}"}
+            result["cases"][name] = res
+            if "error" in res:
+                print(f"{name:<14} ERROR {res['error']}")
+            else:
+                print(f"{name:<14} {res['pages_per_s']:>8} pages/s  {res['ocr_calls_per_page']:>6} OCR/page  "
+                      f"{res['peak_rss_mb']} MB  recall={res['accuracy']['recall']}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"written {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+if __name__ == "__main__":
+    main()
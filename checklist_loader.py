@@ -8,10 +8,14 @@ from PyQt5.QtCore import Qt
 from openpyxl import load_workbook
 from openpyxl.styles.colors import Color
 from collections import defaultdict
+from collections.abc import Mapping
+from job_control import is_cancelled, report
 
 
 # Allowed part codes from PDF filenames
 ALLOWED_PART_CODES = ['UU1_DOM', 'DOM', 'UU1', '2LB', '2XV', '4LB', '19L', '19A', '21A', 'DC1']
+# จำนวนหน้าแรกของ PDF ที่สแกนหา part code จากเนื้อหา
+PART_CODE_SCAN_PAGES = 8
 
 TOKEN_RE = re.compile(
     r"[A-Za-z0-9\u00C0-\u024F\u0400-\u04FF\u0E00-\u0E7F]+(?:-[A-Za-z0-9\u00C0-\u024F\u0400-\u04FF\u0E00-\u0E7F]+)?"
@@ -177,7 +181,10 @@ def get_strikeout_or_red_text_rows(excel_path, sheet_name, header_row_index):
                 break 
     return bad_rows
 
-def extract_part_code_from_pdf(pdf_filename):
+def extract_part_code_from_pdf(pdf_filename, session=None):
+    """
+    session → pdf_session.PdfSession ของไฟล์นี้ (ใช้ข้อความหน้าแรกๆ ที่ session อ่านไว้แล้ว ไม่เปิดไฟล์ซ้ำ)
+    """
     basename = os.path.basename(pdf_filename).upper().replace(" ", "").replace(",", "")
     found = []
 
@@ -187,12 +194,16 @@ def extract_part_code_from_pdf(pdf_filename):
 
     # สแกนเนื้อหา PDF หน้าแรกๆ เพิ่มเติม
     try:
-        doc = fitz.open(pdf_filename)
+        doc = None if session is not None else fitz.open(pdf_filename)
         try:
-            pages_to_scan = min(8, len(doc))
+            n_pages = session.page_count if session is not None else len(doc)
+            pages_to_scan = min(PART_CODE_SCAN_PAGES, n_pages)
             tokens = set()
             for i in range(pages_to_scan):
-                txt = (doc.load_page(i).get_text("text") or "").upper()
+                if session is not None:
+                    txt = session.page_text(i).upper()
+                else:
+                    txt = (doc.load_page(i).get_text("text") or "").upper()
                 for t in re.split(r"[^A-Z0-9_]+", txt):
                     t = t.strip()
                     if t:
@@ -207,7 +218,8 @@ def extract_part_code_from_pdf(pdf_filename):
             if ("UU1" in tokens and "DOM" in tokens) and ("UU1_DOM" not in found):
                 found.insert(0, "UU1_DOM")
         finally:
-            doc.close()
+            if doc is not None:
+                doc.close()
     except Exception:
         pass
 
@@ -449,14 +461,16 @@ def extract_underlines_from_excel(excel_path, sheet_name, header_row_index, df):
         df["__Term_HTML__"] = df.get("Symbol/Exact wording", "").astype(str)
         return df
 
-def load_checklist(excel_path, pdf_filename=None):
+def load_checklist(excel_path, pdf_filename=None, session=None):
     all_sheets = pd.read_excel(excel_path, sheet_name=None)
     sheet_names = list(all_sheets.keys())
 
+    if not pdf_filename and session is not None:
+        pdf_filename = session.path
     if not pdf_filename:
         raise ValueError("📄 กรุณาอัปโหลดไฟล์ PDF ก่อน เพื่อจับคู่กับ Sheet ของ Checklist")
 
-    part_codes = extract_part_code_from_pdf(pdf_filename)
+    part_codes = extract_part_code_from_pdf(pdf_filename, session=session)
     if not part_codes:
         raise ValueError("❌ ไม่พบ Part code ที่ระบุไว้ในชื่อไฟล์ PDF")
 
@@ -808,9 +822,9 @@ def _classify_spw_by_page(page_norm_text: dict[int, str]) -> dict[int, str]:
 
     return spw_map
 
-def _item_page_no(item: dict) -> int | None:
+def _item_page_no(item: Mapping) -> int | None:
     """พยายามอ่านเลขหน้าจาก item ที่มาจาก extracted_text_list"""
-    if not isinstance(item, dict):
+    if not isinstance(item, Mapping):
         return None
     return (
         item.get("page_no")
@@ -820,7 +834,64 @@ def _item_page_no(item: dict) -> int | None:
         or item.get("page_idx")
     )
 
-def start_check(df_checklist, extracted_text_list):
+def _ocr_block_items(page_meta, page_no):
+    """
+    บล็อก OCR หลายบรรทัดของหน้า จาก meta ที่ extract สร้างไว้แล้ว (triage_log[...]["ocr_blocks"]
+    ของ pdf_reader.extract_text_by_page) → item level "block"; ใช้เป็น fallback ของ matcher เท่านั้น
+    """
+    out = []
+    for blk in (page_meta or {}).get("ocr_blocks") or []:
+        out.append({
+            "text": blk.get("text") or "",
+            "bold": None,
+            "italic": None,
+            "underline": bool(blk.get("underline")),
+            "size_mm": float(blk.get("size_mm") or 0.0),
+            "size_unit": "mm",
+            "font": "",
+            "bbox": tuple(blk.get("bbox") or ()),
+            "source": "ocr",
+            "level": "block",
+            "page_no": page_no,
+        })
+    return out
+
+# จำนวนหลักฐาน (page, bbox) สูงสุดที่แนบไปกับผลตรวจหนึ่งแถว
+MAX_EVIDENCE_PER_ROW = 50
+
+def _evidence_from_items(items, limit=MAX_EVIDENCE_PER_ROW):
+    """
+    หลักฐานตำแหน่งของ item ที่ match: [{"page", "bbox", "source", "text"}, ...]
+    page เริ่มที่ 1 (ตรงกับ page_no จาก extract_text_by_page), bbox เป็นพิกัด PDF (pt)
+    """
+    out, seen = [], set()
+    for it in items or []:
+        page_no = _item_page_no(it)
+        bbox = it.get("bbox") if page_no is not None else None
+        if not bbox:
+            continue
+        bbox = [round(float(v), 2) for v in bbox[:4]]
+        key = (int(page_no), tuple(bbox))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({
+            "page": int(page_no),
+            "bbox": bbox,
+            "source": (it.get("source") or "pdf").lower(),
+            "text": (it.get("text") or "")[:120],
+        })
+        if len(out) >= limit:
+            break
+    return out
+
+def start_check(df_checklist, extracted_text_list, progress=None, cancel=None, page_meta=None):
+    """
+    progress  → progress(แถวที่เสร็จ, จำนวนแถว, "row") ต่อแถวของ checklist
+    cancel    → job_control.CancelToken; ยกเลิกแล้วคืนผลของแถวที่ตรวจเสร็จแล้ว
+    page_meta → triage_log ต่อหน้าจาก extract_text_by_page (ลำดับเดียวกับ extracted_text_list)
+                ใช้บล็อก OCR หลายบรรทัด ("ocr_blocks") เป็น fallback ของประโยคที่ขึ้นบรรทัดใหม่; None = ไม่ใช้
+    """
     logger = logging.getLogger(__name__)
     results = []
     grouped = defaultdict(list)
@@ -893,7 +964,7 @@ def start_check(df_checklist, extracted_text_list):
 
         def _has_big(items):
             try:
-                return any((_pick_size_mm(it) >= 1.6) for it in items if isinstance(it, dict))
+                return any((_pick_size_mm(it) >= 1.6) for it in items if isinstance(it, Mapping))
             except Exception:
                 return False
 
@@ -953,6 +1024,14 @@ def start_check(df_checklist, extracted_text_list):
             page_number = page_mapping[artwork_index + 1]
             all_texts.append((text_norm, page_number, item))
 
+    # บล็อก OCR หลายบรรทัด: ไม่อยู่ใน all_texts (ข้อความซ้ำกับบรรทัด) ใช้เมื่อไม่มี item ใดตรงเท่านั้น
+    block_texts = []
+    for artwork_index in range(len(artwork_pages)):
+        page_number = page_mapping[artwork_index + 1]
+        meta = page_meta[page_number - 1] if page_meta and page_number <= len(page_meta) else None
+        for blk in _ocr_block_items(meta, page_number):
+            block_texts.append((normalize_text(blk["text"]), page_number, blk))
+
     page_norm_text_all = {}
     for real_no, page_items in enumerate(extracted_text_list, start=1):
         page_norm_text_all[real_no] = " ".join(
@@ -1042,7 +1121,12 @@ def start_check(df_checklist, extracted_text_list):
                         bool(it.get('underline')), bool(it.get('bold')),
                         _pick_size_mm(it))
 
-    for idx, row in df_checklist.iterrows():
+    n_rows = len(df_checklist)
+    for row_no, (idx, row) in enumerate(df_checklist.iterrows()):
+        if is_cancelled(cancel):
+            logger.info("Check cancelled: %d/%d rows done", row_no, n_rows)
+            break
+        report(progress, row_no, n_rows, "row")
         requirement = str(row.get("Requirement", "")).strip()
         spec = str(row.get("Specification", "")).strip()
         package_panel = (str(row.get("Package Panel", "")) or "").strip() or "-"
@@ -1389,6 +1473,26 @@ def start_check(df_checklist, extracted_text_list):
                     matched_items.append(item)
                     pages_set.add(page_number)
 
+            # ไม่มี item ใดตรง → ประโยคที่ OCR ขึ้นบรรทัดใหม่: บล็อก OCR (ตรงทั้งวลี/คำครบตามลำดับเท่านั้น ไม่ fuzzy)
+            if not matched_items:
+                for text_norm, page_number, item in block_texts:
+                    hit, end_idx = bool(age_pat and age_pat.search(text_norm)), None
+                    if not hit and variant_norm:
+                        j = text_norm.find(variant_norm)
+                        if j != -1:
+                            hit, end_idx = True, j + len(variant_norm)
+                    if not hit and len(words) >= 2:
+                        hit = _tokens_in_order(words, text_norm)
+                    if hit and require_thailand and not _must_contain_country_th(text_norm):
+                        hit = False
+                    if hit and require_end_boundary and end_idx is not None:
+                        tail = text_norm[end_idx:].lstrip(" \t\u00A0")
+                        if tail and tail[0].isalnum():
+                            hit = False
+                    if hit:
+                        matched_items.append(item)
+                        pages_set.add(page_number)
+
             def _safe_sz(it):
                 try: return float(it.get("size_mm") or 0.0)
                 except Exception: 
@@ -1500,6 +1604,8 @@ def start_check(df_checklist, extracted_text_list):
 
             # ใช้ best สำหรับตรวจรูปแบบ/ขนาดตัวอักษร
             matched_items = _dedup_items(all_items) or best["items"]
+            # ตำแหน่งที่พบคำ (ก่อนกรองตามสไตล์) ใช้เป็นหลักฐานไฮไลท์ในพรีวิว
+            located_items = list(matched_items)
 
             # --- SPW boundary: กันเคสจับ prefix ของ SPG ---
             if req_tag == "SPW":
@@ -1702,6 +1808,7 @@ def start_check(df_checklist, extracted_text_list):
                 "Package Panel": package_panel,
                 "Procedure": procedure,
                 "__Term_HTML__": row.get("__Term_HTML__", ""),
+                "__Evidence__": _evidence_from_items(matched_items + located_items) if found_flag == "✅ Found" else [],
                 "Image_Groups_Resolved": row.get("Image_Groups_Resolved", row.get("Image_Groups", [])),
             })
 
@@ -1737,6 +1844,7 @@ def start_check(df_checklist, extracted_text_list):
                 "Note": item["Note"],
                 "Verification": verification,
                 "__Term_HTML__": item.get("__Term_HTML__", ""),
+                "__Evidence__": item.get("__Evidence__", []),
                 "Image_Groups_Resolved": item.get("Image_Groups_Resolved", []),
             })
 
@@ -1773,6 +1881,7 @@ def start_check(df_checklist, extracted_text_list):
                 "Note": item["Note"],
                 "Verification": verification,
                 "__Term_HTML__": item.get("__Term_HTML__", ""),
+                "__Evidence__": item.get("__Evidence__", []),
                 "Image_Groups_Resolved": item.get("Image_Groups_Resolved", []),
             })
 
@@ -1809,6 +1918,7 @@ def start_check(df_checklist, extracted_text_list):
                 "Note": item["Note"],
                 "Verification": verification,
                 "__Term_HTML__": item.get("__Term_HTML__", ""),
+                "__Evidence__": item.get("__Evidence__", []),
                 "Image_Groups_Resolved": item.get("Image_Groups_Resolved", []),
             })
 
@@ -1866,4 +1976,6 @@ def start_check(df_checklist, extracted_text_list):
             if hide_spg:
                 df_result = df_result[~is_spg]
 
+    if not is_cancelled(cancel):
+        report(progress, n_rows, n_rows, "done")
     return df_result
\ No newline at end of file
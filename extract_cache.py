@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+
+
+DEFAULT_PAGE_CACHE_MB = 512
+DEFAULT_OCR_CACHE_MB = 256
+# เปลี่ยนเมื่อรูปแบบ key/ผลของ OcrCache เปลี่ยน
+_OCR_CACHE_VERSION = 1
+
+class _DiskLRU:
+    """
+    ที่เก็บ blob บนดิสก์ (sqlite) แบบจำกัดขนาด: เกิน max_bytes จะลบรายการที่ใช้ล่าสุดนานที่สุดก่อน
+    เวลาใช้งานล่าสุดของ get เก็บในหน่วยความจำก่อน แล้วเขียนลงดิสก์ทีเดียวตอน eviction / ครบ TOUCH_FLUSH_EVERY / close
+    (hit ไม่ต้องเขียน+commit ทุกครั้ง)
+    """
+    TOUCH_FLUSH_EVERY = 512
+
+    def __init__(self, path, max_bytes, evict_every=1):
+        """evict_every → ตรวจขนาดทุก n ครั้งที่ put (รายการเล็กจำนวนมาก: ไม่ต้อง SUM ทั้งตารางทุกครั้ง)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self._evict_every = max(1, int(evict_every))
+        self._puts = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries(used)")
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_FLUSH_EVERY:
+                self._flush_touched_locked()
+                self._db.commit()
+            return bytes(row[0])
+
+    def put(self, key, blob):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries(key, data, size, used) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), time.time()),
+            )
+            self._puts += 1
+            if self._puts % self._evict_every == 0:
+                self._evict_locked()
+            self._db.commit()
+
+    def invalidate(self, key=None):
+        """key=None → ล้างทั้งหมด"""
+        with self._lock:
+            if key is None:
+                self._touched.clear()
+                self._db.execute("DELETE FROM entries")
+            else:
+                self._touched.pop(key, None)
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+            if key is None:
+                self._db.execute("VACUUM")
+
+    def total_bytes(self):
+        with self._lock:
+            row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return int(row[0])
+
+    def _flush_touched_locked(self):
+        if self._touched:
+            self._db.executemany("UPDATE entries SET used = ? WHERE key = ?",
+                                 [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def _evict_locked(self):
+        # ลำดับ LRU ต้องรวมเวลาใช้งานที่ยังค้างในหน่วยความจำ
+        self._flush_touched_locked()
+        total = int(self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY used ASC").fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= int(size)
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_touched_locked()
+                self._db.commit()
+            except Exception:
+                pass
+            try:
+                self._db.close()
+            except Exception:
+                pass
+
+def _json_default(o):
+    # item แบบ Mapping (เช่น page_items.PageItem) → dict
+    if isinstance(o, Mapping):
+        return dict(o)
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+class PageCache(_DiskLRU):
+    """
+    cache ผลลัพธ์ extract ต่อหน้า (key = hash เนื้อหาหน้า + พารามิเตอร์ OCR ดู pdf_reader._page_cache_key)
+    """
+    FILENAME = "pages.sqlite3"
+
+    def __init__(self, cache_dir, max_mb=DEFAULT_PAGE_CACHE_MB):
+        super().__init__(os.path.join(cache_dir, self.FILENAME), max_bytes=int(max_mb) * 1024 * 1024)
+
+    def get_page(self, key):
+        """คืน (items, meta) หรือ None ถ้าไม่มี/อ่านไม่ได้"""
+        blob = self.get(key)
+        if blob is None:
+            return None
+        try:
+            payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+            return payload["items"], payload.get("meta")
+        except Exception as e:
+            logging.debug(f"Page cache entry unreadable, dropping: {e}")
+            self.invalidate(key)
+            return None
+
+    def put_page(self, key, items, meta=None):
+        """meta = ข้อมูลประกอบของหน้า (เช่นผล OCR triage) ต้องแปลงเป็น JSON ได้"""
+        try:
+            payload = {"items": items, "meta": meta}
+            blob = zlib.compress(json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8"))
+        except Exception as e:
+            logging.debug(f"Page cache skip (not serializable): {e}")
+            return
+        self.put(key, blob)
+
+class OcrCache(_DiskLRU):
+    """
+    cache ผล OCR (image_to_data) ข้ามเอกสาร: key = hash ของไบต์ภาพที่ส่งให้ tesseract + ภาษา + OEM/PSM
+    + ตัวแปร config (รวม whitelist) + รุ่นของ engine → ป้ายคำเตือน/ไอคอน/บล็อกกฎหมายที่ใช้ซ้ำใน SKU อื่น
+    ไม่ต้อง OCR ใหม่; นับ hit/miss ในอินสแตนซ์ (ดู counters())
+    """
+    FILENAME = "ocr.sqlite3"
+    EVICT_EVERY = 64
+
+    def __init__(self, cache_dir, max_mb=DEFAULT_OCR_CACHE_MB):
+        super().__init__(os.path.join(cache_dir, self.FILENAME), max_bytes=int(max_mb) * 1024 * 1024,
+                         evict_every=self.EVICT_EVERY)
+        self._count_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(img, lang, oem, psm, variables, engine=""):
+        """img = PIL.Image ที่ส่งให้ OCR จริง (หลัง preprocess/crop)"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps([_OCR_CACHE_VERSION, engine, lang, int(oem), int(psm),
+                             sorted((variables or {}).items()), img.mode, list(img.size)]).encode("utf-8"))
+        h.update(img.tobytes())
+        return h.hexdigest()
+
+    def get_data(self, key):
+        """คืน dict แบบ image_to_data หรือ None"""
+        blob = self.get(key)
+        data = None
+        if blob is not None:
+            try:
+                data = json.loads(zlib.decompress(blob).decode("utf-8"))
+            except Exception as e:
+                logging.debug(f"OCR cache entry unreadable, dropping: {e}")
+                self.invalidate(key)
+        with self._count_lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put_data(self, key, data):
+        try:
+            blob = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        except Exception as e:
+            logging.debug(f"OCR cache skip (not serializable): {e}")
+            return
+        self.put(key, blob)
+
+    def counters(self):
+        with self._count_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+def clear_ocr_cache(cache_dir):
+    cache = OcrCache(cache_dir)
+    try:
+        cache.invalidate()
+    finally:
+        cache.close()
+
+def clear_page_cache(cache_dir):
+    cache = PageCache(cache_dir)
+    try:
+        cache.invalidate()
+    finally:
+        cache.close()
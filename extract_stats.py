@@ -0,0 +1,176 @@
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+# PageStats ของหน้าที่กำลังทำใน context นี้ (None = ปิดการวัด → timed()/count() แทบไม่มีต้นทุน)
+# แยกตาม thread: งาน extract หลายงานพร้อมกัน (เช่น part code กับ extract หลักบน QThread ต่างกัน) ไม่ปนกัน
+# thread ของ OCR รายบริเวณไม่ได้ context ของผู้สร้างเอง → ห่อฟังก์ชันด้วย bind() แล้วเขียนผ่าน lock ของ PageStats
+_ACTIVE = contextvars.ContextVar("extract_stats_active", default=None)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("ps", "name", "t0")
+
+    def __init__(self, ps, name):
+        self.ps = ps
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ps.add_time(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+def enabled():
+    return _ACTIVE.get() is not None
+
+def timed(name):
+    """with timed("ocr fast"): ... → เวลา (inclusive) และจำนวนครั้งของขั้นตอน"""
+    ps = _ACTIVE.get()
+    return _NULL if ps is None else _Timer(ps, name)
+
+def count(name, n=1):
+    ps = _ACTIVE.get()
+    if ps is not None:
+        ps.add_count(name, n)
+
+def ocr_call(**info):
+    """บันทึกการเรียก OCR หนึ่งครั้ง: kind, zoom, psm, lang, size (w, h), seconds, words"""
+    ps = _ACTIVE.get()
+    if ps is not None:
+        ps.add_ocr_call(info)
+
+def bind(fn):
+    """fn ที่จะรันใน thread อื่น (ThreadPoolExecutor) ให้บันทึกลง PageStats ของหน้าที่กำลังวัดใน thread นี้"""
+    ps = _ACTIVE.get()
+    if ps is None:
+        return fn
+
+    def _run(*args, **kwargs):
+        token = _ACTIVE.set(ps)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _ACTIVE.reset(token)
+    return _run
+
+
+class PageStats:
+    def __init__(self, page_no):
+        self.page_no = page_no
+        self.wall_s = 0.0
+        self.stages = {}      # name → [seconds, calls]
+        self.counters = {}    # name → int
+        self.ocr_calls = []
+        self._lock = threading.Lock()
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            st = self.stages.get(name)
+            if st is None:
+                self.stages[name] = [seconds, 1]
+            else:
+                st[0] += seconds
+                st[1] += 1
+
+    def add_count(self, name, n):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_ocr_call(self, info):
+        with self._lock:
+            self.ocr_calls.append(info)
+
+    def to_dict(self):
+        return {
+            "page_no": self.page_no,
+            "wall_s": round(self.wall_s, 4),
+            "stages": {k: {"seconds": round(v[0], 4), "calls": v[1]} for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            "ocr_calls": list(self.ocr_calls),
+        }
+
+
+@contextmanager
+def page_scope(page_no, enabled=True):
+    """เปิดการวัดสำหรับหน้าหนึ่ง; yield PageStats (หรือ None ถ้าไม่เปิด)"""
+    if not enabled:
+        yield None
+        return
+    ps = PageStats(page_no)
+    token = _ACTIVE.set(ps)
+    t0 = time.perf_counter()
+    try:
+        yield ps
+    finally:
+        ps.wall_s = time.perf_counter() - t0
+        _ACTIVE.reset(token)
+
+
+class ExtractStats:
+    """
+    ผลการวัดของ extract_text_by_page หนึ่งครั้ง: pages = dict ต่อหน้า (PageStats.to_dict / {"cached": True})
+    """
+    def __init__(self, pdf_path=None):
+        self.pdf_path = pdf_path
+        self.wall_s = 0.0
+        self.pages = []
+
+    def add_page(self, page_dict):
+        self.pages.append(page_dict)
+        self.pages.sort(key=lambda p: p.get("page_no") or 0)
+
+    def totals(self):
+        stages, counters = {}, {}
+        n_ocr = 0
+        ocr_s = 0.0
+        for p in self.pages:
+            for k, v in (p.get("stages") or {}).items():
+                st = stages.setdefault(k, {"seconds": 0.0, "calls": 0})
+                st["seconds"] += v["seconds"]
+                st["calls"] += v["calls"]
+            for k, v in (p.get("counters") or {}).items():
+                counters[k] = counters.get(k, 0) + v
+            for c in p.get("ocr_calls") or []:
+                n_ocr += 1
+                ocr_s += c.get("seconds") or 0.0
+        for st in stages.values():
+            st["seconds"] = round(st["seconds"], 4)
+        return {
+            "pages": len(self.pages),
+            "pages_cached": sum(1 for p in self.pages if p.get("cached")),
+            "wall_s": round(self.wall_s, 4),
+            "stages": stages,
+            "counters": counters,
+            "ocr_calls": n_ocr,
+            "ocr_seconds": round(ocr_s, 4),
+        }
+
+    def to_dict(self):
+        return {"pdf_path": self.pdf_path, "totals": self.totals(), "pages": list(self.pages)}
+
+    def write_jsonl(self, path):
+        """หนึ่งบรรทัดต่อหน้า ("type": "page") + บรรทัดสรุป ("type": "summary") ต่อท้ายไฟล์"""
+        with open(path, "a", encoding="utf-8") as f:
+            for p in self.pages:
+                f.write(json.dumps(dict(p, type="page", pdf_path=self.pdf_path), ensure_ascii=False) + "\n")
+            f.write(json.dumps(dict(self.totals(), type="summary", pdf_path=self.pdf_path),
+                               ensure_ascii=False) + "\n")
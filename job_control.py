@@ -0,0 +1,43 @@
+import logging
+import threading
+
+
+class Cancelled(Exception):
+    """งานถูกยกเลิกผ่าน CancelToken (ใช้ภายใน: ผู้เรียก API ได้ผลบางส่วนคืนแทน)"""
+
+
+class CancelToken:
+    """
+    ธงยกเลิกงานแบบ cooperative: UI เรียก cancel() งานเช็ก cancelled ระหว่างหน้า/ขั้นตอน/แถว
+    ใช้ข้าม thread ได้ (threading.Event); event = Event ของ multiprocessing.Manager → ใช้ข้ามโปรเซสได้
+    """
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def is_cancelled(cancel):
+    return cancel is not None and cancel.cancelled
+
+
+def report(progress, done, total, stage):
+    """
+    เรียก progress(done, total, stage) ถ้ามี; callback ที่ล้มไม่ทำให้งานหลักล้ม
+    done/total = จำนวนหน้า (extract) หรือแถว (check) ที่เสร็จแล้ว / ทั้งหมด
+    """
+    if progress is None:
+        return
+    try:
+        progress(int(done), int(total), str(stage))
+    except Exception as e:
+        logging.debug(f"progress callback failed: {e}")
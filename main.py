@@ -6,6 +6,7 @@ import os, sys
 import logging
 import pathlib
 import argparse
+import multiprocessing
 
 APP_ICON_PATH = os.path.join("assets", "app", "dso_icon.ico")
 SPLASH_IMG_PATH = os.path.join("assets", "app", "splash_dso.png")
@@ -20,24 +21,26 @@ if sys.platform.startswith("win"):
     except Exception:
         pass
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--debug", action="store_true", help="Enable debug logging")
-args = parser.parse_args()
+def _setup_logging():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%H:%M:%S",
-)
+    level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%H:%M:%S",
+    )
 
-logs_dir = pathlib.Path("logs")
-logs_dir.mkdir(parents=True, exist_ok=True)
+    logs_dir = pathlib.Path("logs")
+    logs_dir.mkdir(parents=True, exist_ok=True)
 
-_file_handler = logging.FileHandler(logs_dir / "dso_check.log", mode="w", encoding="utf-8")
-_file_handler.setLevel(logging.INFO)
-_file_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+    _file_handler = logging.FileHandler(logs_dir / "dso_check.log", mode="w", encoding="utf-8")
+    _file_handler.setLevel(level)
+    _file_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
 
-logging.getLogger().addHandler(_file_handler)
+    logging.getLogger().addHandler(_file_handler)
 
 def run_app():
     app = QtWidgets.QApplication(sys.argv)
@@ -67,4 +70,7 @@ def run_app():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # process pool ของ pdf_reader (spawn) จะ import โมดูลนี้ซ้ำใน worker → ตั้งค่า log เฉพาะ process หลัก
+    multiprocessing.freeze_support()
+    _setup_logging()
     run_app()
\ No newline at end of file
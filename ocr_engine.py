@@ -0,0 +1,564 @@
+import os
+import re
+import glob
+import shutil
+import ctypes
+import ctypes.util
+import logging
+import threading
+from collections import OrderedDict
+
+# Engine ถาวรในโปรเซส (ไม่ fork tesseract + โหลด traineddata ใหม่ทุกครั้ง) เลือกตามลำดับ:
+#   1) tesserocr (ถ้าติดตั้ง)
+#   2) libtesseract ผ่าน ctypes (C API) — ไม่ต้องติดตั้งอะไรเพิ่ม: ตัวติดตั้ง tesseract บน Windows
+#      (UB Mannheim) มี libtesseract-*.dll อยู่ข้าง tesseract.exe อยู่แล้ว; Linux/macOS ใช้ libtesseract.so/.dylib
+#      หา DLL จาก TESSERACT_LIB (path ของไฟล์) → โฟลเดอร์ของ pytesseract.tesseract_cmd / tesseract บน PATH
+#   3) pytesseract: subprocess ต่อครั้ง (ช้า; log warning ครั้งเดียวต่อโปรเซส)
+try:
+    import tesserocr
+    from tesserocr import PyTessBaseAPI, RIL
+except Exception:
+    tesserocr = None
+
+try:
+    import pytesseract
+except Exception:
+    pytesseract = None
+
+
+# เวลาสูงสุดต่อการเรียก OCR หนึ่งครั้ง (วินาที) กัน recognition ค้างจน _PdfWorker ไม่จบ
+DEFAULT_TIMEOUT_S = 45.0
+
+# จำนวน engine ว่างที่เก็บไว้ (แต่ละ engine ชุดภาษาใหญ่กินหน่วยความจำหลายร้อย MB)
+MAX_IDLE_ENGINES = 6
+
+_CFG_OEM_RE = re.compile(r"--oem\s+(\d+)")
+_CFG_PSM_RE = re.compile(r"--psm\s+(\d+)")
+_CFG_VAR_RE = re.compile(r"-c\s+([A-Za-z0-9_]+)=(\S*)")
+
+TESSERACT_LIB_ENV = "TESSERACT_LIB"
+
+def available() -> bool:
+    return _backend() is not None
+
+# ชุดภาษาที่ init engine ไม่สำเร็จในโปรเซสนี้ (traineddata ไม่มี/เสีย) — ต่างจาก timeout ที่ลองใหม่ได้
+_FAILED_LANGS = set()
+
+def lang_failed(lang) -> bool:
+    """True ถ้าชุดภาษานี้เคยโหลดไม่สำเร็จ (ผู้เรียกควรลดเป็นชุดที่เล็กกว่า แทนการลองซ้ำ)"""
+    return lang in _FAILED_LANGS
+
+def _acquire_engine(key, factory, lang):
+    try:
+        return _POOL.acquire(key, factory)
+    except Exception:
+        _FAILED_LANGS.add(lang)
+        raise
+
+def parse_config(config: str):
+    cfg = config or ""
+    m_oem = _CFG_OEM_RE.search(cfg)
+    m_psm = _CFG_PSM_RE.search(cfg)
+    oem = int(m_oem.group(1)) if m_oem else 3
+    psm = int(m_psm.group(1)) if m_psm else 3
+    variables = dict(_CFG_VAR_RE.findall(cfg))
+    return oem, psm, variables
+
+class _EnginePool:
+    """
+    เก็บ engine ที่ init แล้วต่อคีย์ (tesserocr: (lang, oem, psm); C API: + ตัวแปร config) ไว้ใช้ซ้ำข้ามหน้า/ROI
+    engine ที่ถูกยืมไปจะไม่อยู่ใน pool → หลาย thread ใช้พร้อมกันได้ (สร้างเพิ่มเมื่อจำเป็น)
+    """
+    def __init__(self, max_idle=MAX_IDLE_ENGINES):
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()
+        self._max_idle = max_idle
+
+    def acquire(self, key, factory):
+        with self._lock:
+            bucket = self._idle.get(key)
+            if bucket:
+                api = bucket.pop()
+                if not bucket:
+                    self._idle.pop(key, None)
+                return api
+        logging.debug(f"OCR engine init: {key}")
+        return factory()
+
+    def release(self, key, api):
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(api)
+            self._idle.move_to_end(key)
+            while sum(len(v) for v in self._idle.values()) > self._max_idle:
+                old_key, old_bucket = next(iter(self._idle.items()))
+                evicted.append(old_bucket.pop(0))
+                if not old_bucket:
+                    self._idle.pop(old_key, None)
+        for e in evicted:
+            _end_engine(e)
+
+    def discard(self, api):
+        _end_engine(api)
+
+    def close(self):
+        with self._lock:
+            engines = [a for v in self._idle.values() for a in v]
+            self._idle.clear()
+        for e in engines:
+            _end_engine(e)
+
+def _end_engine(api):
+    try:
+        api.End()
+    except Exception:
+        pass
+
+_POOL = _EnginePool()
+
+def _run_with_watchdog(fn, timeout):
+    """
+    รัน fn ใน daemon thread; ถ้าไม่จบภายใน timeout คืน (False, None) และปล่อย thread ค้างไว้เบื้องหลัง
+    """
+    box = {}
+
+    def _target():
+        try:
+            box["value"] = fn()
+        except Exception as e:
+            box["error"] = e
+
+    t = threading.Thread(target=_target, name="ocr-watchdog", daemon=True)
+    t.start()
+    t.join(timeout)
+    if t.is_alive():
+        return False, None
+    if "error" in box:
+        raise box["error"]
+    return True, box.get("value")
+
+def _empty_data():
+    keys = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+            "left", "top", "width", "height", "conf", "text")
+    return {k: [] for k in keys}
+
+def _tesserocr_image_to_data(img, lang, oem, psm, variables, timeout):
+    key = (lang, oem, psm)
+    api = _acquire_engine(key, lambda: PyTessBaseAPI(lang=lang, oem=oem, psm=psm), lang)
+    previous = {}
+    healthy = False
+    abandoned = False
+    try:
+        for k, v in variables.items():
+            previous[k] = api.GetVariableAsString(k)
+            api.SetVariable(k, v)
+        api.SetImage(img)
+
+        def _recognize():
+            # timeout ภายในของ tesseract (ms) + watchdog ภายนอกกันกรณีค้างจริง
+            return api.Recognize(int(timeout * 1000))
+
+        finished, ok = _run_with_watchdog(_recognize, timeout + 5.0)
+        if not finished:
+            # thread ยังถือ engine อยู่ → ห้าม End()/ใช้ซ้ำ ปล่อยให้ GC เก็บเมื่อ thread จบเอง
+            abandoned = True
+            logging.warning(f"OCR watchdog: recognition exceeded {timeout:.0f}s (lang={lang}, psm={psm}); engine dropped")
+            return None
+        if not ok:
+            logging.warning(f"OCR timeout after {timeout:.0f}s (lang={lang}, psm={psm})")
+            api.Clear()
+            healthy = True
+            return None
+
+        data = _empty_data()
+        W, H = img.size
+        # แถวระดับหน้า (เหมือน TSV ของ tesseract) ให้ผู้เรียกเห็นผลที่ไม่ว่างเหมือน pytesseract
+        for col, val in (("level", 1), ("page_num", 1), ("block_num", 0), ("par_num", 0),
+                         ("line_num", 0), ("word_num", 0), ("left", 0), ("top", 0),
+                         ("width", W), ("height", H), ("conf", -1), ("text", "")):
+            data[col].append(val)
+
+        block = par = line = word = 0
+        ri = api.GetIterator()
+        if ri is not None:
+            for r in tesserocr.iterate_level(ri, RIL.WORD):
+                if r.IsAtBeginningOf(RIL.BLOCK):
+                    block += 1; par = 0; line = 0
+                if r.IsAtBeginningOf(RIL.PARA):
+                    par += 1; line = 0
+                if r.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1; word = 0
+                word += 1
+                bb = r.BoundingBox(RIL.WORD)
+                if not bb:
+                    continue
+                x0, y0, x1, y1 = bb
+                data["level"].append(5)
+                data["page_num"].append(1)
+                data["block_num"].append(block)
+                data["par_num"].append(par)
+                data["line_num"].append(line)
+                data["word_num"].append(word)
+                data["left"].append(x0)
+                data["top"].append(y0)
+                data["width"].append(x1 - x0)
+                data["height"].append(y1 - y0)
+                data["conf"].append(float(r.Confidence(RIL.WORD)))
+                data["text"].append(r.GetUTF8Text(RIL.WORD) or "")
+        api.Clear()
+        healthy = True
+        return data
+    finally:
+        if healthy:
+            for k, v in previous.items():
+                try:
+                    api.SetVariable(k, v if v is not None else "")
+                except Exception:
+                    pass
+            _POOL.release(key, api)
+        elif not abandoned:
+            _POOL.discard(api)
+
+# ---- libtesseract ผ่าน ctypes (C API ของ tesseract ≥ 4.1) ----
+_TSV_INT_KEYS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                 "left", "top", "width", "height")
+
+class _CApi:
+    """ฟังก์ชันของ libtesseract ที่ใช้ + tessdata ที่จะส่งให้ Init"""
+    _SIGNATURES = {
+        "TessVersion": (ctypes.c_char_p, []),
+        "TessBaseAPICreate": (ctypes.c_void_p, []),
+        "TessBaseAPIDelete": (None, [ctypes.c_void_p]),
+        "TessBaseAPIInit2": (ctypes.c_int, [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]),
+        "TessBaseAPISetPageSegMode": (None, [ctypes.c_void_p, ctypes.c_int]),
+        "TessBaseAPISetVariable": (ctypes.c_int, [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]),
+        "TessBaseAPISetImage": (None, [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_int,
+                                       ctypes.c_int, ctypes.c_int]),
+        "TessBaseAPIRecognize": (ctypes.c_int, [ctypes.c_void_p, ctypes.c_void_p]),
+        "TessBaseAPIGetTsvText": (ctypes.c_void_p, [ctypes.c_void_p, ctypes.c_int]),
+        "TessDeleteText": (None, [ctypes.c_void_p]),
+        "TessBaseAPIClear": (None, [ctypes.c_void_p]),
+        "TessBaseAPIEnd": (None, [ctypes.c_void_p]),
+        "TessMonitorCreate": (ctypes.c_void_p, []),
+        "TessMonitorDelete": (None, [ctypes.c_void_p]),
+        "TessMonitorSetDeadlineMSecs": (None, [ctypes.c_void_p, ctypes.c_int]),
+        "TessBaseAPIDetectOrientationScript": (ctypes.c_int, [
+            ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_float),
+            ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_float)]),
+    }
+
+    def __init__(self, lib, datapath):
+        for name, (res, args) in self._SIGNATURES.items():
+            fn = getattr(lib, name)
+            fn.restype = res
+            fn.argtypes = args
+        self.lib = lib
+        self.datapath = datapath.encode("utf-8") if datapath else None
+        self.version = (lib.TessVersion() or b"").decode("utf-8", "replace")
+
+def _tesseract_dirs():
+    """โฟลเดอร์ของ tesseract executable (pytesseract.tesseract_cmd ก่อน แล้ว PATH)"""
+    cmds = []
+    if pytesseract is not None:
+        cmds.append(getattr(pytesseract.pytesseract, "tesseract_cmd", None))
+    cmds.append("tesseract")
+    dirs = []
+    for c in cmds:
+        exe = shutil.which(c) if c else None
+        if exe:
+            d = os.path.dirname(os.path.abspath(exe))
+            if d not in dirs:
+                dirs.append(d)
+    return dirs
+
+def _load_capi():
+    candidates = []
+    env = os.environ.get(TESSERACT_LIB_ENV)
+    if env:
+        candidates.append((env, os.path.dirname(env)))
+    for d in _tesseract_dirs():
+        for pattern in ("libtesseract*.dll", "tesseract*.dll", "libtesseract*.so*", "libtesseract*.dylib"):
+            candidates.extend((p, d) for p in sorted(glob.glob(os.path.join(d, pattern)), reverse=True))
+    found = ctypes.util.find_library("tesseract")
+    if found:
+        candidates.append((found, None))
+
+    for path, exe_dir in candidates:
+        try:
+            lib = ctypes.CDLL(path)
+        except OSError as e:
+            logging.debug(f"libtesseract load failed ({path}): {e}")
+            continue
+        # tesseract หา tessdata จากโฟลเดอร์ของโปรแกรมที่รัน (python.exe) → ชี้ไปที่ tessdata ข้าง tesseract.exe เอง
+        datapath = None
+        if not os.environ.get("TESSDATA_PREFIX") and exe_dir and os.path.isdir(os.path.join(exe_dir, "tessdata")):
+            datapath = os.path.join(exe_dir, "tessdata")
+        try:
+            api = _CApi(lib, datapath)
+        except (AttributeError, OSError) as e:
+            # libtesseract รุ่นเก่ากว่า 4.1 ไม่มี TessMonitorSetDeadlineMSecs ฯลฯ
+            logging.debug(f"libtesseract C API incomplete ({path}): {e}")
+            continue
+        logging.info(f"OCR engine: libtesseract {api.version} via C API ({path})")
+        return api
+    return None
+
+class _CApiEngine:
+    """TessBaseAPI หนึ่งตัวของ C API: init (โหลด traineddata) ครั้งเดียว แล้วใช้ซ้ำผ่าน _POOL"""
+    def __init__(self, capi, lang, oem, psm, variables=()):
+        self._capi = capi
+        lib = capi.lib
+        self._h = lib.TessBaseAPICreate()
+        if lib.TessBaseAPIInit2(self._h, capi.datapath, lang.encode("utf-8"), int(oem)) != 0:
+            lib.TessBaseAPIDelete(self._h)
+            self._h = None
+            raise RuntimeError(f"libtesseract init failed (lang={lang}, oem={oem})")
+        lib.TessBaseAPISetPageSegMode(self._h, int(psm))
+        for k, v in variables:
+            lib.TessBaseAPISetVariable(self._h, k.encode("utf-8"), str(v).encode("utf-8"))
+        self._buf = None
+
+    def set_image(self, img):
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("RGB" if img.mode in ("RGBA", "P", "CMYK") else "L")
+        bpp = 1 if img.mode == "L" else 3
+        w, h = img.size
+        # เก็บ buffer ไว้จนกว่าจะ Clear: tesseract ไม่คัดลอกข้อมูลภาพทันที
+        self._buf = img.tobytes()
+        self._capi.lib.TessBaseAPISetImage(self._h, self._buf, w, h, bpp, w * bpp)
+
+    def recognize(self, timeout_ms):
+        lib = self._capi.lib
+        monitor = lib.TessMonitorCreate()
+        try:
+            lib.TessMonitorSetDeadlineMSecs(monitor, int(timeout_ms))
+            return lib.TessBaseAPIRecognize(self._h, monitor) == 0
+        finally:
+            lib.TessMonitorDelete(monitor)
+
+    def tsv_data(self):
+        lib = self._capi.lib
+        ptr = lib.TessBaseAPIGetTsvText(self._h, 0)
+        if not ptr:
+            return _empty_data()
+        try:
+            tsv = ctypes.string_at(ptr).decode("utf-8", "replace")
+        finally:
+            lib.TessDeleteText(ptr)
+        return _parse_tsv(tsv)
+
+    def detect_script(self):
+        deg, sname = ctypes.c_int(0), ctypes.c_char_p()
+        oconf, sconf = ctypes.c_float(0.0), ctypes.c_float(0.0)
+        ok = self._capi.lib.TessBaseAPIDetectOrientationScript(
+            self._h, ctypes.byref(deg), ctypes.byref(oconf), ctypes.byref(sname), ctypes.byref(sconf))
+        if not ok or not sname.value:
+            return None
+        return sname.value.decode("utf-8", "replace"), float(sconf.value)
+
+    def Clear(self):
+        self._capi.lib.TessBaseAPIClear(self._h)
+        self._buf = None
+
+    def End(self):
+        if self._h is not None:
+            self._capi.lib.TessBaseAPIEnd(self._h)
+            self._capi.lib.TessBaseAPIDelete(self._h)
+            self._h = None
+        self._buf = None
+
+def _parse_tsv(tsv):
+    """TSV ของ TessBaseAPIGetTsvText (ไม่มีแถวหัวตาราง) → dict แบบ pytesseract Output.DICT"""
+    data = _empty_data()
+    for row in tsv.splitlines():
+        cols = row.split("\t")
+        if len(cols) < 11:
+            continue
+        try:
+            ints = [int(v) for v in cols[:10]]
+            conf = float(cols[10])
+        except ValueError:
+            continue
+        for k, v in zip(_TSV_INT_KEYS, ints):
+            data[k].append(v)
+        data["conf"].append(conf)
+        data["text"].append(cols[11] if len(cols) > 11 else "")
+    return data
+
+def _capi_image_to_data(img, lang, oem, psm, variables, timeout):
+    # ตัวแปร config อยู่ในคีย์: C API อ่านค่าเดิมคืนไม่ได้ทุกชนิด → ไม่ตั้ง/คืนค่าบน engine ที่ใช้ร่วมกัน
+    key = ("capi", lang, oem, psm, tuple(sorted(variables.items())))
+    api = _acquire_engine(key, lambda: _CApiEngine(_CAPI, lang, oem, psm, key[4]), lang)
+    healthy = False
+    abandoned = False
+    try:
+        api.set_image(img)
+        finished, ok = _run_with_watchdog(lambda: api.recognize(timeout * 1000), timeout + 5.0)
+        if not finished:
+            abandoned = True
+            logging.warning(f"OCR watchdog: recognition exceeded {timeout:.0f}s (lang={lang}, psm={psm}); engine dropped")
+            return None
+        if not ok:
+            logging.warning(f"OCR timeout after {timeout:.0f}s (lang={lang}, psm={psm})")
+            api.Clear()
+            healthy = True
+            return None
+        data = api.tsv_data()
+        api.Clear()
+        healthy = True
+        return data
+    finally:
+        if healthy:
+            _POOL.release(key, api)
+        elif not abandoned:
+            _POOL.discard(api)
+
+# ---- เลือก backend (ครั้งเดียวต่อโปรเซส) ----
+_CAPI = None
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+_FALLBACK_WARNED = False
+
+def _backend():
+    """"tesserocr" | "capi" | "pytesseract" | None"""
+    global _BACKEND, _CAPI
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                if tesserocr is not None:
+                    backend = "tesserocr"
+                else:
+                    _CAPI = _load_capi()
+                    if _CAPI is not None:
+                        backend = "capi"
+                    elif pytesseract is not None:
+                        backend = "pytesseract"
+                    else:
+                        backend = ""
+                _BACKEND = backend
+    return _BACKEND or None
+
+def _warn_subprocess_fallback():
+    global _FALLBACK_WARNED
+    if _FALLBACK_WARNED:
+        return
+    _FALLBACK_WARNED = True
+    logging.warning(
+        "OCR: no in-process tesseract engine (tesserocr not installed, libtesseract not found next to "
+        f"tesseract or via {TESSERACT_LIB_ENV}); falling back to pytesseract, one tesseract process per call (slow)"
+    )
+
+def image_to_data(img, lang="eng", config="", timeout=DEFAULT_TIMEOUT_S):
+    """
+    เหมือน pytesseract.image_to_data(..., output_type=Output.DICT) แต่ใช้ engine ถาวรถ้ามี
+    คืน None เมื่อ OCR ล้มเหลวหรือเกินเวลา
+    """
+    backend = _backend()
+    if backend in ("tesserocr", "capi"):
+        oem, psm, variables = parse_config(config)
+        fn = _tesserocr_image_to_data if backend == "tesserocr" else _capi_image_to_data
+        try:
+            return fn(img, lang, oem, psm, variables, float(timeout))
+        except Exception as e:
+            logging.debug(f"{backend} failed (lang={lang}, cfg={config!r}): {e}")
+            return None
+
+    if backend is None:
+        return None
+    _warn_subprocess_fallback()
+    try:
+        return pytesseract.image_to_data(
+            img, lang=lang, config=config, output_type=pytesseract.Output.DICT, timeout=timeout
+        )
+    except pytesseract.TesseractError as e:
+        if "Failed loading language" in str(e) or "Error opening data file" in str(e):
+            _FAILED_LANGS.add(lang)
+        logging.debug(f"tesseract failed (lang={lang}, cfg={config!r}): {e}")
+        return None
+    except RuntimeError as e:
+        # pytesseract ฆ่า subprocess เมื่อเกิน timeout
+        logging.warning(f"OCR timeout after {timeout:.0f}s (lang={lang}, cfg={config!r}): {e}")
+        return None
+    except Exception:
+        return None
+
+_ENGINE_ID = None
+
+def engine_id():
+    """backend + รุ่นของ tesseract (ใช้เป็นส่วนหนึ่งของ key cache ผล OCR)"""
+    global _ENGINE_ID
+    if _ENGINE_ID is None:
+        ver = ""
+        try:
+            backend = _backend()
+            if backend == "tesserocr":
+                ver = "tesserocr:" + str(tesserocr.tesseract_version()).splitlines()[0]
+            elif backend == "capi":
+                ver = "capi:" + _CAPI.version
+            elif backend == "pytesseract":
+                ver = "pytesseract:" + str(pytesseract.get_tesseract_version())
+        except Exception:
+            pass
+        _ENGINE_ID = ver
+    return _ENGINE_ID
+
+def detect_script(img, timeout=DEFAULT_TIMEOUT_S):
+    """
+    tesseract OSD (psm 0, ต้องมี osd.traineddata) → (ชื่อ script เช่น "Latin", "Cyrillic", "Thai", ความมั่นใจ)
+    คืน None เมื่อไม่มี engine / ไม่มี osd.traineddata / ตัวอักษรน้อยเกินกว่าจะบอกได้
+    """
+    backend = _backend()
+    if backend in ("tesserocr", "capi"):
+        key = ("osd", 3, 0) if backend == "tesserocr" else ("capi", "osd", 3, 0, ())
+        factory = ((lambda: PyTessBaseAPI(lang="osd", oem=3, psm=0)) if backend == "tesserocr"
+                   else (lambda: _CApiEngine(_CAPI, "osd", 3, 0)))
+        try:
+            api = _POOL.acquire(key, factory)
+        except Exception as e:
+            logging.debug(f"OSD engine unavailable: {e}")
+            return None
+        healthy = False
+        abandoned = False
+        try:
+            if backend == "tesserocr":
+                api.SetImage(img)
+                finished, res = _run_with_watchdog(api.DetectOrientationScript, timeout)
+                if finished:
+                    res = ((res["script_name"], float(res.get("script_conf") or 0.0))
+                           if res and res.get("script_name") else None)
+            else:
+                api.set_image(img)
+                finished, res = _run_with_watchdog(api.detect_script, timeout)
+            if not finished:
+                # thread ยังถือ engine อยู่ → ห้าม End()/ใช้ซ้ำ
+                abandoned = True
+                return None
+            api.Clear()
+            healthy = True
+            return res
+        except Exception as e:
+            logging.debug(f"{backend} OSD failed: {e}")
+            return None
+        finally:
+            if healthy:
+                _POOL.release(key, api)
+            elif not abandoned:
+                _POOL.discard(api)
+
+    if backend is None:
+        return None
+    _warn_subprocess_fallback()
+    try:
+        osd = pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT, timeout=timeout)
+    except Exception as e:
+        # "Too few characters" และ osd.traineddata ไม่มี → ไม่ใช่ข้อผิดพลาดของงาน
+        logging.debug(f"OSD failed: {e}")
+        return None
+    name = osd.get("script")
+    if not name:
+        return None
+    return name, float(osd.get("script_conf") or 0.0)
+
+def shutdown():
+    """ปิด engine ที่ค้างอยู่ทั้งหมด (เรียกตอนปิดแอป/จบ worker)"""
+    _POOL.close()
@@ -0,0 +1,172 @@
+import unicodedata
+from functools import lru_cache
+
+
+# script ของ traineddata แต่ละภาษา (ภาษาที่ไม่อยู่ในตารางถูกเก็บไว้เสมอ)
+LANG_SCRIPT = {
+    "eng": "Latin", "spa": "Latin", "fra": "Latin", "por": "Latin", "ita": "Latin", "deu": "Latin",
+    "nld": "Latin", "swe": "Latin", "fin": "Latin", "dan": "Latin", "nor": "Latin", "pol": "Latin",
+    "ces": "Latin", "slk": "Latin", "hun": "Latin", "tur": "Latin", "ron": "Latin", "hrv": "Latin",
+    "slv": "Latin", "lit": "Latin", "lav": "Latin", "est": "Latin", "vie": "Latin", "ind": "Latin",
+    "rus": "Cyrillic", "ukr": "Cyrillic", "bul": "Cyrillic", "srp": "Cyrillic",
+    "ell": "Greek",
+    "ara": "Arabic", "fas": "Arabic", "urd": "Arabic",
+    "heb": "Hebrew",
+    "tha": "Thai",
+    "chi_sim": "Han", "chi_tra": "Han",
+    "jpn": "Japanese",
+    "kor": "Hangul",
+}
+
+# script ที่แต่ละ traineddata อ่านได้ (jpn อ่านทั้งคันจิและคานะ)
+LANG_EXTRA_SCRIPTS = {"jpn": ("Han",)}
+
+# คำแรกของชื่อ Unicode → script
+_UNICODE_SCRIPT = {
+    "LATIN": "Latin", "CYRILLIC": "Cyrillic", "GREEK": "Greek", "ARABIC": "Arabic",
+    "HEBREW": "Hebrew", "THAI": "Thai", "CJK": "Han", "HIRAGANA": "Japanese",
+    "KATAKANA": "Japanese", "HANGUL": "Hangul",
+}
+
+# ชื่อ script จาก tesseract OSD → script
+_OSD_SCRIPT = {
+    "Latin": "Latin", "Cyrillic": "Cyrillic", "Greek": "Greek", "Arabic": "Arabic",
+    "Hebrew": "Hebrew", "Thai": "Thai", "Han": "Han", "HanS": "Han", "HanT": "Han",
+    "Japanese": "Japanese", "Katakana": "Japanese", "Hiragana": "Japanese",
+    "Hangul": "Hangul", "Korean": "Hangul",
+}
+
+# ตัวอักษรเฉพาะของภาษาละติน (ใช้แคบชุดภาษาของรอบ fast เมื่อชั้นข้อความมีข้อความละตินมากพอ)
+LATIN_HINTS = {
+    "spa": "ñ¿¡",
+    "fra": "çœàâèêëîïûùÿ",
+    "por": "ãõçâêôà",
+    "ita": "àèéìòù",
+    "deu": "äöüß",
+    "nld": "ĳëï",
+    "swe": "åäö",
+    "fin": "äö",
+    "dan": "æøå",
+    "nor": "æøå",
+    "pol": "ąćęłńśźż",
+    "ces": "ěščřžůťď",
+    "slk": "ľĺŕäôťď",
+    "hun": "őű",
+    "tur": "şğı",
+    "ron": "ăâîșț",
+}
+
+# script ต้องมีตัวอักษรอย่างน้อยเท่านี้ (และสัดส่วนขั้นต่ำ) จึงนับว่าอยู่บนหน้า
+SCRIPT_MIN_CHARS = 3
+SCRIPT_MIN_SHARE = 0.02
+# จำนวนตัวอักษรละตินขั้นต่ำก่อนเชื่อว่าภาษาที่ไม่มีตัวอักษรเฉพาะปรากฏเลย "ไม่อยู่บนหน้า"
+LATIN_NARROW_MIN_CHARS = 80
+# OSD ที่ความมั่นใจต่ำกว่านี้ไม่นำมาใช้
+OSD_MIN_CONF = 1.0
+
+
+@lru_cache(maxsize=4096)
+def _char_script(ch):
+    try:
+        return _UNICODE_SCRIPT.get(unicodedata.name(ch).split(" ", 1)[0])
+    except ValueError:
+        return None
+
+def text_scripts(text):
+    """นับตัวอักษรต่อ script ของข้อความ → dict script → จำนวน"""
+    counts = {}
+    for ch in text or "":
+        if not ch.isalpha():
+            continue
+        sc = _char_script(ch)
+        if sc is not None:
+            counts[sc] = counts.get(sc, 0) + 1
+    return counts
+
+def _present_scripts(counts):
+    total = sum(counts.values())
+    if not total:
+        return set()
+    return {sc for sc, n in counts.items()
+            if n >= SCRIPT_MIN_CHARS and n >= SCRIPT_MIN_SHARE * total}
+
+def osd_script(osd):
+    """ผล ocr_engine.detect_script → script (None ถ้าไม่มี/ความมั่นใจต่ำ)"""
+    if not osd:
+        return None
+    name, conf = osd
+    if conf is not None and conf < OSD_MIN_CONF:
+        return None
+    return _OSD_SCRIPT.get(name)
+
+def split_langs(lang):
+    out = []
+    for l in (lang or "").split("+"):
+        l = l.strip()
+        if l and l not in out:
+            out.append(l)
+    return out
+
+def _lang_scripts(lang):
+    sc = LANG_SCRIPT.get(lang)
+    return None if sc is None else (sc,) + LANG_EXTRA_SCRIPTS.get(lang, ())
+
+# เก็บไว้เสมอถ้าอยู่ในชุดที่ขอ: ตัวเลข/รหัสสินค้า/เครื่องหมายบนบรรจุภัณฑ์เป็นละตินแทบทุกหน้า และโมเดลเล็ก
+ALWAYS_KEEP_LANGS = ("eng",)
+
+def _keep_for_scripts(langs, scripts):
+    keep = []
+    for l in langs:
+        ls = _lang_scripts(l)
+        if ls is None or l in ALWAYS_KEEP_LANGS or any(s in scripts for s in ls):
+            keep.append(l)
+    # ไม่เหลือภาษาที่ script ตรงกับที่พบเลย → ไม่ได้แคบลงจริง
+    if not any(_lang_scripts(l) and l not in ALWAYS_KEEP_LANGS for l in keep) \
+            and not any(l in ALWAYS_KEEP_LANGS and "Latin" in scripts for l in keep):
+        return None
+    return keep
+
+def _narrow_latin(langs, text, latin_chars):
+    """เก็บ eng (หรือภาษาละตินแรก) + ภาษาละตินที่มีตัวอักษรเฉพาะในข้อความ"""
+    if latin_chars < LATIN_NARROW_MIN_CHARS:
+        return langs
+    low = (text or "").lower()
+    latin = [l for l in langs if LANG_SCRIPT.get(l) == "Latin"]
+    if not latin:
+        return langs
+    base = "eng" if "eng" in latin else latin[0]
+    keep = []
+    for l in langs:
+        if LANG_SCRIPT.get(l) != "Latin" or l == base:
+            keep.append(l)
+        elif any(c in low for c in LATIN_HINTS.get(l, "")):
+            keep.append(l)
+    return keep
+
+def choose_ocr_langs(fast_lang, full_lang, text="", osd=None):
+    """
+    เลือกชุดภาษา tesseract ที่เล็กที่สุดสำหรับหน้า/บริเวณ จากชุดที่ขอ (fast_lang/full_lang = ขอบเขตสูงสุด)
+    - script จาก Unicode ของชั้นข้อความ (text) รวมกับ script จาก tesseract OSD (osd = (ชื่อ, conf))
+    - full: ภาษาที่ script ตรงกับที่พบ
+    - fast: เหมือน full แต่ภาษาละตินเหลือ eng + ภาษาที่มีตัวอักษรเฉพาะในชั้นข้อความ
+      (รอบ full ยังเป็นตาข่ายรองรับเมื่อรอบ fast ได้ผลน้อย)
+    ตรวจไม่พบ script หรือชุดที่ได้ว่าง → ใช้ชุดที่ขอตามเดิม
+    คืน (fast, full, info) โดย info = {"scripts", "osd", "source"}
+    """
+    counts = text_scripts(text)
+    scripts = _present_scripts(counts)
+    o = osd_script(osd)
+    if o:
+        scripts.add(o)
+    info = {"scripts": sorted(scripts), "osd": list(osd) if osd else None, "source": "requested"}
+    if not scripts:
+        return fast_lang, full_lang, info
+
+    full_keep = _keep_for_scripts(split_langs(full_lang), scripts)
+    fast_keep = _keep_for_scripts(split_langs(fast_lang), scripts)
+    if full_keep is None or fast_keep is None:
+        return fast_lang, full_lang, info
+    fast_keep = _narrow_latin(fast_keep, text, counts.get("Latin", 0))
+
+    info["source"] = "auto"
+    return "+".join(fast_keep), "+".join(full_keep), info
@@ -0,0 +1,153 @@
+import sys
+from collections.abc import Mapping, MutableMapping
+
+
+# คีย์ที่เก็บใน slot; คีย์อื่น (เช่น bbox_px ระหว่างจัดบรรทัด OCR) ไปอยู่ใน _extra
+_KEYS = ("text", "bold", "italic", "underline", "size_pt", "size_mm", "size_unit",
+         "font", "bbox", "source", "level", "confidence", "page_no")
+_KEY_BIT = {k: 1 << i for i, k in enumerate(_KEYS)}
+
+# bold/italic/underline เป็น tri-state (None/True/False) → 2 บิตต่อคีย์: มีค่า + ค่า
+_FLAG_SHIFT = {"bold": 0, "italic": 2, "underline": 4}
+
+# ตารางฟอนต์ร่วมทั้งโปรเซส: item เก็บแค่ index
+_FONT_IDS = {}
+_FONT_NAMES = []
+
+def _font_id(name):
+    name = name if isinstance(name, str) else str(name)
+    fid = _FONT_IDS.get(name)
+    if fid is None:
+        fid = len(_FONT_NAMES)
+        _FONT_NAMES.append(sys.intern(name))
+        _FONT_IDS[name] = fid
+    return fid
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+_MISSING = object()
+
+class PageItem(MutableMapping):
+    """
+    item ข้อความหนึ่งรายการ (span / line / คำ OCR) แบบ __slots__ แทน dict ~12 คีย์
+    ใช้ได้เหมือน dict (get / [] / in / pop / items ...) ผู้ใช้เดิมใน checker / checklist_loader ไม่ต้องแก้
+    ฟอนต์เก็บเป็น index ในตารางร่วม, สไตล์เก็บเป็น bitfield; pickle/JSON ผ่าน to_dict()
+    """
+    __slots__ = ("_present", "_flags", "_font", "text", "size_pt", "size_mm", "size_unit",
+                 "bbox", "source", "level", "confidence", "page_no", "_extra")
+
+    def __init__(self, data=None, **kw):
+        self._present = 0
+        self._flags = 0
+        self._extra = None
+        if data is not None:
+            for k, v in (data.items() if isinstance(data, Mapping) else data):
+                self[k] = v
+        for k, v in kw.items():
+            self[k] = v
+
+    @classmethod
+    def from_dict(cls, d):
+        return d if isinstance(d, cls) else cls(d)
+
+    # ---- Mapping ----
+    def __getitem__(self, key):
+        bit = _KEY_BIT.get(key)
+        if bit is None:
+            if self._extra is not None and key in self._extra:
+                return self._extra[key]
+            raise KeyError(key)
+        if not (self._present & bit):
+            raise KeyError(key)
+        shift = _FLAG_SHIFT.get(key)
+        if shift is not None:
+            f = (self._flags >> shift) & 3
+            return None if not (f & 1) else bool(f & 2)
+        if key == "font":
+            return _FONT_NAMES[self._font]
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        bit = _KEY_BIT.get(key)
+        if bit is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        self._present |= bit
+        shift = _FLAG_SHIFT.get(key)
+        if shift is not None:
+            f = 0 if value is None else (1 | (2 if value else 0))
+            self._flags = (self._flags & ~(3 << shift)) | (f << shift)
+        elif key == "font":
+            self._font = _font_id(value if value is not None else "")
+        else:
+            setattr(self, key, _intern(value))
+
+    def __delitem__(self, key):
+        bit = _KEY_BIT.get(key)
+        if bit is None:
+            if self._extra is None or key not in self._extra:
+                raise KeyError(key)
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+            return
+        if not (self._present & bit):
+            raise KeyError(key)
+        self._present &= ~bit
+        if key not in _FLAG_SHIFT and key != "font":
+            setattr(self, key, None)
+
+    def __iter__(self):
+        p = self._present
+        for k in _KEYS:
+            if p & _KEY_BIT[k]:
+                yield k
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self):
+        return bin(self._present).count("1") + (len(self._extra) if self._extra else 0)
+
+    def __contains__(self, key):
+        bit = _KEY_BIT.get(key)
+        if bit is None:
+            return self._extra is not None and key in self._extra
+        return bool(self._present & bit)
+
+    # get/pop ถูกเรียกถี่มาก → ไม่ผ่าน try/KeyError ของ MutableMapping
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def pop(self, key, default=_MISSING):
+        if key in self:
+            v = self[key]
+            del self[key]
+            return v
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PageItem({self.to_dict()!r})"
+
+    def copy(self):
+        return PageItem(self)
+
+    def to_dict(self):
+        return {k: self[k] for k in self}
+
+    def __reduce__(self):
+        # index ฟอนต์ต่างกันข้ามโปรเซส → ส่งเป็น dict ธรรมดา
+        return (PageItem.from_dict, (self.to_dict(),))
@@ -1,15 +1,28 @@
 import re
+import json
+import bisect
 import fitz  
+import time
+import hashlib
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from extract_cache import PageCache, OcrCache
+from page_items import PageItem
+from pdf_session import open_pdf_source
+from job_control import Cancelled, CancelToken, is_cancelled, report
+import extract_stats
+from extract_stats import ExtractStats, timed
 from PIL import Image as _PIL_Image
 
 
-# OCR text 
+# OCR text (engine ถาวรผ่าน ocr_engine; fallback เป็น pytesseract)
+import ocr_engine
+from ocr_langs import choose_ocr_langs
 try:
-    import pytesseract
     from PIL import Image
 except Exception:
-    pytesseract = None
     Image = None
 
 # ตรวจเส้นใต้จากภาพ
@@ -20,39 +33,323 @@ except Exception:
     cv2 = None
     np = None
 
-# Helpers to detect graphic underlines
-def _collect_underline_segments(page):
-    segs = []
-    try:
-        for d in page.get_drawings():
-            for it in d.get("items", []):
-                op = it[0]
-                if op == "l":  # เส้นตรง
-                    p0, p1 = it[1], it[2]
-                    if abs(p0.y - p1.y) <= 1.2 and abs(p1.x - p0.x) >= 4:
-                        segs.append((min(p0.x, p1.x), (p0.y + p1.y)/2.0, max(p0.x, p1.x)))
-                elif op == "re": 
-                    rect = it[1]
-                    if rect.height <= 2.0 and rect.width >= 4.0:
-                        yline = rect.y1 - rect.height/2.0
-                        segs.append((rect.x0, yline, rect.x1))
-    except Exception:
-        pass
-    return segs
+# OCR fast/full pass (ใช้เป็นส่วนหนึ่งของ cache key ด้วย)
+OCR_FAST_ZOOMS   = [2.6, 3.0]
+OCR_FAST_CONF    = 35
+OCR_FAST_CONFIGS = [
+    "--oem 3 --psm 6 -c preserve_interword_spaces=1",
+    "--oem 3 --psm 11 -c preserve_interword_spaces=1",
+]
+OCR_FULL_ZOOMS   = [3.6, 4.0]
+OCR_FULL_CONF    = 30
+OCR_FULL_CONFIGS = [
+    "--oem 3 --psm 6 -c preserve_interword_spaces=1",
+    "--oem 3 --psm 7 -c preserve_interword_spaces=1",
+    "--oem 3 --psm 11 -c preserve_interword_spaces=1",
+]
 
+# Helpers to detect graphic underlines
 def _x_overlap(a0, a1, b0, b1):
     return max(0.0, min(a1, b1) - max(a0, b0))
 
+# ตัวอักษรที่แปลงเป็น outline: path ทึบเล็กที่มีเส้นโค้ง จับกลุ่มตามระยะห่างเทียบความสูง glyph
+OUTLINE_GLYPH_MIN_H = 1.2     # pt
+OUTLINE_GLYPH_MAX_H = 40.0    # pt
+OUTLINE_MIN_GLYPHS  = 5
+OUTLINE_LINK_FACTOR = 0.6     # เชื่อม glyph ที่ห่างกันไม่เกิน 0.6 × ความสูง
+OUTLINE_MAX_H_RATIO = 2.5     # สูงต่างกันเกินนี้ไม่รวมกลุ่ม (พาดหัวกับตัวเล็ก)
+OUTLINE_GRID_PT     = 24.0
+OUTLINE_REGION_PAD_PT = 2.0
+
+class _PageGeometry:
+    """
+    อ่าน page.get_drawings() ครั้งเดียวต่อหน้า แล้วแยกเป็นเส้นตรง / สี่เหลี่ยม
+    เส้นใต้เรียงตาม y (bisect) → ค้นหาเส้นใต้ของ span และจุดตัด H/V ของเครื่องหมาย + เป็น range query
+    """
+    def __init__(self, page):
+        self.page = page
+        self._loaded = False
+        self._prims = []    # (op, x0, y0, x1, y1) ตามลำดับใน drawings; op = "l" | "re"
+        self._ul = None     # เส้นใต้ (sx0, sy, sx1) เรียงตาม sy
+        self._ul_ys = None
+        self.n_paths = 0    # จำนวน path ทั้งหมด (ใช้เป็น feature ของ OCR triage)
+        self._glyphs = []   # (x0, y0, x1, y1) ของ path ทึบเล็กที่มีเส้นโค้ง → ตัวอักษรที่แปลงเป็น outline
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            drawings = self.page.get_drawings()
+            self.n_paths = len(drawings)
+            for d in drawings:
+                items = d.get("items", [])
+                if d.get("fill") is not None and d.get("type") in ("f", "fs"):
+                    self._add_glyph(d.get("rect"), items)
+                for it in items:
+                    op = it[0]
+                    if op == "l":
+                        p0, p1 = it[1], it[2]
+                        self._prims.append(("l", float(p0.x), float(p0.y), float(p1.x), float(p1.y)))
+                    elif op == "re":
+                        r = it[1]
+                        self._prims.append(("re", float(r.x0), float(r.y0), float(r.x1), float(r.y1)))
+        except Exception as e:
+            logging.debug(f"get_drawings failed: {e}")
+
+    def _add_glyph(self, rect, items):
+        if rect is None:
+            return
+        w, h = float(rect.width), float(rect.height)
+        if not (OUTLINE_GLYPH_MIN_H <= h <= OUTLINE_GLYPH_MAX_H) or w <= 0:
+            return
+        n_curves = sum(1 for it in items if it[0] == "c")
+        if n_curves == 0 and len(items) < 4:
+            return
+        # path กว้างมาก = ทั้งคำเป็น compound path เดียว ต้องมีชิ้นส่วนมากพอ
+        if w > 3.0 * h and len(items) < 8:
+            return
+        self._glyphs.append((float(rect.x0), float(rect.y0), float(rect.x1), float(rect.y1)))
+
+    def n_outline_glyphs(self):
+        self._load()
+        return len(self._glyphs)
+
+    def outlined_text_clusters(self, min_glyphs=None):
+        """
+        จับกลุ่ม glyph outline ที่อยู่ชิดกันและสูงใกล้เคียงกัน (grid hash + union-find)
+        คืน list ของ (x0, y0, x1, y1, glyph_h_median, n_glyphs) เฉพาะกลุ่มที่มี ≥ min_glyphs
+        """
+        self._load()
+        gl = self._glyphs
+        if min_glyphs is None:
+            min_glyphs = OUTLINE_MIN_GLYPHS
+        if len(gl) < min_glyphs:
+            return []
+
+        parent = list(range(len(gl)))
+
+        def _find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        cell = OUTLINE_GRID_PT
+        grid = {}
+        for i, (x0, y0, x1, y1) in enumerate(gl):
+            h = y1 - y0
+            m = OUTLINE_LINK_FACTOR * h
+            ex = (x0 - m, y0 - m, x1 + m, y1 + m)
+            seen = set()
+            for cx in range(int(ex[0] // cell), int(ex[2] // cell) + 1):
+                for cy in range(int(ex[1] // cell), int(ex[3] // cell) + 1):
+                    bucket = grid.setdefault((cx, cy), [])
+                    for j in bucket:
+                        if j in seen:
+                            continue
+                        seen.add(j)
+                        bx0, by0, bx1, by1 = gl[j]
+                        hj = by1 - by0
+                        if max(h, hj) > OUTLINE_MAX_H_RATIO * min(h, hj):
+                            continue
+                        if ex[0] <= bx1 and bx0 <= ex[2] and ex[1] <= by1 and by0 <= ex[3]:
+                            ri, rj = _find(i), _find(j)
+                            if ri != rj:
+                                parent[ri] = rj
+                    bucket.append(i)
+
+        groups = {}
+        for i in range(len(gl)):
+            groups.setdefault(_find(i), []).append(gl[i])
+
+        out = []
+        for boxes in groups.values():
+            if len(boxes) < min_glyphs:
+                continue
+            hs = sorted(b[3] - b[1] for b in boxes)
+            out.append((min(b[0] for b in boxes), min(b[1] for b in boxes),
+                        max(b[2] for b in boxes), max(b[3] for b in boxes),
+                        hs[len(hs) // 2], len(boxes)))
+        out.sort(key=lambda c: (c[1], c[0]))
+        return out
+
+    def underline_segments(self):
+        """เส้นแนวนอน/สี่เหลี่ยมบางที่อาจเป็นเส้นใต้ (sx0, sy, sx1) เรียงตาม sy"""
+        if self._ul is None:
+            self._load()
+            segs = []
+            for (op, x0, y0, x1, y1) in self._prims:
+                if op == "l":
+                    if abs(y0 - y1) <= 1.2 and abs(x1 - x0) >= 4:
+                        segs.append((min(x0, x1), (y0 + y1) / 2.0, max(x0, x1)))
+                else:
+                    w, h = x1 - x0, y1 - y0
+                    if h <= 2.0 and w >= 4.0:
+                        segs.append((x0, y1 - h / 2.0, x1))
+            segs.sort(key=lambda s: s[1])
+            self._ul = segs
+            self._ul_ys = [s[1] for s in segs]
+        return self._ul
+
+    def has_underline(self, bbox, y_tol=2.0, min_overlap=0.5):
+        """มีเส้นใต้ห่างจากขอบล่างของ bbox ไม่เกิน y_tol และซ้อนแกน x อย่างน้อย min_overlap ของความกว้าง"""
+        segs = self.underline_segments()
+        if not segs:
+            return False
+        x0, y0, x1, y1 = bbox
+        width = max(1.0, x1 - x0)
+        lo = bisect.bisect_left(self._ul_ys, y1 - y_tol)
+        hi = bisect.bisect_right(self._ul_ys, y1 + y_tol)
+        for sx0, sy, sx1 in segs[lo:hi]:
+            if _x_overlap(x0, x1, sx0, sx1) >= min_overlap * width:
+                return True
+        return False
+
+    def plus_strokes(self, min_len, max_len, thin):
+        """แยกเส้นสั้นแนวนอน (x0, y, x1) / แนวตั้ง (x, y0, y1) ที่อาจประกอบเป็นเครื่องหมาย +"""
+        self._load()
+        Hs, Vs = [], []
+        for (op, ax, ay, bx, by) in self._prims:
+            if op == "l":
+                dx, dy = bx - ax, by - ay
+                length = (dx * dx + dy * dy) ** 0.5
+                if length < min_len or length > max_len:
+                    continue
+                # ใช้มุมเพื่อจัดแนว
+                if abs(dy) <= 0.8:
+                    x0, x1 = sorted((ax, bx))
+                    Hs.append((x0, (ay + by) / 2.0, x1))
+                elif abs(dx) <= 0.8:
+                    y0, y1 = sorted((ay, by))
+                    Vs.append(((ax + bx) / 2.0, y0, y1))
+            else:
+                w, h = bx - ax, by - ay
+                if h <= thin and w >= min_len and w <= max_len:
+                    Hs.append((ax, (ay + by) / 2.0, bx))
+                elif w <= thin and h >= min_len and h <= max_len:
+                    Vs.append(((ax + bx) / 2.0, ay, by))
+        return Hs, Vs
+
 def _pt_to_mm(pt: float) -> float:
     return (pt or 0.0) * 25.4 / 72.0
 
-def _render_page_to_pil(page, zoom=2.0):
+def _render_page_to_pil(page, zoom=2.0, clip=None):
     mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
+    pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
     mode = "RGBA" if pix.alpha else "RGB"
     img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
     return img, zoom
 
+# หน้าใหญ่ (dieline A1/A0): ภาพเกินงบนี้จะไม่เรนเดอร์ทั้งหน้า แต่เรนเดอร์/OCR เป็น tile ที่ซ้อนกัน
+OCR_MAX_TILE_PX      = 4096    # ด้านยาวสุดของ tile (px); ทั้งหน้าเกิน OCR_MAX_TILE_PX² พิกเซล → แบ่ง tile
+OCR_TILE_OVERLAP_PT  = 36.0    # ส่วนซ้อนระหว่าง tile ต้องกว้างกว่าคำทั่วไป คำที่ถูกตัดที่รอยต่อจะเห็นเต็มใน tile ข้างเคียง
+OCR_TILE_OVERLAP_PX  = 512     # ส่วนซ้อนขั้นต่ำ (px ที่ซูม OCR): คำยาว ~20 ตัวอักษรที่ความสูง OCR_TARGET_GLYPH_PX
+                               # ซูมต่ำ (ตัวอักษรใหญ่บน dieline A0) → ส่วนซ้อนเป็น pt กว้างขึ้นตาม
+OCR_TILE_SEAM_PT     = 2.0     # คำที่ชิดขอบด้านในของ tile น้อยกว่านี้ถือว่าถูกตัด
+
+class _PageRaster:
+    """
+    เรนเดอร์หน้าที่ซูมที่ขอ (ไม่เกิน max_zoom) และย่อ (INTER_AREA) จากภาพที่เรนเดอร์ไว้แล้วที่ซูมสูงกว่าถ้ามี
+    → ซูมต่ำ (ตัวอักษรใหญ่) ไม่ต้องเรนเดอร์ที่ max_zoom ก่อน; หลายซูมให้ขอซูมสูงสุดก่อนเพื่อเรนเดอร์ครั้งเดียว
+    เก็บ gray / CLAHE ต่อซูมไว้ให้ทุกขั้นตอน OCR/CV ของหน้าเดียวกันใช้ร่วมกัน → เรียก release() เมื่อจบหน้า
+    clip (fitz.Rect, pt) → เรนเดอร์เฉพาะบริเวณนั้น; พิกัดพิกเซลนับจากมุม clip (ดู origin)
+    """
+    def __init__(self, page, max_zoom=4.0, clip=None, max_tile_px=None):
+        self.page = page
+        self.max_zoom = float(max_zoom)
+        self.clip = clip
+        self.max_tile_px = int(max_tile_px or OCR_MAX_TILE_PX)
+        self.origin = (float(clip.x0), float(clip.y0)) if clip is not None else (0.0, 0.0)
+        self._rgb = {}
+        self._gray = {}
+        self._ocr_gray = {}
+
+    @staticmethod
+    def _key(zoom):
+        return round(float(zoom), 3)
+
+    def pil(self, zoom):
+        if np is None:
+            img, _z = _render_page_to_pil(self.page, zoom=zoom, clip=self.clip)
+            return img.convert("RGB")
+        return Image.fromarray(self.rgb(zoom))
+
+    def rgb(self, zoom):
+        z = self._key(zoom)
+        arr = self._rgb.get(z)
+        if arr is not None:
+            return arr
+        # ภาพที่มีอยู่แล้วที่ซูมสูงกว่า (ใกล้สุด) → ย่อ; ไม่มี → เรนเดอร์ตรงที่ซูมนี้
+        src = min((k for k in self._rgb if k > z), default=None) if cv2 is not None else None
+        if src is None:
+            img, _z = _render_page_to_pil(self.page, zoom=z, clip=self.clip)
+            arr = np.array(img.convert("RGB"))
+        else:
+            base = self._rgb[src]
+            H, W = base.shape[:2]
+            w = max(1, int(round(W * z / src)))
+            h = max(1, int(round(H * z / src)))
+            arr = cv2.resize(base, (w, h), interpolation=cv2.INTER_AREA)
+        self._rgb[z] = arr
+        return arr
+
+    def gray(self, zoom):
+        z = self._key(zoom)
+        g = self._gray.get(z)
+        if g is None:
+            g = cv2.cvtColor(self.rgb(z), cv2.COLOR_RGB2GRAY)
+            self._gray[z] = g
+        return g
+
+    def ocr_gray(self, zoom):
+        """เลือกช่องเทาที่คอนทราสต์สูงกว่า (RGB→GRAY หรือ Y ของ YCrCb) แล้วทำ CLAHE"""
+        z = self._key(zoom)
+        g = self._ocr_gray.get(z)
+        if g is None:
+            arr = self.rgb(z)
+            g_r = self.gray(z)
+            g_y = cv2.cvtColor(arr, cv2.COLOR_RGB2YCrCb)[:, :, 0]
+            g = g_r if g_r.std() >= g_y.std() else g_y
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            g = clahe.apply(g)
+            self._ocr_gray[z] = g
+        return g
+
+    def rect(self):
+        return self.clip if self.clip is not None else self.page.rect
+
+    def size_px(self, zoom):
+        r = self.rect()
+        return max(1, int(round(r.width * zoom))), max(1, int(round(r.height * zoom)))
+
+    def is_huge(self, zoom):
+        """ภาพทั้ง raster ที่ซูมนี้เกินงบหน่วยความจำ → ห้ามเรนเดอร์ทั้งภาพ ใช้ crop_rgb / tile แทน"""
+        w, h = self.size_px(zoom)
+        return w * h > self.max_tile_px * self.max_tile_px
+
+    def crop_rgb(self, zoom, x0, y0, x1, y1):
+        """ตัดบริเวณพิกเซล (ที่ซูมนี้) จากภาพที่มีอยู่ หรือเรนเดอร์เฉพาะบริเวณนั้นถ้าภาพเต็มใหญ่เกินงบ"""
+        z = self._key(zoom)
+        arr = self._rgb.get(z)
+        if arr is None and not self.is_huge(z):
+            arr = self.rgb(z)
+        if arr is not None:
+            return arr[y0:y1, x0:x1].copy()
+        ox, oy = self.origin
+        clip = fitz.Rect(ox + x0 / z, oy + y0 / z, ox + x1 / z, oy + y1 / z)
+        img, _z = _render_page_to_pil(self.page, zoom=z, clip=clip)
+        return np.array(img.convert("RGB"))
+
+    def lowres_gray(self, zoom):
+        """gray ซูมต่ำ: ย่อจากภาพที่เรนเดอร์ไว้แล้วถ้ามี ไม่อย่างนั้นเรนเดอร์ตรงที่ซูมนี้ (rgb() ทำให้แล้ว)"""
+        return self.gray(zoom)
+
+    def release(self):
+        self._rgb.clear()
+        self._gray.clear()
+        self._ocr_gray.clear()
+
 def _has_underline_in_roi(img_gray, x, y, w, h):
     if img_gray is None or cv2 is None:
         return None
@@ -84,38 +381,90 @@ def _has_underline_in_roi(img_gray, x, y, w, h):
 def _safe_int(v, lo, hi):
     return max(lo, min(int(v), hi))
 
-def _dedup_extend_items(existing_items, new_items, iou_thresh=0.6):
-    def _norm(s): return (s or "").strip().lower()
-    def _iou(a, b):
-        ax0, ay0, ax1, ay1 = a
-        bx0, by0, bx1, by1 = b
-        inter_x0, inter_y0 = max(ax0, bx0), max(ay0, by0)
-        inter_x1, inter_y1 = min(ax1, bx1), min(ay1, by1)
-        iw, ih = max(0, inter_x1 - inter_x0), max(0, inter_y1 - inter_y0)
-        inter = iw * ih
-        if inter <= 0: return 0.0
-        aarea = (ax1 - ax0) * (ay1 - ay0)
-        barea = (bx1 - bx0) * (by1 - by0)
-        return inter / max(1e-6, (aarea + barea - inter))
-
-    out = existing_items[:]
-    for ni in new_items:
-        keep = True
-        nt = _norm(ni.get("text"))
-        nb = ni.get("bbox")
-        for ei in existing_items:
-            et = _norm(ei.get("text"))
-            eb = ei.get("bbox")
-            if nt and et and nt == et and nb and eb and _iou(nb, eb) >= iou_thresh:
-                keep = False
-                break
-        if keep:
-            out.append(ni)
-    return out
+def _norm_item_text(s):
+    return (s or "").strip().lower()
+
+def _bbox_iou(a, b):
+    ax0, ay0, ax1, ay1 = a
+    bx0, by0, bx1, by1 = b
+    inter_x0, inter_y0 = max(ax0, bx0), max(ay0, by0)
+    inter_x1, inter_y1 = min(ax1, bx1), min(ay1, by1)
+    iw, ih = max(0, inter_x1 - inter_x0), max(0, inter_y1 - inter_y0)
+    inter = iw * ih
+    if inter <= 0: return 0.0
+    aarea = (ax1 - ax0) * (ay1 - ay0)
+    barea = (bx1 - bx0) * (by1 - by0)
+    return inter / max(1e-6, (aarea + barea - inter))
+
+class _PageItemStore:
+    """
+    รายการ item ของหน้า + index สำหรับตัดซ้ำ: ข้อความ (normalize) → grid cell → ดัชนี item
+    ซ้ำ = ข้อความเดียวกันและ IoU ของ bbox >= iou_thresh
+    กล่องที่ IoU > 0 ต้องซ้อนกัน จึงมี cell ร่วมกันอย่างน้อยหนึ่ง cell → เทียบเฉพาะใน bucket เดียวกัน
+    """
+    CELL = 24.0  # ขนาด cell (หน่วยเดียวกับ bbox)
+
+    def __init__(self, items=None):
+        self._items = []
+        self._index = {}
+        for it in items or []:
+            self._add(it)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def items(self):
+        return self._items
+
+    def _cells(self, bbox):
+        c = self.CELL
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                yield (cx, cy)
+
+    def _add(self, it):
+        idx = len(self._items)
+        self._items.append(it)
+        t = _norm_item_text(it.get("text"))
+        b = it.get("bbox")
+        if not (t and b):
+            return
+        grid = self._index.setdefault(t, {})
+        for cell in self._cells(b):
+            grid.setdefault(cell, []).append(idx)
+
+    def _is_dup(self, item, iou_thresh):
+        t = _norm_item_text(item.get("text"))
+        b = item.get("bbox")
+        if not (t and b):
+            return False
+        grid = self._index.get(t)
+        if not grid:
+            return False
+        seen = set()
+        for cell in self._cells(b):
+            for idx in grid.get(cell, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                if _bbox_iou(b, self._items[idx]["bbox"]) >= iou_thresh:
+                    return True
+        return False
 
-def _union_bbox_px(b):
-    x0, y0, x1, y1 = b[0], b[1], b[2], b[3]
-    return [x0, y0, x1, y1]
+    def extend(self, new_items, iou_thresh=0.6):
+        """เพิ่ม item ที่ไม่ซ้ำกับของเดิม (item ใน batch เดียวกันไม่เทียบกันเอง) คืนจำนวนที่เพิ่ม"""
+        with timed("dedup"):
+            keep = [ni for ni in new_items if not self._is_dup(ni, iou_thresh)]
+            for ni in keep:
+                self._add(ni)
+        extract_stats.count("dedup_in", len(new_items))
+        extract_stats.count("dedup_kept", len(keep))
+        return len(keep)
 
 def _merge_bbox_px(b1, b2):
     return [
@@ -220,43 +569,583 @@ def _detect_plus_by_hough(gray_roi):
     except Exception:
         return False
 
-def _group_ocr_words_into_lines(ocr_words):
-    if not ocr_words:
-        return []
+# ---- OCR layout: คำ → บรรทัด → บล็อก ----
+LAYOUT_LINE_TOL     = 0.45   # |cy คำ − cy แถว| ≤ tol × ความสูง → แถวเดียวกัน
+LAYOUT_WORD_GAP     = 1.2    # ช่องว่างแนวนอนในแถว > gap × ความสูง → คนละบรรทัด (คนละคอลัมน์/แผง)
+LAYOUT_BLOCK_VGAP   = 0.8    # ช่องว่างแนวตั้งระหว่างบรรทัด ≤ vgap × ความสูง → บล็อกเดียวกัน
+LAYOUT_BLOCK_XOVER  = 0.3    # ซ้อนแนวนอนขั้นต่ำ (สัดส่วนของบรรทัดที่แคบกว่า) ของบรรทัดในบล็อกเดียวกัน
+LAYOUT_BLOCK_HRATIO = 1.8    # ความสูงบรรทัดต่างกันเกินเท่านี้ → คนละบล็อก (หัวข้อใหญ่ / ข้อความเล็ก)
 
-    # จัดเรียงซ้าย→ขวา, บน→ล่าง
-    ws = sorted(ocr_words, key=lambda w: ( (w["bbox_px"][1]+w["bbox_px"][3])/2.0, w["bbox_px"][0] ))
+def _ocr_rows(words, box_key):
+    """
+    sweep ตาม cy: คำเรียงตามแนวตั้ง แถวที่ยังรับคำได้อยู่ในหน้าต่าง active
+    (cy ของแถวเพิ่มขึ้นตามคำที่รับเท่านั้น → แถวที่หลุดระยะ tol × ความสูงสูงสุดแล้วไม่กลับมาอีก)
+    """
+    order = sorted(words, key=lambda w: (w[box_key][1] + w[box_key][3]) / 2.0)
+    hmax = max(max(1.0, w[box_key][3] - w[box_key][1]) for w in order)
+    rows, active = [], []
+    for w in order:
+        x0, y0, x1, y1 = w[box_key]
+        cy = (y0 + y1) / 2.0
+        h = max(1.0, y1 - y0)
+        if active and cy - active[0]["cy"] > LAYOUT_LINE_TOL * hmax:
+            active = [r for r in active if cy - r["cy"] <= LAYOUT_LINE_TOL * hmax]
+        best, best_d = None, None
+        for r in active:
+            d = abs(cy - r["cy"])
+            if d <= LAYOUT_LINE_TOL * max(h, r["h"]) and (best is None or d < best_d):
+                best, best_d = r, d
+        if best is None:
+            best = {"words": [], "cy_sum": 0.0, "h_sum": 0.0, "cy": cy, "h": h}
+            rows.append(best)
+            active.append(best)
+        best["words"].append(w)
+        best["cy_sum"] += cy
+        best["h_sum"] += h
+        n = len(best["words"])
+        best["cy"] = best["cy_sum"] / n
+        best["h"] = best["h_sum"] / n
+    return rows
+
+def _ocr_lines_from_row(row, box_key):
+    """แยกแถวเป็นบรรทัดที่ช่องว่างแนวนอนกว้าง (คอลัมน์/แผงของอาร์ตเวิร์ก)"""
+    lines = []
+    cur = None
+    for w in sorted(row["words"], key=lambda w: w[box_key][0]):
+        b = w[box_key]
+        h = max(1.0, b[3] - b[1])
+        if cur is not None and (b[0] - cur["bbox"][2]) <= LAYOUT_WORD_GAP * max(cur["h"], h):
+            cur["words"].append(w)
+            cur["bbox"] = _merge_bbox_px(cur["bbox"], b)
+            cur["h_sum"] += h
+            cur["h"] = cur["h_sum"] / len(cur["words"])
+            continue
+        cur = {"words": [w], "bbox": list(b), "h_sum": h, "h": h}
+        lines.append(cur)
+    for ln in lines:
+        ln["cy"] = (ln["bbox"][1] + ln["bbox"][3]) / 2.0
+        del ln["h_sum"]
+    return lines
 
+def _ocr_blocks(lines):
+    """
+    รวมบรรทัดเป็นบล็อก: บรรทัดถัดลงมาในระยะ LAYOUT_BLOCK_VGAP ที่ซ้อนแนวนอนกับบรรทัดสุดท้ายของบล็อก
+    และความสูงใกล้เคียงกัน (sweep ตาม y0; บล็อกที่อยู่เหนือเกินระยะถูกปิด)
+    คืน list ของ {"lines", "bbox"} เรียงตามบรรทัดแรกของบล็อก (บน→ล่าง, ซ้าย→ขวา)
+    """
+    if not lines:
+        return []
+    order = sorted(lines, key=lambda ln: (ln["bbox"][1], ln["bbox"][0]))
+    hmax = max(ln["h"] for ln in order)
+    blocks, active = [], []
+    for ln in order:
+        x0, y0, x1, y1 = ln["bbox"]
+        active = [b for b in active if y0 - b["lines"][-1]["bbox"][3] <= LAYOUT_BLOCK_VGAP * hmax]
+        best, best_gap = None, None
+        for b in active:
+            last = b["lines"][-1]
+            lx0, ly0, lx1, ly1 = last["bbox"]
+            gap = y0 - ly1
+            if gap > LAYOUT_BLOCK_VGAP * max(ln["h"], last["h"]) or y0 < (ly0 + ly1) / 2.0:
+                continue
+            if max(ln["h"], last["h"]) > LAYOUT_BLOCK_HRATIO * min(ln["h"], last["h"]):
+                continue
+            over = min(x1, lx1) - max(x0, lx0)
+            if over < LAYOUT_BLOCK_XOVER * min(x1 - x0, lx1 - lx0):
+                continue
+            if best is None or gap < best_gap:
+                best, best_gap = b, gap
+        if best is None:
+            best = {"lines": [], "bbox": list(ln["bbox"])}
+            blocks.append(best)
+            active.append(best)
+        else:
+            best["bbox"] = _merge_bbox_px(best["bbox"], ln["bbox"])
+        best["lines"].append(ln)
+    return blocks
+
+def _ocr_layout(words, box_key="bbox"):
+    """
+    วิเคราะห์ layout ของคำ OCR (พิกัดหน้า pt; คำอาจมาจากหลายซูม/หลาย tile) → (บรรทัด, บล็อก)
+    แถวจาก sweep ตาม cy → แยกคอลัมน์ด้วยช่องว่างแนวนอน → บรรทัด → บล็อก; เกือบเชิงเส้นตามจำนวนคำ
+    บรรทัด = {"words", "bbox", "cy", "h"}, บล็อก = {"lines", "bbox"}
+    """
+    if not words:
+        return [], []
     lines = []
-    for w in ws:
-        x0,y0,x1,y1 = w["bbox_px"]
-        cy = (y0+y1)/2.0
-        h  = max(1.0, y1-y0)
-        placed = False
+    for row in _ocr_rows(words, box_key):
+        lines.extend(_ocr_lines_from_row(row, box_key))
+    lines.sort(key=lambda ln: (ln["cy"], ln["bbox"][0]))
+    return lines, _ocr_blocks(lines)
+
+def _group_ocr_words_into_lines(ocr_words, box_key="bbox"):
+    """บรรทัดของ _ocr_layout (ไม่รวมบล็อก)"""
+    return _ocr_layout(ocr_words, box_key)[0]
+
+# ลำดับภาษาสำรองเมื่อชุดภาษาที่ขอใช้ไม่ได้ (traineddata ไม่ครบ / engine ล้ม)
+OCR_LANG_BIG  = "eng+spa+fra+por+ita+deu+nld+swe+fin+dan+nor+pol+ces+slk+hun+rus+ell+tur+ara+tha"
+OCR_LANG_LITE = "eng+spa+fra+por+ita+deu+nld+tha"
+OCR_LANG_TINY = "eng+tha"
+OCR_LANG_FALL = "eng"
+
+# เป้าคุณภาพของ OCR planner (ต่อซูม): ถึงเป้าแล้วหยุดทันที
+OCR_TARGET_MEAN_CONF = 70.0
+OCR_TARGET_WORDS     = 3
+OCR_MAX_ATTEMPTS     = 6   # จำนวนครั้งสูงสุดที่เรียก OCR ต่อซูม
+OCR_MAX_STALE        = 2   # ลองติดกันกี่ครั้งโดยคะแนนไม่ดีขึ้นแล้วเลิก
+OCR_PAGE_EXTRA_ATTEMPTS = 12   # ครั้งที่เรียกเพิ่มจากครั้งแรกของแต่ละซูม รวมทั้งหน้า (ทุกบริเวณ/tile/รอบ fast-full)
+
+# ซูมของภาพ OSD (ตรวจ script สำหรับเลือกภาษา OCR อัตโนมัติ)
+OCR_LANG_OSD_ZOOM = 1.5
+
+def _ocr_lang_cascade(ocr_lang):
+    # ชุดที่ขอใช้ไม่ได้ (ส่วนมากคือ traineddata ไม่ครบ) → ลดลงเป็นชุดเล็ก ไม่ขยายเป็น BIG ที่โหลดช้ากว่ามาก
+    if ocr_lang:
+        return (ocr_lang, OCR_LANG_LITE, OCR_LANG_TINY, OCR_LANG_FALL)
+    return (OCR_LANG_BIG, OCR_LANG_LITE, OCR_LANG_TINY, OCR_LANG_FALL)
+
+def _osd_page_script(raster):
+    """tesseract OSD บนภาพหน้าซูมต่ำ → (script, conf) หรือ None"""
+    if cv2 is None or np is None:
+        return None
+    w1, h1 = raster.size_px(1.0)
+    zoom = min(OCR_LANG_OSD_ZOOM, raster.max_tile_px / float(max(1, w1 * h1)) ** 0.5)
+    try:
+        img = _PIL_Image.fromarray(raster.lowres_gray(zoom))
+    except Exception as e:
+        logging.debug(f"OSD render failed: {e}")
+        return None
+    t0 = time.perf_counter()
+    res = ocr_engine.detect_script(img)
+    extract_stats.ocr_call(kind="osd", zoom=round(zoom, 3), psm=0, lang="osd", size=list(img.size),
+                           seconds=round(time.perf_counter() - t0, 4), words=None)
+    return res
 
-        for ln in lines:
-            lcy, lh = ln["cy"], ln["h"]
-            if abs(cy - lcy) <= 0.45 * max(lh, h):
-                if not ln["words"] or (x0 - ln["words"][-1]["bbox_px"][2]) <= 1.2 * max(lh, h):
-                    ln["words"].append(w)
-                    ln["bbox_px"] = _merge_bbox_px(ln["bbox_px"], w["bbox_px"])
-                    ln["cy"] = (ln["cy"]*len(ln["words"]) + cy)/(len(ln["words"])+1)
-                    ln["h"]  = (ln["h"]*len(ln["words"]) + h )/(len(ln["words"])+1)
-                    placed = True
+def _select_page_ocr_langs(raster, raw_spans, features, ocr_lang_fast, ocr_lang_full, scope="page"):
+    """
+    ชุดภาษา OCR ของหน้า: script ของชั้นข้อความ (ถ้าเชื่อถือได้) + OSD ของภาพหน้า
+    → ocr_langs.choose_ocr_langs (ขอบเขตสูงสุด = ocr_lang_fast/full ที่ผู้เรียกขอ)
+    หน้าที่มีชั้นข้อความแต่ OCR ภาพ/ตัวอักษร outline: ข้อความที่ OCR ไม่อยู่ในชั้นข้อความ และ OSD ทั้งหน้าเห็นแต่
+    script หลัก (ป้ายเตือนไทย/อาหรับที่วางเป็นภาพบนหน้าอังกฤษ) → ใช้ชุดที่ขอเต็มชุด
+    """
+    text = ""
+    if features["text_chars"] and features["garbage_ratio"] < TRIAGE_MAX_GARBAGE:
+        if features["n_images"] or scope == "outlines":
+            return ocr_lang_fast, ocr_lang_full, {"scripts": [], "osd": None, "source": "requested",
+                                                  "reason": f"{scope} outside text layer"}
+        text = " ".join((it.get("text") or "") for it in raw_spans)
+    osd = _osd_page_script(raster) if ocr_engine.available() else None
+    return choose_ocr_langs(ocr_lang_fast, ocr_lang_full, text=text, osd=osd)
+
+def _ocr_preprocess_variants(raster, zoom):
+    """
+    ภาพสำหรับ OCR เรียงจากถูก→แพง; denoise/threshold/morphology คำนวณเมื่อ planner ขอเท่านั้น
+    """
+    gray = None
+    if cv2 is not None and np is not None:
+        try:
+            gray = raster.gray(zoom)
+        except Exception:
+            gray = None
+    if gray is None:
+        yield "gray", raster.pil(zoom).convert("L")
+        return
+    yield "gray", _PIL_Image.fromarray(gray)
+
+    try:
+        den = cv2.fastNlMeansDenoising(raster.ocr_gray(zoom), None, 10, 7, 21)
+    except Exception:
+        return
+    yield "denoise", _PIL_Image.fromarray(den)
+
+    thr = cv2.adaptiveThreshold(den, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                cv2.THRESH_BINARY, 31, 15)
+    yield "threshold", _PIL_Image.fromarray(thr)
+    yield "inverted", _PIL_Image.fromarray(255 - thr)
+
+    k3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    closed = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, k3, iterations=1)
+    yield "closed", _PIL_Image.fromarray(closed)
+    yield "dilated", _PIL_Image.fromarray(cv2.dilate(closed, k3, iterations=1))
+
+def _score_ocr_data(data, conf_threshold):
+    """คืน (จำนวนคำที่ผ่านเกณฑ์, conf เฉลี่ย, คะแนนรวม = ผลรวม conf ของคำที่ผ่านเกณฑ์)"""
+    kept = []
+    texts = data.get("text", []) or []
+    confs = data.get("conf", []) or []
+    for i, raw in enumerate(texts):
+        t = (raw or "").strip()
+        if not t:
+            continue
+        try:
+            c = float(confs[i])
+        except Exception:
+            c = -1.0
+        if conf_threshold is None or c >= conf_threshold or t in {"+", "＋"}:
+            kept.append(max(0.0, c))
+    n = len(kept)
+    total = sum(kept)
+    return n, (total / n if n else 0.0), total
+
+def _open_ocr_cache(cache_dir):
+    try:
+        return OcrCache(cache_dir)
+    except Exception as e:
+        logging.warning(f"OCR cache unavailable ({cache_dir}): {e}")
+        return None
+
+def _run_ocr(img, lang, config, zoom=None, kind="page", plan=None):
+    """
+    ocr_engine.image_to_data + บันทึกการเรียก (ซูม/PSM/ภาษา/ขนาดภาพ/เวลา) ลง extract_stats เมื่อเปิดการวัด
+    plan = _OcrPagePlan ของหน้า: plan.cache (extract_cache.OcrCache) มีภาพ+ภาษา+config เดิมที่เคย OCR แล้ว
+    (เอกสารใดก็ได้) → ผลจาก cache ไม่เรียก tesseract; การเรียกที่ล้มเหลว/หมดเวลานับใน plan.failed
+    """
+    cache = plan.cache if plan is not None else None
+    key = None
+    if cache is not None and hasattr(img, "tobytes"):
+        oem, psm, variables = ocr_engine.parse_config(config)
+        key = cache.key_for(img, lang, oem, psm, variables, ocr_engine.engine_id())
+        data = cache.get_data(key)
+        if data is not None:
+            extract_stats.count("ocr_cache_hit")
+            return data
+        extract_stats.count("ocr_cache_miss")
+
+    if not extract_stats.enabled():
+        data = ocr_engine.image_to_data(img, lang=lang, config=config)
+    else:
+        t0 = time.perf_counter()
+        data = ocr_engine.image_to_data(img, lang=lang, config=config)
+        extract_stats.ocr_call(
+            kind=kind, zoom=zoom, psm=ocr_engine.parse_config(config)[1], lang=lang,
+            size=list(getattr(img, "size", ()) or ()), seconds=round(time.perf_counter() - t0, 4),
+            words=sum(1 for t in (data or {}).get("text", []) if (t or "").strip()) if data else None,
+        )
+    # เก็บเฉพาะผลที่สำเร็จ (None = ล้มเหลว/หมดเวลา → ครั้งหน้าลองใหม่)
+    if data is None:
+        if plan is not None:
+            plan.note_failure()
+    elif key is not None:
+        cache.put_data(key, data)
+    return data
+
+class _OcrPagePlan:
+    """
+    สถานะของ OCR planner ที่ใช้ร่วมกันทั้งหน้า (ทุกซูม/บริเวณ/tile และรอบ fast-full; หลาย thread)
+    - cache: extract_cache.OcrCache ของงานที่หน้านี้เป็นส่วนหนึ่ง (None = ไม่ใช้)
+    - failed: จำนวนการเรียก OCR ของหน้าที่ล้มเหลว/หมดเวลา (> 0 → ผลของหน้าไม่ลง page cache)
+    - dead_langs: ชุดภาษาที่โหลดไม่ได้ (traineddata ไม่ครบ) → ไม่ลองอีกในหน้านี้; timeout ไม่นับ
+    - extra_left: งบการเรียกเพิ่มจากครั้งแรกของแต่ละซูม → หน้ายากเรียก OCR ไม่เกินครั้งแรกของทุกซูม
+      + OCR_PAGE_EXTRA_ATTEMPTS (เดิมแต่ละซูมเรียกครั้งเดียว)
+    """
+    def __init__(self, extra_attempts=OCR_PAGE_EXTRA_ATTEMPTS, cache=None):
+        self._lock = threading.Lock()
+        self.cache = cache
+        self.failed = 0
+        self.dead_langs = set()
+        self.extra_left = extra_attempts
+
+    def note_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def take_extra(self):
+        with self._lock:
+            if self.extra_left <= 0:
+                return False
+            self.extra_left -= 1
+            return True
+
+    def mark_dead(self, lang):
+        with self._lock:
+            self.dead_langs.add(lang)
+
+def _plan_ocr(variants, configs, langs, conf_threshold, trace, zoom=None, plan=None, baseline=None):
+    """
+    ลองภาพ (ถูก→แพง) × config โดยวัดคุณภาพจากจำนวนคำและ conf เฉลี่ย
+    ภาษาในลำดับ cascade ใช้เป็นตัวสำรองเมื่อโหลดชุดภาษาไม่ได้เท่านั้น (timeout → ครั้งนั้นล้มเหลว ไม่ลดภาษา)
+    baseline = (คำ, conf เฉลี่ย, คะแนน) ที่ดีที่สุดของซูมก่อนหน้า (ถูกกว่า): ถึงเป้าแล้ว → ซูมนี้เรียกครั้งเดียว;
+    ผลที่ไม่ชนะ baseline นับว่าไม่ดีขึ้น
+    หยุดเมื่อถึงเป้า / คะแนนไม่ดีขึ้นติดกัน OCR_MAX_STALE ครั้ง / ครบ OCR_MAX_ATTEMPTS / งบของหน้าหมด
+    คืน (data ที่ดีที่สุดของซูมนี้, (คำ, conf เฉลี่ย, คะแนน) ของ data นั้น)
+    """
+    if plan is None:
+        plan = _OcrPagePlan()
+    best_data, best_stats = None, None
+    bar = baseline[2] if baseline else None
+    base_hit = bool(baseline) and baseline[0] >= OCR_TARGET_WORDS and baseline[1] >= OCR_TARGET_MEAN_CONF
+    attempts = stale = 0
+
+    for vname, img in variants:
+        for cfg in configs:
+            if attempts and not plan.take_extra():
+                trace.append("page budget exhausted")
+                extract_stats.count("ocr_plan_budget_exhausted")
+                return best_data, best_stats
+            data, used_lang = None, None
+            for lg in langs:
+                if not lg or lg in plan.dead_langs:
+                    continue
+                data = _run_ocr(img, lg, cfg, zoom=zoom, plan=plan)
+                if data and len(data.get("text", []) or []) > 0:
+                    used_lang = lg
                     break
-        if not placed:
-            lines.append({
-                "words":[w],
-                "bbox_px": list(w["bbox_px"]),
-                "cy": cy,
-                "h":  h,
-            })
-    return lines
+                if not ocr_engine.lang_failed(lg):
+                    break
+                plan.mark_dead(lg)
+            attempts += 1
+
+            psm = ocr_engine.parse_config(cfg)[1]
+            if used_lang is None:
+                trace.append(f"{vname}/psm{psm}: failed")
+            else:
+                n, mean, score = _score_ocr_data(data, conf_threshold)
+                if best_stats is None or score > best_stats[2]:
+                    best_data, best_stats = data, (n, mean, score)
+                if bar is None or score > bar:
+                    bar = score
+                    stale = 0
+                else:
+                    stale += 1
+                hit = (n >= OCR_TARGET_WORDS and mean >= OCR_TARGET_MEAN_CONF)
+                trace.append(f"{vname}/psm{psm}/{used_lang}: words={n} conf={mean:.0f}"
+                             + (" ✓target" if hit else ""))
+                if hit:
+                    return best_data, best_stats
+
+            if base_hit or attempts >= OCR_MAX_ATTEMPTS or stale >= OCR_MAX_STALE:
+                return best_data, best_stats
+    return best_data, best_stats
+
+def _log_ocr_plan(page, plan_trace):
+    if not plan_trace or not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    try:
+        pno = page.number + 1
+    except Exception:
+        pno = "?"
+    for z, trace in plan_trace:
+        logging.debug("OCR plan p%s z=%.1f: %s", pno, z, " | ".join(trace) or "-")
+
+def _split_tiles(rect, zoom, max_tile_px=None, overlap_pt=None):
+    """
+    แบ่ง rect (pt) เป็น tile ที่ซ้อนกัน overlap_pt ให้แต่ละ tile ที่ซูมนี้ไม่เกิน max_tile_px ต่อด้าน
+    overlap_pt=None → max(OCR_TILE_OVERLAP_PT, OCR_TILE_OVERLAP_PX ที่ซูมนี้)
+    คืน list ของ (tile_rect, (ซ้าย, บน, ขวา, ล่าง) = ขอบนั้นเป็นรอยต่อกับ tile อื่นหรือไม่)
+    """
+    max_pt = float(max_tile_px or OCR_MAX_TILE_PX) / float(zoom)
+    if overlap_pt is None:
+        overlap_pt = max(OCR_TILE_OVERLAP_PT, OCR_TILE_OVERLAP_PX / float(zoom))
+    overlap = min(float(overlap_pt), max_pt / 2.0)
+
+    def _spans(a0, a1):
+        length = a1 - a0
+        if length <= max_pt:
+            return [(a0, a1)]
+        n = int(-(-(length - overlap) // (max_pt - overlap)))
+        size = (length + (n - 1) * overlap) / n
+        step = size - overlap
+        return [(a0 + i * step, min(a1, a0 + i * step + size)) for i in range(n)]
+
+    xs, ys = _spans(rect.x0, rect.x1), _spans(rect.y0, rect.y1)
+    tiles = []
+    for j, (y0, y1) in enumerate(ys):
+        for i, (x0, x1) in enumerate(xs):
+            inner = (i > 0, j > 0, i < len(xs) - 1, j < len(ys) - 1)
+            tiles.append((fitz.Rect(x0, y0, x1, y1), inner))
+    return tiles
+
+def _fragments_overlap(a, b):
+    """สองกล่องเป็นชิ้นของคำเดียวกัน: ซ้อนกันจริง และซ้อนอย่างน้อยครึ่งหนึ่งในแนวใดแนวหนึ่ง"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return False
+    return (iw >= 0.5 * min(a[2] - a[0], b[2] - b[0])) or (ih >= 0.5 * min(a[3] - a[1], b[3] - b[1]))
 
-def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30, configs=None):
-    if pytesseract is None or Image is None:
+def _merge_tile_words(tile_words, seam_pt=OCR_TILE_SEAM_PT):
+    """
+    รวมคำจากหลาย tile: คำที่ชิดรอยต่อ (ถูกตัด) ทิ้งเมื่อ tile ข้างเคียงเห็นคำนั้นเต็ม
+    คำที่ยาวกว่าส่วนซ้อนถูกตัดทั้งสอง tile → เก็บชิ้นที่ใหญ่ที่สุดแทนการทิ้งทั้งคู่
+    แล้วตัดคำซ้ำในส่วนซ้อน (ข้อความเดียวกัน + IoU) โดยเก็บคำที่ confidence สูงกว่า
+    """
+    kept, cut = [], []
+    for ti, (rect, inner, words) in enumerate(tile_words):
+        for w in words:
+            x0, y0, x1, y1 = w["bbox"]
+            if ((inner[0] and x0 - rect.x0 <= seam_pt) or (inner[1] and y0 - rect.y0 <= seam_pt)
+                    or (inner[2] and rect.x1 - x1 <= seam_pt) or (inner[3] and rect.y1 - y1 <= seam_pt)):
+                cut.append((ti, w))
+            else:
+                kept.append(w)
+    if cut:
+        whole = list(kept)
+        frags = []
+        cut.sort(key=lambda tw: -((tw[1]["bbox"][2] - tw[1]["bbox"][0]) * (tw[1]["bbox"][3] - tw[1]["bbox"][1])))
+        for ti, w in cut:
+            b = w["bbox"]
+            if any(_bbox_ioa(b, o["bbox"]) >= 0.5 for o in whole):
+                continue
+            if any(fi != ti and _fragments_overlap(b, f["bbox"]) for fi, f in frags):
+                continue
+            frags.append((ti, w))
+        kept.extend(w for _, w in frags)
+        extract_stats.count("ocr_tile_fragments_kept", len(frags))
+    if len(tile_words) > 1:
+        kept.sort(key=lambda w: -(w.get("confidence") or 0.0))
+        store = _PageItemStore()
+        for w in kept:
+            store.extend([w], iou_thresh=0.5)
+        kept = store.items
+    return kept
+
+# ---- รวมคำ OCR จากหลายซูม: คำเดียวกันในหลายซูม → คำเดียว (โหวตข้อความด้วย confidence) ----
+OCR_FUSE_IOU   = 0.5    # IoU (พิกัดหน้า) ขั้นต่ำที่ถือว่าเป็นคำเดียวกันข้ามซูม
+OCR_FUSE_COVER = 0.7    # คำที่อยู่ในคำของซูมอื่น ≥ สัดส่วนนี้ = แยกคำต่างกัน (ชิ้นส่วนของคำเดียวกัน) → ทิ้ง
+_FUSE_CELL = 24.0
+
+def _bbox_ioa(a, b):
+    """พื้นที่ซ้อน / พื้นที่ของ a"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    return (iw * ih) / max(1e-6, (a[2] - a[0]) * (a[3] - a[1]))
+
+def _fuse_zoom_words(words):
+    """
+    คำ OCR จากหลายซูม (คีย์ "zoom") → หนึ่งคำต่อหนึ่งตำแหน่ง
+    จับกลุ่มด้วย bbox พิกัดหน้า (IoU ≥ OCR_FUSE_IOU, ไม่เกินหนึ่งคำต่อซูมต่อกลุ่ม) เรียงจาก confidence สูง→ต่ำ
+    ข้อความของกลุ่ม = ข้อความที่ผลรวม confidence สูงสุด; คำที่คืนคือคำ confidence สูงสุดของข้อความนั้น
+    """
+    if len({w["zoom"] for w in words}) <= 1:
+        return words
+
+    def _cells(b):
+        c = _FUSE_CELL
+        for cx in range(int(b[0] // c), int(b[2] // c) + 1):
+            for cy in range(int(b[1] // c), int(b[3] // c) + 1):
+                yield (cx, cy)
+
+    groups = []
+    grid = {}
+    for w in sorted(words, key=lambda w: -(w.get("confidence") or 0.0)):
+        b = w["bbox"]
+        cand = set()
+        for cell in _cells(b):
+            cand.update(grid.get(cell, ()))
+        target, best_iou, covered = None, 0.0, False
+        for gi in sorted(cand):
+            g = groups[gi]
+            if w["zoom"] in g["zooms"]:
+                continue
+            iou = _bbox_iou(b, g["bbox"])
+            if iou >= OCR_FUSE_IOU:
+                if iou > best_iou:
+                    target, best_iou = gi, iou
+            elif _bbox_ioa(b, g["bbox"]) >= OCR_FUSE_COVER:
+                covered = True
+        if target is not None:
+            groups[target]["members"].append(w)
+            groups[target]["zooms"].add(w["zoom"])
+        elif not covered:
+            groups.append({"bbox": b, "zooms": {w["zoom"]}, "members": [w]})
+            for cell in _cells(b):
+                grid.setdefault(cell, []).append(len(groups) - 1)
+
+    fused = []
+    for g in groups:
+        votes = {}
+        for m in g["members"]:
+            votes[m["text"]] = votes.get(m["text"], 0.0) + max(0.0, float(m.get("confidence") or 0.0))
+        top = g["members"][0]["text"]
+        text = max(votes, key=lambda t: (votes[t], t == top))
+        fused.append(next(m for m in g["members"] if m["text"] == text))
+    extract_stats.count("ocr_fuse_in", len(words))
+    extract_stats.count("ocr_fuse_kept", len(fused))
+    return fused
+
+def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30, configs=None, raster=None,
+                       regions=None, region_zooms=None, plan=None):
+    """
+    plan = _OcrPagePlan ของหน้า (ใช้ร่วมกันระหว่างรอบ fast/full); None → สร้างใหม่สำหรับการเรียกนี้
+    regions = list ของ fitz.Rect (pt) → OCR เฉพาะบริเวณเหล่านั้น (เรนเดอร์ด้วย clip= ทีละบริเวณ)
+    แทนทั้งหน้า; bbox ของผลลัพธ์เป็นพิกัดหน้าเหมือนกัน
+    region_zooms = list ของ list ซูมต่อบริเวณ (ลำดับเดียวกับ regions) ใช้แทน zooms
+    หน้า/บริเวณที่ภาพเกินงบ (raster.max_tile_px) ถูกแบ่งเป็น tile ซ้อนกัน → หน่วยความจำสูงสุดไม่ขึ้นกับขนาดหน้า
+    """
+    if not ocr_engine.available() or Image is None:
         return []
+    if plan is None:
+        plan = _OcrPagePlan()
+
+    max_tile_px = raster.max_tile_px if raster is not None else OCR_MAX_TILE_PX
+    # ซูมที่ประเมินจากความสูง glyph ต่ำกว่า 4.0 → เรนเดอร์/แบ่ง tile ที่ซูมนั้นเลย ไม่เรนเดอร์ 4.0 แล้วย่อ
+    max_zoom = max(zooms) if zooms else 4.0
+    if regions is None:
+        probe = raster if raster is not None else _PageRaster(page, max_zoom=max_zoom, max_tile_px=max_tile_px)
+        if probe.is_huge(max_zoom):
+            regions = [page.rect]
+
+    if regions is not None:
+        if region_zooms is None:
+            region_zooms = [zooms] * len(regions)
+
+        # งาน = tile ของแต่ละบริเวณ (บริเวณเล็กเป็น tile เดียว)
+        jobs = []
+        for ri, (rect, rz) in enumerate(zip(regions, region_zooms)):
+            rmax = max(rz) if rz else 4.0
+            for tile, inner in _split_tiles(rect, rmax, max_tile_px):
+                jobs.append((ri, tile, inner, rz, rmax))
+
+        def _run(job, r):
+            return _ocr_words(page, r, ocr_lang, job[3], conf_threshold, configs, plan)[0]
+
+        threads = min(OCR_REGION_THREADS, len(jobs)) if (cv2 is not None and np is not None) else 1
+        per_region = [[] for _ in regions]
+        # ทีละชุด `threads` tile: เรนเดอร์ใน thread นี้ (MuPDF ไม่ thread-safe; ซูมอื่นย่อด้วย cv2)
+        # แล้ว OCR พร้อมกัน คืนหน่วยความจำก่อนชุดถัดไป
+        for b in range(0, len(jobs), max(1, threads)):
+            batch = jobs[b:b + max(1, threads)]
+            rasters = [_PageRaster(page, max_zoom=job[4], clip=job[1], max_tile_px=max_tile_px) for job in batch]
+            try:
+                if len(batch) > 1:
+                    for r in rasters:
+                        r.rgb(r.max_zoom)
+                    with ThreadPoolExecutor(max_workers=len(batch)) as ex:
+                        results = list(ex.map(extract_stats.bind(_run), batch, rasters))
+                else:
+                    results = [_run(batch[0], rasters[0])]
+            finally:
+                for r in rasters:
+                    r.release()
+            for job, words in zip(batch, results):
+                per_region[job[0]].append((job[1], job[2], words))
+
+        items = []
+        for tile_words in per_region:
+            words = _merge_tile_words(tile_words)
+            items.extend(_ocr_items_from_words(words, _group_ocr_words_into_lines(words, box_key="bbox")))
+        return items
+
+    own_raster = raster is None
+    if own_raster:
+        raster = _PageRaster(page, max_zoom=max_zoom)
+    try:
+        return _ocr_extract_items_impl(page, raster, ocr_lang, zooms, conf_threshold, configs, plan)
+    finally:
+        if own_raster:
+            raster.release()
 
+def _ocr_extract_items_impl(page, raster, ocr_lang, zooms, conf_threshold, configs, plan=None):
+    words, lines = _ocr_words(page, raster, ocr_lang, zooms, conf_threshold, configs, plan)
+    return _ocr_items_from_words(words, lines)
+
+def _ocr_words(page, raster, ocr_lang, zooms, conf_threshold, configs, plan=None):
+    """
+    OCR ภาพของ raster (ทั้งหน้าหรือ clip) → (คำ, บรรทัดจาก _ocr_layout)
+    คำมี bbox เป็นพิกัดหน้า (pt) และถูกทำเครื่องหมาย underline จากภาพของ raster นี้แล้ว
+    """
     # ใช้ซูม/คอนฟิกที่ส่งมา ถ้าไม่ส่งให้ใช้ดีฟอลต์แบบเดิม
     if zooms is None:
         zooms = [3.0, 3.6, 4.0]
@@ -269,69 +1158,29 @@ def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30,
         ]
 
     all_words = []
+    plan_trace = []
+    ox, oy = raster.origin
+    if plan is None:
+        plan = _OcrPagePlan()
+    baseline = None
+    if len(zooms) > 1 and cv2 is not None:
+        # เรนเดอร์ซูมสูงสุดของชุดครั้งเดียว ซูมที่เหลือย่อจากภาพนี้
+        raster.rgb(max(zooms))
 
     for z in zooms:
-        img, zf = _render_page_to_pil(page, zoom=z)
-
-        img_gray = None
-        if cv2 is not None and np is not None:
-            try:
-                arr = np.array(img.convert("RGB"))
-                g_r = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-                g_y = cv2.cvtColor(arr, cv2.COLOR_RGB2YCrCb)[:, :, 0]
-                img_gray = g_r if g_r.std() >= g_y.std() else g_y
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-                img_gray = clahe.apply(img_gray)
-            except Exception:
-                img_gray = None
-
-        candidates = [img.convert("L")]
-        if img_gray is not None and cv2 is not None:
-            try:
-                den = cv2.fastNlMeansDenoising(img_gray, None, 10, 7, 21)
-                thr = cv2.adaptiveThreshold(den, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                            cv2.THRESH_BINARY, 31, 15)
-                inv = 255 - thr
-                k3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-                closed = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, k3, iterations=1)
-                dil    = cv2.dilate(closed, k3, iterations=1)
-                for arr in (den, thr, inv, closed, dil):
-                    candidates.append(_PIL_Image.fromarray(arr))
-            except Exception:
-                pass
-
-        def _try_ocr(img_pil, lang, cfg):
-            try:
-                return pytesseract.image_to_data(
-                    img_pil, lang=lang, config=cfg, output_type=pytesseract.Output.DICT
-                )
-            except Exception:
-                return None
-
-        # จัดลำดับภาษาที่จะลอง
-        BIG  = "eng+spa+fra+por+ita+deu+nld+swe+fin+dan+nor+pol+ces+slk+hun+rus+ell+tur+ara+tha"
-        LITE = "eng+spa+fra+por+ita+deu+nld+tha"
-        TINY = "eng+tha"
-        FALL = "eng"
-        langs = (ocr_lang or BIG, BIG, LITE, TINY, FALL)
-
-        got = None
-        for im in candidates:
-            for cfg in configs:
-                for lg in langs:
-                    if not lg:
-                        continue
-                    data = _try_ocr(im, lg, cfg)
-                    if data and len(data.get('text', []) or []) > 0:
-                        got = (data, zf)
-                        break
-                if got: break
-            if got: break
-
-        if not got:
+        zf = z
+
+        variants = _ocr_preprocess_variants(raster, z)
+        trace = []
+        data, stats = _plan_ocr(variants, configs, _ocr_lang_cascade(ocr_lang), conf_threshold, trace,
+                                zoom=z, plan=plan, baseline=baseline)
+        plan_trace.append((z, trace))
+        if stats is not None and (baseline is None or stats[2] > baseline[2]):
+            baseline = stats
+        if not data:
             continue
 
-        data, used_zoom = got
+        used_zoom = zf
         n = len(data.get("text", []))
         confs = data.get("conf", ["-1"] * n)
         for i in range(n):
@@ -353,9 +1202,10 @@ def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30,
 
             size_pt = h / used_zoom
             size_mm = _pt_to_mm(size_pt)
-            bbox_pt = (x / used_zoom, y / used_zoom, (x + w) / used_zoom, (y + h) / used_zoom)
+            bbox_pt = (ox + x / used_zoom, oy + y / used_zoom,
+                       ox + (x + w) / used_zoom, oy + (y + h) / used_zoom)
 
-            all_words.append({
+            all_words.append(PageItem({
                 "text": txt,
                 "bold": None,
                 "italic": None,
@@ -365,29 +1215,34 @@ def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30,
                 "size_unit": "pt",
                 "font": "",
                 "bbox": bbox_pt,
-                "bbox_px": (x, y, x+w, y+h),
-                "height_px": h,
+                "zoom": used_zoom,
                 "source": "ocr",
                 "confidence": conf
-            })
+            }))
+
+    _log_ocr_plan(page, plan_trace)
 
     if not all_words:
-        return []
+        return [], []
+
+    # คำเดียวกันจากหลายซูม → คำเดียว แล้วจัดบรรทัดด้วยพิกัดหน้า
+    all_words = _fuse_zoom_words(all_words)
+    lines = _group_ocr_words_into_lines(all_words, box_key="bbox")
 
-    # จัดกลุ่มเป็นบรรทัด + ตรวจ underline จากภาพ (เหมือนเดิม)
-    lines = _group_ocr_words_into_lines(all_words)
+    # ตรวจ underline บนภาพซูมสูงสุดที่ใช้ (กล่องบรรทัดแปลงจาก pt เป็น px ของซูมนั้น)
+    ul_zoom = max(w["zoom"] for w in all_words)
     img_gray = None
     try:
-        img_hi, z_hi = _render_page_to_pil(page, zoom=4.0)
         if cv2 is not None and np is not None:
-            arr = np.array(img_hi.convert("RGB"))
-            img_gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+            img_gray = raster.gray(ul_zoom)
     except Exception:
         pass
 
     if img_gray is not None:
         for ln in lines:
-            X0, Y0, X1, Y1 = ln["bbox_px"]
+            bx0, by0, bx1, by1 = ln["bbox"]
+            X0, Y0 = (bx0 - ox) * ul_zoom, (by0 - oy) * ul_zoom
+            X1, Y1 = (bx1 - ox) * ul_zoom, (by1 - oy) * ul_zoom
             ul_line = _has_underline_in_roi(img_gray, X0, Y0, X1 - X0, Y1 - Y0)
             if ul_line is True:
                 for w in ln["words"]:
@@ -397,43 +1252,62 @@ def _ocr_extract_items(page, ocr_lang="eng+tha", zooms=None, conf_threshold=30,
                     if w["underline"] is None:
                         w["underline"] = False
 
-    # รวม word+line items
+    return all_words, lines
+
+def _ocr_line_item(ln):
+    texts = [w["text"] for w in ln["words"] if (w.get("text") or "").strip()]
+    if not texts:
+        return None
+    size_mm = 0.0
+    for w in ln["words"]:
+        try: size_mm = max(size_mm, float(w.get("size_mm") or 0.0))
+        except Exception: pass
+    # bbox ของบรรทัด = union ของ bbox คำ (หน่วย pt แล้ว ไม่ขึ้นกับซูมที่ OCR)
+    bbox_pt = None
+    for w in ln["words"]:
+        bbox_pt = w["bbox"] if bbox_pt is None else _merge_bbox_px(bbox_pt, w["bbox"])
+    return PageItem({
+        "text": " ".join(texts),
+        "bold": None,
+        "italic": None,
+        "underline": any(bool(w.get("underline")) for w in ln["words"]),
+        "size_pt": None,
+        "size_mm": size_mm,
+        "size_unit": "pt",
+        "font": "",
+        "bbox": tuple(bbox_pt),
+        "source": "ocr",
+        "level": "line",
+        "confidence": min((w.get("confidence", 0) for w in ln["words"]), default=0),
+    })
+
+def _ocr_items_from_words(all_words, lines):
+    """
+    คำ + บรรทัด → item ระดับคำ และบรรทัด (ตามลำดับอ่านของบล็อก); ตัดคีย์ชั่วคราวของคำออก
+    บรรทัดของบล็อกที่มีหลายบรรทัดได้คีย์ชั่วคราว "block_bbox" (bbox ของบล็อก) → _ocr_block_meta สร้างบล็อก
+    ลง meta ของหน้าหลังยกระดับบรรทัดแล้ว (ไม่เพิ่ม item ข้อความซ้ำลงในหน้า)
+    """
+    if not all_words:
+        return []
+
     line_items = []
-    for ln in lines:
-        texts = [w["text"] for w in ln["words"] if (w.get("text") or "").strip()]
-        if not texts:
-            continue
-        size_mm = 0.0
-        for w in ln["words"]:
-            try: size_mm = max(size_mm, float(w.get("size_mm") or 0.0))
-            except Exception: pass
-        X0, Y0, X1, Y1 = ln["bbox_px"]
-        bbox_pt = (X0 / 3.0, Y0 / 3.0, X1 / 3.0, Y1 / 3.0) 
-        line_items.append({
-            "text": " ".join(texts),
-            "bold": None,
-            "italic": None,
-            "underline": any(bool(w.get("underline")) for w in ln["words"]),
-            "size_pt": None,
-            "size_mm": size_mm,
-            "size_unit": "pt",
-            "font": "",
-            "bbox": bbox_pt,
-            "source": "ocr",
-            "level": "line",
-            "confidence": min((w.get("confidence", 0) for w in ln["words"]), default=0),
-        })
+    for blk in _ocr_blocks(lines):
+        members = [it for it in (_ocr_line_item(ln) for ln in blk["lines"]) if it is not None]
+        if len(members) >= 2:
+            block_bbox = tuple(round(float(v), 2) for v in blk["bbox"])
+            for m in members:
+                m["block_bbox"] = block_bbox
+        line_items.extend(members)
 
     items = []
     for w in all_words:
-        w.pop("bbox_px", None)
-        w.pop("height_px", None)
+        w.pop("zoom", None)
         items.append(w)
     items.extend(line_items)
     return items
 
 def _detect_vector_plus_signs(page, min_len=2.5, max_len=None,
-                              center_tol=None, length_ratio_tol=0.55):
+                              center_tol=None, length_ratio_tol=0.55, geom=None):
     if page is None:
         return []
 
@@ -450,59 +1324,32 @@ def _detect_vector_plus_signs(page, min_len=2.5, max_len=None,
     if center_tol is None:
         center_tol = max(0.8, 0.01 * diag)
 
-    Hs, Vs = [], []
-
+    if geom is None:
+        geom = _PageGeometry(page)
     try:
-        for d in page.get_drawings():
-            for it in d.get("items", []):
-                op = it[0]
-
-                # เคสเส้นตรง 
-                if op == "l":
-                    p0, p1 = it[1], it[2]
-                    dx, dy = p1.x - p0.x, p1.y - p0.y
-                    length = (dx * dx + dy * dy) ** 0.5
-                    if length < min_len or length > max_len:
-                        continue
-
-                    # ใช้มุมเพื่อจัดแนว
-                    if abs(dy) <= 0.8:  
-                        x0, x1 = sorted((p0.x, p1.x))
-                        y = (p0.y + p1.y) / 2.0
-                        Hs.append((x0, y, x1))
-                    elif abs(dx) <= 0.8:  
-                        y0, y1 = sorted((p0.y, p1.y))
-                        x = (p0.x + p1.x) / 2.0
-                        Vs.append((x, y0, y1))
-
-                elif op == "re":
-                    rect = it[1]
-                    w = float(rect.width)
-                    h = float(rect.height)
-                    x0, y0, x1, y1 = rect.x0, rect.y0, rect.x1, rect.y1
-
-                    thin = max(6.0, 0.006 * diag)
-
-                    if h <= thin and w >= min_len and w <= max_len:
-                        yc = (y0 + y1) / 2.0
-                        Hs.append((x0, yc, x1))
-
-                    elif w <= thin and h >= min_len and h <= max_len:
-                        xc = (x0 + x1) / 2.0
-                        Vs.append((xc, y0, y1))
+        Hs, Vs = geom.plus_strokes(min_len, max_len, thin=max(6.0, 0.006 * diag))
     except Exception:
         return []
+    if not Hs or not Vs:
+        return []
+
+    # เส้นแนวตั้งเรียงตาม x → หาเส้นที่ตัดกึ่งกลางเส้นแนวนอนด้วย bisect แทนการจับคู่ทุกคู่
+    v_order = sorted(range(len(Vs)), key=lambda i: Vs[i][0])
+    v_xs = [Vs[i][0] for i in v_order]
 
     plus_boxes = []
     for (hx0, hy, hx1) in Hs:
         hcx = (hx0 + hx1) / 2.0
         hlen = (hx1 - hx0)
 
-        for (vx, vy0, vy1) in Vs:
+        lo = bisect.bisect_left(v_xs, hcx - center_tol)
+        hi = bisect.bisect_right(v_xs, hcx + center_tol)
+        for vi in sorted(v_order[lo:hi]):
+            vx, vy0, vy1 = Vs[vi]
             vcy = (vy0 + vy1) / 2.0
             vlen = (vy1 - vy0)
 
-            if abs(vx - hcx) <= center_tol and abs(vcy - hy) <= center_tol:
+            if abs(vcy - hy) <= center_tol:
                 if hlen > 0 and vlen > 0:
                     ratio = abs(vlen - hlen) / max(hlen, vlen)
                     if ratio <= length_ratio_tol:
@@ -539,7 +1386,7 @@ def _synthesize_3plus_items_from_vectors(raw_spans, plus_boxes, proximity_pt=14.
                 best, best_d = it, d
         if best is not None and best_d <= proximity_pt:
             size_mm = float(best.get("size_mm") or 0.0)
-            items.append({
+            items.append(PageItem({
                 "text": "3+",
                 "bold": best.get("bold"),
                 "italic": best.get("italic"),
@@ -549,7 +1396,8 @@ def _synthesize_3plus_items_from_vectors(raw_spans, plus_boxes, proximity_pt=14.
                 "font": best.get("font",""),
                 "source": "pdf", 
                 "level": "line",
-            })
+                "bbox": _merge_bbox_px(best["bbox"], pb),
+            }))
     return items
 
 def _find_token_plus_boxes_from_spans(raw_spans):
@@ -593,7 +1441,7 @@ def _synthesize_3plus_items_from_tokens(raw_spans, proximity_pt=14.0):
                 best, best_d = t, d
         if best and best_d <= proximity_pt:
             size_mm = float(best.get("size_mm") or p.get("size_mm") or 0.0)
-            items.append({
+            items.append(PageItem({
                 "text": "3+",
                 "bold": bool(best.get("bold")) or bool(p.get("bold")),
                 "italic": bool(best.get("italic")) or bool(p.get("italic")),
@@ -609,7 +1457,7 @@ def _synthesize_3plus_items_from_tokens(raw_spans, proximity_pt=14.0):
                     max(best["bbox"][2], p["bbox"][2]),
                     max(best["bbox"][3], p["bbox"][3]),
                 ],
-            })
+            }))
     return items
 
 def _join_adjacent_3_plus(items, max_gap_factor=1.2, same_line_tol=0.6):
@@ -642,7 +1490,7 @@ def _join_adjacent_3_plus(items, max_gap_factor=1.2, same_line_tol=0.6):
 
         if best:
             size_mm = float(best.get("size_mm") or p.get("size_mm") or 0.0)
-            synth.append({
+            synth.append(PageItem({
                 "text": "3+",
                 "bold": bool(best.get("bold")) or bool(p.get("bold")),
                 "italic": bool(best.get("italic")) or bool(p.get("italic")),
@@ -658,7 +1506,7 @@ def _join_adjacent_3_plus(items, max_gap_factor=1.2, same_line_tol=0.6):
                     max(best["bbox"][2], p["bbox"][2]),
                     max(best["bbox"][3], p["bbox"][3]),
                 ],
-            })
+            }))
     return synth
 
 def _page_has_3plus_text(items):
@@ -669,19 +1517,159 @@ def _page_has_3plus_text(items):
             return True
     return False
 
-def _ocr_3plus_via_roi(page, plus_boxes, zoom=4.0):
+# ROI หลายอันต่อกันเป็นแถบแนวนอน "บรรทัดเดียว" แล้วอ่านด้วย psm 7 เหมือนการเรียกทีละ ROI
+ROI_STRIP_GAP_PX  = 24     # ช่องว่างขั้นต่ำระหว่าง ROI ในแถบ (px)
+ROI_STRIP_GAP_H   = 1.5    # ช่องว่าง ≥ เท่านี้ × ความสูงแถบ → tesseract ไม่รวมคำข้าม ROI
+ROI_STRIP_H_RATIO = 1.5    # ROI สูงต่างกันเกินเท่านี้อยู่คนละแถบ (psm 7 ประมาณขนาดตัวอักษรจากความสูงบรรทัด)
+ROI_STRIP_MAX_PX  = 4096   # ความกว้างสูงสุดของแถบ
+
+def _roi_variants(roi_g):
+    """ภาพ ROI หลายแบบเรียงตามลำดับที่ลอง: gray → threshold → inverted → closed"""
+    variants = [roi_g]
+    try:
+        den = cv2.fastNlMeansDenoising(roi_g, None, 10, 7, 21)
+        thr = cv2.adaptiveThreshold(den, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY, 31, 15)
+        inv = 255 - thr
+        k3  = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        close = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, k3, iterations=1)
+        variants += [thr, inv, close]
+    except Exception:
+        pass
+    return variants
+
+def _roi_strip_groups(imgs):
+    """จัด ROI เป็นกลุ่มของแถบ: ความสูงใกล้กัน (ROI_STRIP_H_RATIO) และความกว้างรวมไม่เกิน ROI_STRIP_MAX_PX"""
+    order = sorted(range(len(imgs)), key=lambda i: imgs[i].shape[0])
+    groups, cur, cur_h, cur_w = [], [], 0, 0
+    for i in order:
+        h, w = imgs[i].shape[:2]
+        gap = max(ROI_STRIP_GAP_PX, int(ROI_STRIP_GAP_H * max(h, cur_h)))
+        if cur and (h > cur[0][1] * ROI_STRIP_H_RATIO or cur_w + w + 2 * gap > ROI_STRIP_MAX_PX):
+            groups.append([j for j, _ in cur])
+            cur, cur_h, cur_w = [], 0, 0
+            gap = max(ROI_STRIP_GAP_PX, int(ROI_STRIP_GAP_H * h))
+        cur.append((i, h))
+        cur_h = max(cur_h, h)
+        cur_w += w + 2 * gap
+    if cur:
+        groups.append([j for j, _ in cur])
+    return groups
+
+def _strip_rois(imgs):
+    """
+    ต่อ ROI (gray) ในแนวนอนเป็นแถบบรรทัดเดียว; แต่ละช่องจัดกึ่งกลางแนวตั้งและเติมขอบด้วยสีพื้นของตัวเอง
+    (ค่ากลางของขอบภาพ) เว้นช่องตามความสูงแถบ
+    คืน (strip, [(x0, x1), ...]) ช่วงคอลัมน์ของแต่ละ ROI ในแถบ
+    """
+    H = max(im.shape[0] for im in imgs)
+    gap = max(ROI_STRIP_GAP_PX, int(ROI_STRIP_GAP_H * H))
+    slots, spans = [], []
+    x = 0
+    for im in imgs:
+        h, w = im.shape[:2]
+        border = np.concatenate([im[0, :], im[-1, :], im[:, 0], im[:, -1]])
+        bg = 255 if float(np.median(border)) >= 128 else 0
+        slot = np.full((H + 2 * gap, w + 2 * gap), bg, dtype=np.uint8)
+        top = gap + (H - h) // 2
+        slot[top:top + h, gap:gap + w] = im
+        slots.append(slot)
+        spans.append((x, x + w + 2 * gap))
+        x += w + 2 * gap
+    return np.hstack(slots), spans
+
+def _ocr_joined_text(data):
+    return " ".join([(data["text"][i] or "").strip()
+                     for i in range(len(data.get("text", []))) if (data["text"][i] or "").strip()])
+
+def _ocr_roi_batch(roi_images, whitelist, hit_fn, plan=None):
+    """
+    OCR ROI เล็กๆ หลายอันโดยต่อเป็นแถบแนวนอน (_strip_rois) แล้วเรียก psm 7 ครั้งเดียวต่อแถบต่อ variant
+    — โหมดบรรทัดเดียวเหมือนการเรียกทีละ ROI เดิม (psm 6 แบบซ้อนแนวตั้งอาจรวม/แยกแถวของ ROI)
+    roi_images: list ของ gray ROI; ลอง variant ตามลำดับ _roi_variants เฉพาะ ROI ที่ยังไม่เจอ
+    hit_fn(joined_text) → True ถ้า ROI นั้นถือว่าเจอ
+    คืน list[bool] ต่อ ROI
+    """
+    n = len(roi_images)
+    hits = [False] * n
+    if n == 0:
+        return hits
+    variants = [_roi_variants(g) for g in roi_images]
+    n_var = max(len(v) for v in variants)
+    config = f"--oem 3 --psm 7 -c tessedit_char_whitelist={whitelist}"
+
+    for k in range(n_var):
+        pending = [i for i in range(n) if not hits[i] and k < len(variants[i])]
+        if not pending:
+            break
+        imgs = [variants[i][k] for i in pending]
+
+        for group in _roi_strip_groups(imgs):
+            data = None
+            if len(group) > 1:
+                strip, spans = _strip_rois([imgs[s] for s in group])
+                data = _run_ocr(_PIL_Image.fromarray(strip), "eng", config, kind="roi-strip", plan=plan)
+            if data:
+                texts = [[] for _ in group]
+                for j in range(len(data.get("text", []))):
+                    t = (data["text"][j] or "").strip()
+                    if not t:
+                        continue
+                    cx = int(data["left"][j]) + int(data["width"][j]) / 2.0
+                    for g, (sx0, sx1) in enumerate(spans):
+                        if sx0 <= cx < sx1:
+                            texts[g].append(t)
+                            break
+                for g, s in enumerate(group):
+                    if hit_fn(" ".join(texts[g])):
+                        hits[pending[s]] = True
+                continue
+
+            # ROI เดียว หรือแถบล้มเหลว → เรียกทีละ ROI แบบเดิม
+            for s in group:
+                d = _run_ocr(_PIL_Image.fromarray(imgs[s]), "eng", config, kind="roi", plan=plan)
+                if d and hit_fn(_ocr_joined_text(d)):
+                    hits[pending[s]] = True
+    return hits
+
+def _roi_3plus_items(raster, rois, z, whitelist, hit_fn, plan=None):
+    """ตัด ROI จากภาพหน้า, OCR แบบ batch แล้ว fallback Hough ต่อ ROI ที่ไม่เจอ"""
+    grays = []
+    for (rx0, ry0, rx1, ry1) in rois:
+        roi_rgb = raster.crop_rgb(z, rx0, ry0, rx1, ry1)
+        roi_rgb = _remove_colored_lines(roi_rgb)
+        grays.append(cv2.cvtColor(roi_rgb, cv2.COLOR_RGB2GRAY))
+
+    with timed("roi ocr"):
+        hits = _ocr_roi_batch(grays, whitelist, hit_fn, plan)
+
     out = []
-    if not plus_boxes or pytesseract is None or cv2 is None or np is None:
-        return out
+    for (rx0, ry0, rx1, ry1), roi_g, hit in zip(rois, grays, hits):
+        if hit or _detect_plus_by_hough(roi_g):
+            size_pt = (ry1 - ry0) / max(1.0, z)
+            size_mm = _pt_to_mm(size_pt)
+            out.append(PageItem({
+                "text": "3+",
+                "bold": None, "italic": None, "underline": None,
+                "size_mm": size_mm, "size_unit": "mm", "font": "",
+                "source": "ocr", "level": "line",
+                "bbox": (rx0 / z, ry0 / z, rx1 / z, ry1 / z),
+            }))
+    return out
 
-    img_pil, z = _render_page_to_pil(page, zoom=zoom)
-    rgb = np.array(img_pil.convert("RGB"))
-    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
-    H, W = gray.shape[:2]
+def _ocr_3plus_via_roi(page, plus_boxes, zoom=4.0, raster=None, plan=None):
+    if not plus_boxes or not ocr_engine.available() or cv2 is None or np is None:
+        return []
+
+    if raster is None:
+        raster = _PageRaster(page, max_zoom=zoom)
+    z = zoom
+    W, H = raster.size_px(z)
 
     def _clip(v, lo, hi): 
         return max(lo, min(int(v), hi))
 
+    rois = []
     for (x0, y0, x1, y1) in plus_boxes:
         X0, Y0, X1, Y1 = x0 * z, y0 * z, x1 * z, y1 * z
         w = max(1.0, X1 - X0); h = max(1.0, Y1 - Y0)
@@ -697,76 +1685,28 @@ def _ocr_3plus_via_roi(page, plus_boxes, zoom=4.0):
         ry1 = _clip(Y1 + bottom_pad, 0, H - 1)
         if rx1 <= rx0 or ry1 <= ry0:
             continue
+        rois.append((rx0, ry0, rx1, ry1))
 
-        roi_rgb = rgb[ry0:ry1, rx0:rx1].copy()
-        roi_rgb = _remove_colored_lines(roi_rgb)
-        roi_g   = cv2.cvtColor(roi_rgb, cv2.COLOR_RGB2GRAY)
-
-        candidates = [roi_g]
-        try:
-            den = cv2.fastNlMeansDenoising(roi_g, None, 10, 7, 21)
-            thr = cv2.adaptiveThreshold(den, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                        cv2.THRESH_BINARY, 31, 15)
-            inv = 255 - thr
-            k3  = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-            close = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, k3, iterations=1)
-            candidates += [thr, inv, close]
-        except Exception:
-            pass
-
-        hit = False
-        for img in candidates:
-            try:
-                data = pytesseract.image_to_data(
-                    _PIL_Image.fromarray(img),
-                    lang="eng",
-                    config="--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789+＋",
-                    output_type=pytesseract.Output.DICT,
-                )
-            except Exception:
-                data = None
-            if not data:
-                continue
-            joined = " ".join([(data["text"][i] or "").strip()
-                               for i in range(len(data.get("text", []))) if (data["text"][i] or "").strip()])
-            if re.search(r"(?<!\w)3\s*[\+\＋](?!\w)", joined) or ("+" in joined or "＋" in joined):
-                size_pt = (ry1 - ry0) / max(1.0, z)
-                size_mm = _pt_to_mm(size_pt)
-                out.append({
-                    "text": "3+",
-                    "bold": None, "italic": None, "underline": None,
-                    "size_mm": size_mm, "size_unit": "mm", "font": "",
-                    "source": "ocr", "level": "line",
-                })
-                hit = True
-                break
-
-        if not hit and _detect_plus_by_hough(roi_g):
-            size_pt = (ry1 - ry0) / max(1.0, z)
-            size_mm = _pt_to_mm(size_pt)
-            out.append({
-                "text": "3+",
-                "bold": None, "italic": None, "underline": None,
-                "size_mm": size_mm, "size_unit": "mm", "font": "",
-                "source": "ocr", "level": "line",
-            })
+    def _hit(joined):
+        return bool(re.search(r"(?<!\w)3\s*[\+\＋](?!\w)", joined)) or ("+" in joined or "＋" in joined)
 
-    return out
+    return _roi_3plus_items(raster, rois, z, "0123456789+＋", _hit, plan)
 
-def _ocr_plus_next_to_three(page, three_boxes, zoom=4.0, max_targets=4):
-    out = []
-    if not three_boxes or pytesseract is None or cv2 is None or np is None:
-        return out
+def _ocr_plus_next_to_three(page, three_boxes, zoom=4.0, max_targets=4, raster=None, plan=None):
+    if not three_boxes or not ocr_engine.available() or cv2 is None or np is None:
+        return []
 
-    img_pil, z = _render_page_to_pil(page, zoom=zoom)
-    rgb = np.array(img_pil.convert("RGB"))
-    H, W = rgb.shape[:2]
+    if raster is None:
+        raster = _PageRaster(page, max_zoom=zoom)
+    z = zoom
+    W, H = raster.size_px(z)
 
     tb = sorted(three_boxes, key=lambda b: (b[3]-b[1])*(b[2]-b[0]), reverse=True)[:max_targets]
 
     def _clip(v, lo, hi): 
         return max(lo, min(int(v), hi))
 
+    rois = []
     for (x0, y0, x1, y1) in tb:
         X0, Y0, X1, Y1 = x0 * z, y0 * z, x1 * z, y1 * z
         w = max(1.0, X1 - X0); h = max(1.0, Y1 - Y0)
@@ -777,354 +1717,1185 @@ def _ocr_plus_next_to_three(page, three_boxes, zoom=4.0, max_targets=4):
         ry1 = _clip(Y1 + 0.3*h, 0, H-1)
         if rx1 <= rx0 or ry1 <= ry0:
             continue
-
-        roi_rgb = rgb[ry0:ry1, rx0:rx1].copy()
-        roi_rgb = _remove_colored_lines(roi_rgb)
-        roi_g   = cv2.cvtColor(roi_rgb, cv2.COLOR_RGB2GRAY)
-
-        candidates = [roi_g]
+        rois.append((rx0, ry0, rx1, ry1))
+
+    def _hit(joined):
+        return ("+" in joined) or ("＋" in joined)
+
+    return _roi_3plus_items(raster, rois, z, "+＋", _hit, plan)
+
+# ใช้ normalize สำหรับตรวจ SPW/SPG บนชั้นข้อความ PDF
+def _norm_sp(s: str) -> str:
+    s = "" if s is None else str(s)
+    s = s.replace("\u00A0", " ")            
+    s = s.replace("‐", "-").replace("–", "-").replace("—", "-")
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+# ---- OCR triage: feature ราคาถูกของหน้า → ตัดสินใจ skip / fast / full พร้อมเหตุผล ----
+TRIAGE_MIN_IMAGE_COVERAGE = 0.03   # ภาพรวมกันเล็กกว่านี้ (เช่นโลโก้) ไม่บังคับ OCR
+TRIAGE_RASTER_COVERAGE    = 0.50   # ไม่มีชั้นข้อความ + ภาพคลุมเกินนี้ → หน้าสแกน/ภาพล้วน
+TRIAGE_MAX_GARBAGE        = 0.25   # สัดส่วน glyph ที่ map เป็น unicode ไม่ได้
+TRIAGE_VECTOR_DENSITY     = 2.0    # path ต่อ cm² ที่ถือว่าหนาแน่น (ตัวอักษรแปลงเป็น outline)
+TRIAGE_SPARSE_TEXT        = 0.5    # ตัวอักษรต่อ cm² ที่ถือว่าชั้นข้อความบาง
+
+_PT2_PER_CM2 = (72.0 / 2.54) ** 2
+
+def _is_garbage_char(ch):
+    o = ord(ch)
+    return ch == "\ufffd" or 0xE000 <= o <= 0xF8FF or (o < 0x20 and ch not in "\t\n\r")
+
+def _image_rects(page):
+    """rect ที่วางภาพบนหน้า (pt, ตัดให้อยู่ในหน้า) อ่านจาก placement ไม่ถอดรหัสภาพ"""
+    prect = page.rect
+    rects = []
+    try:
+        infos = page.get_image_info()
+    except Exception:
+        infos = []
+    for info in infos:
         try:
-            den = cv2.fastNlMeansDenoising(roi_g, None, 10, 7, 21)
-            thr = cv2.adaptiveThreshold(den, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                        cv2.THRESH_BINARY, 31, 15)
-            inv = 255 - thr
-            k3  = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-            close = cv2.morphologyEx(thr, cv2.MORPH_CLOSE, k3, iterations=1)
-            candidates += [thr, inv, close]
+            r = fitz.Rect(info["bbox"]) & prect
         except Exception:
-            pass
+            continue
+        if not r.is_empty:
+            rects.append(r)
+    return rects
+
+def _image_coverage(page, page_area):
+    """สัดส่วนพื้นที่หน้าที่ภาพวาง; ภาพซ้อนกันนับซ้ำได้ จึงตัดที่ 1.0"""
+    rects = _image_rects(page)
+    total = sum(r.width * r.height for r in rects)
+    return (min(1.0, total / page_area) if page_area > 0 else 0.0), len(rects)
+
+def _text_layer_trusted(f):
+    """ชั้นข้อความครบพอ (ไม่ใช่หน้าสแกน/outline/glyph เพี้ยน) → ส่วนที่ต้อง OCR มีแค่ในภาพ"""
+    return (f["text_chars"] > 0 and f["n_items"] >= 5 and f["readable_size"]
+            and f["garbage_ratio"] < TRIAGE_MAX_GARBAGE
+            and not (f["vector_density"] >= TRIAGE_VECTOR_DENSITY and f["text_density"] < TRIAGE_SPARSE_TEXT))
+
+# ---- OCR เฉพาะบริเวณภาพ: หน้าที่ชั้นข้อความใช้ได้ + มีภาพ (เช่นป้ายคำเตือนเป็น bitmap) ----
+REGION_OCR_PAD_PT       = 4.0    # ขยายขอบบริเวณภาพกันตัวอักษรชิดขอบถูกตัด
+REGION_OCR_MIN_SIDE_PT  = 8.0    # ภาพเล็กกว่านี้ (ด้านใดด้านหนึ่ง) ไม่มีข้อความให้อ่าน
+REGION_OCR_MAX_COVERAGE = 0.50   # บริเวณรวมเกินนี้ → OCR ทั้งหน้าถูกกว่า/ง่ายกว่า
+
+def _image_ocr_regions(page):
+    """
+    คืน list ของ fitz.Rect ที่จะ OCR (ภาพที่ซ้อน/ชิดกันรวมเป็นบริเวณเดียว)
+    หรือ None ถ้าควร OCR ทั้งหน้า (ไม่มีภาพ / ภาพคลุมหน้ามากเกินไป)
+    """
+    prect = page.rect
+    page_area = float(prect.width * prect.height)
+    rects = []
+    for r in _image_rects(page):
+        if r.width < REGION_OCR_MIN_SIDE_PT or r.height < REGION_OCR_MIN_SIDE_PT:
+            continue
+        p = REGION_OCR_PAD_PT
+        rects.append(fitz.Rect(r.x0 - p, r.y0 - p, r.x1 + p, r.y1 + p) & prect)
+    if not rects:
+        return None
 
-        hit = False
-        for img in candidates:
-            try:
-                data = pytesseract.image_to_data(
-                    _PIL_Image.fromarray(img),
-                    lang="eng",
-                    config="--oem 3 --psm 7 -c tessedit_char_whitelist=+＋",
-                    output_type=pytesseract.Output.DICT,
-                )
-            except Exception:
-                data = None
-            if not data:
-                continue
-            joined = " ".join([(data["text"][i] or "").strip()
-                               for i in range(len(data.get("text", []))) if (data["text"][i] or "").strip()])
-            if ("+" in joined) or ("＋" in joined):
-                size_pt = (ry1 - ry0) / max(1.0, z)
-                size_mm = _pt_to_mm(size_pt)
-                out.append({
-                    "text": "3+",
-                    "bold": None, "italic": None, "underline": None,
-                    "size_mm": size_mm, "size_unit": "mm", "font": "",
-                    "source": "ocr", "level": "line",
-                })
-                hit = True
-                break
-
-        if not hit and _detect_plus_by_hough(roi_g):
-            size_pt = (ry1 - ry0) / max(1.0, z)
-            size_mm = _pt_to_mm(size_pt)
-            out.append({
-                "text": "3+",
-                "bold": None, "italic": None, "underline": None,
-                "size_mm": size_mm, "size_unit": "mm", "font": "",
-                "source": "ocr", "level": "line",
-            })
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for r in rects:
+            for i, m in enumerate(out):
+                if r.intersects(m):
+                    out[i] = m | r
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
 
-    return out
+    area = sum(r.width * r.height for r in rects)
+    if page_area <= 0 or area / page_area > REGION_OCR_MAX_COVERAGE:
+        return None
+    return sorted(rects, key=lambda r: (r.y0, r.x0))
 
-def extract_text_by_page(pdf_path, enable_ocr=True, ocr_lang="eng+tha", ocr_only_suspect_pages=True,
-                         ocr_lang_fast=None, ocr_lang_full=None):
-    
-    if (ocr_lang_fast is None) and (ocr_lang_full is None):
-        ocr_lang_fast = ocr_lang or "eng"
-        ocr_lang_full = ocr_lang_fast
-    elif (ocr_lang_fast is None) and (ocr_lang_full is not None):   
-        ocr_lang_fast = ocr_lang_full     
-    elif (ocr_lang_full is None) and (ocr_lang_fast is not None):
-        ocr_lang_full = ocr_lang_fast
+# ---- หน้าภาพล้วน/สแกน: หาแถวข้อความจากภาพความละเอียดต่ำ แล้ว OCR เฉพาะบริเวณนั้นที่ซูมเต็ม ----
+TEXT_DETECT_ZOOM        = 1.5    # ~108 dpi: ตัวอักษร 1.2 mm ยังสูง ~5 px
+TEXT_DETECT_PAD_PT      = 3.0
+TEXT_DETECT_MAX_REGIONS = 48     # บริเวณมากกว่านี้ → OCR ทั้งหน้าคุ้มกว่า
+TEXT_DETECT_MAX_COVERAGE = 0.60
+OCR_REGION_THREADS      = 4      # OCR บริเวณพร้อมกัน (engine pool ของ ocr_engine รองรับหลาย thread)
 
-    doc = fitz.open(pdf_path)
+def _detect_text_regions(raster, zoom=TEXT_DETECT_ZOOM):
+    """
+    gradient ขอบตัวอักษร → Otsu → ปิดช่องแนวนอนให้ตัวอักษรติดเป็นแถว → connected components
+    กรองก้อนที่ไม่ใช่ข้อความ (ใหญ่เกิน / ทึบเกิน) แล้วรวมแถวที่ชิดกันเป็นบล็อก
+    คืน list ของ fitz.Rect (pt) หรือ None ถ้าควร OCR ทั้งหน้า
+    """
+    if cv2 is None or np is None:
+        return None
+    # หน้าใหญ่มาก: ลดซูมให้ภาพ pre-pass อยู่ในงบ tile เดียว
+    w1, h1 = raster.size_px(1.0)
+    zoom = min(zoom, raster.max_tile_px / float(max(1, w1 * h1)) ** 0.5)
+    try:
+        gray = raster.lowres_gray(zoom)
+    except Exception as e:
+        logging.debug(f"text-region pre-pass render failed: {e}")
+        return None
+    H, W = gray.shape[:2]
+    if H < 8 or W < 8:
+        return None
 
-    # ใช้ normalize สำหรับตรวจ SPW/SPG บนชั้นข้อความ PDF (ภายในฟังก์ชันนี้)
-    def _norm_sp(s: str) -> str:
-        s = "" if s is None else str(s)
-        s = s.replace("\u00A0", " ")            
-        s = s.replace("‐", "-").replace("–", "-").replace("—", "-")
-        s = re.sub(r"\s+", " ", s).strip().lower()
-        return s
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _th, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+
+    n, _labels, stats, _cent = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    mask = np.zeros_like(bw)
+    kept = 0
+    for i in range(1, n):
+        x, y, w, h, area = (int(v) for v in stats[i])
+        if h < 3 or w < 4 or h > 0.25 * H:
+            continue
+        fill = area / float(w * h)
+        if fill < 0.10 or fill > 0.95:
+            continue
+        mask[y:y + h, x:x + w] = 255
+        kept += 1
+    if not kept:
+        return None
+
+    # รวมแถวที่ห่างกันไม่เกิน ~ระยะบรรทัดเป็นบล็อกเดียว
+    mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (7, 5)))
+    n, _labels, stats, _cent = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n - 1 > TEXT_DETECT_MAX_REGIONS:
+        return None
 
+    ox, oy = raster.origin
+    prect = raster.page.rect
+    p = TEXT_DETECT_PAD_PT
+    rects = []
+    for i in range(1, n):
+        x, y, w, h, _area = (int(v) for v in stats[i])
+        r = fitz.Rect(ox + x / zoom - p, oy + y / zoom - p,
+                      ox + (x + w) / zoom + p, oy + (y + h) / zoom + p) & prect
+        if not r.is_empty:
+            rects.append(r)
+
+    page_area = float(prect.width * prect.height)
+    area = sum(r.width * r.height for r in rects)
+    if not rects or page_area <= 0 or area / page_area > TEXT_DETECT_MAX_COVERAGE:
+        return None
+    return sorted(rects, key=lambda r: (r.y0, r.x0))
+
+# ---- ตัวอักษร outline (ไม่มีชั้นข้อความ): OCR เฉพาะกลุ่ม glyph ที่ซูมตามความสูงตัวอักษร ----
+OCR_TARGET_GLYPH_PX = 30.0    # ความสูงตัวอักษรที่ tesseract อ่านได้ดี
+OCR_MIN_ZOOM = 1.5
+OCR_MAX_ZOOM = 6.0
+
+def _zoom_for_glyph_height(h_pt):
+    if not h_pt or h_pt <= 0:
+        return 4.0
+    return round(max(OCR_MIN_ZOOM, min(OCR_MAX_ZOOM, OCR_TARGET_GLYPH_PX / float(h_pt))), 2)
+
+# ---- ซูม OCR ต่อบริเวณจากความสูงตัวอักษรที่วัดได้ → OCR ครั้งเดียวต่อบริเวณแทน 2–3 ซูมที่เดาไว้ ----
+GLYPH_EST_MIN_PX = 3            # ก้อนเตี้ยกว่านี้ (px ที่ซูม pre-pass) = จุด/สัญญาณรบกวน
+GLYPH_EST_MAX_PX = 200          # สูงกว่านี้ = ภาพ/กรอบ ไม่ใช่ตัวอักษร
+GLYPH_EST_MAX_ASPECT = 3.0      # กว้าง/สูง เกินนี้ = เส้น/แถบ
+GLYPH_EST_MIN_COMPONENTS = 6    # ก้อนที่ผ่านเกณฑ์น้อยกว่านี้ → วัดไม่ได้ (ใช้ชุดซูมเดิม)
+GLYPH_EST_PERCENTILE = 30       # ใช้ความสูงช่วงล่าง: ข้อความเล็ก (ข้อกฎหมาย) ได้ซูมพอ ข้อความใหญ่ยังอ่านได้
+SPAN_GLYPH_RATIO = 0.7          # ความสูงตัวอักษร ≈ 0.7 × font size ของ span
+
+def _glyph_height_from_components(raster, rect):
+    """
+    histogram ความสูง connected component ของบริเวณบนภาพซูมต่ำ (ภาพเดียวกับ _detect_text_regions)
+    คืนความสูงตัวอักษร (pt) หรือ None
+    """
+    if cv2 is None or np is None:
+        return None
+    w1, h1 = raster.size_px(1.0)
+    zoom = min(TEXT_DETECT_ZOOM, raster.max_tile_px / float(max(1, w1 * h1)) ** 0.5)
     try:
-        all_pages = []
+        gray = raster.lowres_gray(zoom)
+    except Exception as e:
+        logging.debug(f"glyph-height pre-pass render failed: {e}")
+        return None
+    ox, oy = raster.origin
+    H, W = gray.shape[:2]
+    x0 = max(0, int((rect.x0 - ox) * zoom)); x1 = min(W, int(round((rect.x1 - ox) * zoom)))
+    y0 = max(0, int((rect.y0 - oy) * zoom)); y1 = min(H, int(round((rect.y1 - oy) * zoom)))
+    if x1 - x0 < 8 or y1 - y0 < 8:
+        return None
+    crop = gray[y0:y1, x0:x1]
+    _th, bw = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    if cv2.countNonZero(bw) > bw.size // 2:
+        bw = cv2.bitwise_not(bw)   # ข้อความสีอ่อนบนพื้นเข้ม
+    _n, _labels, stats, _cent = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    hs = stats[1:, cv2.CC_STAT_HEIGHT]
+    ws = stats[1:, cv2.CC_STAT_WIDTH]
+    keep = (hs >= GLYPH_EST_MIN_PX) & (hs <= GLYPH_EST_MAX_PX) & (ws <= hs * GLYPH_EST_MAX_ASPECT)
+    if int(keep.sum()) < GLYPH_EST_MIN_COMPONENTS:
+        return None
+    return float(np.percentile(hs[keep], GLYPH_EST_PERCENTILE)) / zoom
+
+def _glyph_height_from_spans(rect, raw_spans):
+    """ความสูงตัวอักษร (pt) จากขนาดฟอนต์ของ span ในชั้นข้อความที่อยู่ในบริเวณ"""
+    sizes = []
+    for it in raw_spans:
+        b = it.get("bbox")
+        size = it.get("size_pt")
+        if not b or not size:
+            continue
+        cx, cy = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+        if rect.x0 <= cx <= rect.x1 and rect.y0 <= cy <= rect.y1:
+            sizes.append(float(size))
+    if not sizes:
+        return None
+    sizes.sort()
+    return sizes[int(len(sizes) * GLYPH_EST_PERCENTILE / 100)] * SPAN_GLYPH_RATIO
+
+def _estimate_ocr_zoom(raster, rect, raw_spans=()):
+    """
+    ซูม OCR ของบริเวณจากความสูงตัวอักษรที่วัดได้ (ภาพจริงก่อน ชั้นข้อความเป็นตัวสำรอง)
+    คืน {"glyph_h", "zoom", "source"} หรือ None ถ้าวัดไม่ได้
+    """
+    gh, src = _glyph_height_from_components(raster, rect), "components"
+    if gh is None and raw_spans:
+        gh, src = _glyph_height_from_spans(rect, raw_spans), "text layer"
+    if gh is None:
+        return None
+    return {"glyph_h": round(gh, 2), "zoom": _zoom_for_glyph_height(gh), "source": src}
+
+# ---- ยกระดับ OCR รายบรรทัด: บรรทัด confidence ต่ำ → OCR ซ้ำเฉพาะกล่องบรรทัด (ซูมสูงขึ้น, PSM 7, ภาษาชุด full) ----
+OCR_LINE_ESCALATE_CONF      = 60.0   # บรรทัดที่คำ confidence ต่ำสุดน้อยกว่านี้ถูก OCR ซ้ำ
+OCR_LINE_ESCALATE_MAX       = 32     # จำนวนบรรทัดสูงสุดต่อหน้า (เรียงจาก confidence ต่ำสุด)
+OCR_LINE_ESCALATE_ZOOM_GAIN = 1.25   # ซูมของรอบซ้ำ = ซูมตามความสูงบรรทัด × ค่านี้
+OCR_LINE_ESCALATE_MIN_GAIN  = 5.0    # ใช้ผลใหม่เมื่อ confidence เฉลี่ยดีขึ้นอย่างน้อยเท่านี้
+OCR_LINE_ESCALATE_PAD       = 0.5    # ขยายกล่องบรรทัด (× ความสูง) ให้ tesseract เห็นขอบตัวอักษรครบ
+OCR_LINE_CONFIG = "--oem 3 --psm 7 -c preserve_interword_spaces=1"
+
+def _center_in(b, r):
+    cx, cy = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    return r[0] <= cx <= r[2] and r[1] <= cy <= r[3]
+
+def _line_words_from_data(data, clip, zoom, underline):
+    """ผล image_to_data ของภาพบรรทัด → คำ (PageItem) พิกัดหน้า"""
+    words = []
+    n = len((data or {}).get("text", []))
+    for i in range(n):
+        txt = (data["text"][i] or "").strip()
+        if not txt:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except Exception:
+            conf = -1.0
+        if conf < 0:
+            continue
+        x = float(data["left"][i]); y = float(data["top"][i])
+        w = float(data["width"][i]); h = float(data["height"][i])
+        size_pt = h / zoom
+        words.append(PageItem({
+            "text": txt,
+            "bold": None,
+            "italic": None,
+            "underline": underline,
+            "size_pt": size_pt,
+            "size_mm": _pt_to_mm(size_pt),
+            "size_unit": "pt",
+            "font": "",
+            "bbox": (clip.x0 + x / zoom, clip.y0 + y / zoom, clip.x0 + (x + w) / zoom, clip.y0 + (y + h) / zoom),
+            "source": "ocr",
+            "confidence": conf,
+        }))
+    return words
+
+def _escalate_low_conf_lines(page, items, ocr_lang, max_tile_px=None, plan=None):
+    """
+    OCR ซ้ำเฉพาะบรรทัด OCR ที่ confidence ต่ำ แล้วแทนที่คำและข้อความบรรทัดเมื่อผลดีขึ้น
+    (บรรทัดคง "block_bbox" เดิม → บล็อกที่ _ocr_block_meta สร้างภายหลังได้ข้อความใหม่ตามไปเอง)
+    เรนเดอร์ทุกกล่องใน thread นี้ (MuPDF ไม่ thread-safe) แล้ว OCR พร้อมกัน
+    คืน (items, {"candidates", "improved"})
+    """
+    weak = [it for it in items
+            if it.get("level") == "line" and it.get("source") == "ocr" and it.get("bbox")
+            and float(it.get("confidence") or 0.0) < OCR_LINE_ESCALATE_CONF]
+    info = {"candidates": len(weak), "improved": 0}
+    if not weak or Image is None:
+        return items, info
+    weak.sort(key=lambda it: float(it.get("confidence") or 0.0))
+    weak = weak[:OCR_LINE_ESCALATE_MAX]
+
+    words = [it for it in items if it.get("source") == "ocr" and not it.get("level") and it.get("bbox")]
+    max_tile_px = int(max_tile_px or OCR_MAX_TILE_PX)
+    prect = page.rect
+    jobs = []
+    for ln in weak:
+        x0, y0, x1, y1 = ln["bbox"]
+        h = max(1.0, y1 - y0)
+        pad = OCR_LINE_ESCALATE_PAD * h
+        clip = fitz.Rect(x0 - pad, y0 - pad, x1 + pad, y1 + pad) & prect
+        if clip.is_empty:
+            continue
+        zoom = min(OCR_MAX_ZOOM, _zoom_for_glyph_height(h) * OCR_LINE_ESCALATE_ZOOM_GAIN)
+        zoom = min(zoom, max_tile_px / max(1.0, clip.width), max_tile_px / max(1.0, clip.height))
+        try:
+            img, _z = _render_page_to_pil(page, zoom=zoom, clip=clip)
+        except Exception as e:
+            logging.debug(f"line escalation render failed: {e}")
+            continue
+        old = [w for w in words if _center_in(w["bbox"], ln["bbox"])]
+        jobs.append((ln, old, clip, zoom, img.convert("L")))
+    if not jobs:
+        return items, info
+
+    def _run(job):
+        return _run_ocr(job[4], ocr_lang, OCR_LINE_CONFIG, zoom=job[3], kind="line", plan=plan)
+
+    threads = min(OCR_REGION_THREADS, len(jobs))
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as ex:
+            results = list(ex.map(extract_stats.bind(_run), jobs))
+    else:
+        results = [_run(j) for j in jobs]
+
+    drop = set()
+    added = []
+    for (ln, old, clip, zoom, _img), data in zip(jobs, results):
+        new = _line_words_from_data(data, clip, zoom, ln.get("underline"))
+        if not new:
+            continue
+        old_confs = [float(w.get("confidence") or 0.0) for w in old] or [float(ln.get("confidence") or 0.0)]
+        new_confs = [w["confidence"] for w in new]
+        if sum(new_confs) / len(new_confs) < sum(old_confs) / len(old_confs) + OCR_LINE_ESCALATE_MIN_GAIN:
+            continue
+        new_text = " ".join(w["text"] for w in new)
+        drop.update(id(w) for w in old)
+        added.extend(new)
+        bbox = new[0]["bbox"]
+        for w in new[1:]:
+            bbox = _merge_bbox_px(bbox, w["bbox"])
+        ln["text"] = new_text
+        ln["bbox"] = tuple(bbox)
+        ln["confidence"] = min(new_confs)
+        ln["size_mm"] = max(float(w.get("size_mm") or 0.0) for w in new)
+        info["improved"] += 1
+
+    if info["improved"]:
+        items = [it for it in items if id(it) not in drop] + added
+        extract_stats.count("ocr_lines_improved", info["improved"])
+    return items, info
+
+def _outlined_text_regions(page, geom):
+    """list ของ dict {"rect": fitz.Rect, "glyph_h", "glyphs", "zoom"} จากกลุ่ม glyph outline บนหน้า"""
+    prect = page.rect
+    p = OUTLINE_REGION_PAD_PT
+    out = []
+    for (x0, y0, x1, y1, gh, n) in geom.outlined_text_clusters():
+        r = fitz.Rect(x0 - p, y0 - p, x1 + p, y1 + p) & prect
+        if r.is_empty:
+            continue
+        out.append({"rect": r, "glyph_h": round(gh, 2), "glyphs": n, "zoom": _zoom_for_glyph_height(gh)})
+    return out
 
-        for page_index in range(len(doc)):
-            page = doc.load_page(page_index)
-            blocks = page.get_text("dict")["blocks"]
+def detect_outlined_text_regions(pdf_path, page_no):
+    """
+    (ดีบัก) คืนบริเวณตัวอักษร outline ของหน้า page_no (เริ่มที่ 1):
+    list ของ {"bbox": (x0, y0, x1, y1) pt, "glyph_h": pt, "glyphs": จำนวน, "zoom": ซูมที่จะใช้ OCR}
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        page = doc.load_page(int(page_no) - 1)
+        return [{"bbox": tuple(round(v, 2) for v in r["rect"]), "glyph_h": r["glyph_h"],
+                 "glyphs": r["glyphs"], "zoom": r["zoom"]}
+                for r in _outlined_text_regions(page, _PageGeometry(page))]
+    finally:
+        doc.close()
 
-            raw_spans = []
-            line_groups = []
+def _ocr_block_meta(ocr_items):
+    """
+    บล็อก OCR หลายบรรทัดของหน้า (สร้างครั้งเดียวตอน extract; ข้อความจากบรรทัดหลังยกระดับ/ตัดส่วนที่ชั้นข้อความมีแล้ว)
+    → list ของ {"text", "bbox", "size_mm", "underline", "lines"} เก็บใน triage["ocr_blocks"] (meta ของหน้า)
+    ให้ matcher ใช้เป็น fallback ของประโยคที่ขึ้นบรรทัดใหม่; ลบคีย์ "block_bbox" ออกจากบรรทัด
+    """
+    blocks = {}
+    for it in ocr_items:
+        bb = it.pop("block_bbox", None)
+        if bb is not None and it.get("level") == "line" and (it.get("text") or "").strip():
+            blocks.setdefault(tuple(bb), []).append(it)
+    out = []
+    for bb, lines in blocks.items():
+        if len(lines) < 2:
+            continue
+        out.append({
+            "text": " ".join(ln["text"].strip() for ln in lines),
+            "bbox": list(bb),
+            "size_mm": max(float(ln.get("size_mm") or 0.0) for ln in lines),
+            "underline": any(bool(ln.get("underline")) for ln in lines),
+            "lines": len(lines),
+        })
+    return out
 
-            for block in blocks:
-                if "lines" not in block:
+def _drop_ocr_covered_by_text_layer(ocr_items, raw_spans, regions, min_ioa=0.6):
+    """
+    ตัดคำ/บรรทัด OCR ที่ชั้นข้อความ PDF มีอยู่แล้วในตำแหน่งเดียวกัน
+    (bbox ของ OCR อยู่ใน span ≥ min_ioa และข้อความ OCR เป็นส่วนหนึ่งของข้อความ span)
+    """
+    spans = []
+    for it in raw_spans:
+        b = it.get("bbox")
+        if not b:
+            continue
+        sb = fitz.Rect(b)
+        if any(sb.intersects(r) for r in regions):
+            spans.append((sb, _norm_item_text(it.get("text"))))
+    if not spans:
+        return ocr_items
+
+    kept = []
+    for it in ocr_items:
+        b = it.get("bbox")
+        t = _norm_item_text(it.get("text"))
+        if b and t:
+            ob = fitz.Rect(b)
+            oa = max(1e-6, ob.width * ob.height)
+            covered = False
+            for sb, st in spans:
+                inter = ob & sb
+                if inter.is_empty or (inter.width * inter.height) / oa < min_ioa:
                     continue
+                if t in st:
+                    covered = True
+                    break
+            if covered:
+                continue
+        kept.append(it)
+    return kept
 
-                for line in block["lines"]:
-                    if "spans" not in line:
-                        continue
+def _page_triage_features(page, raw_spans, page_items, geom):
+    try:
+        page_area = float(page.rect.width * page.rect.height)
+    except Exception:
+        page_area = 0.0
+    area_cm2 = max(1e-6, page_area / _PT2_PER_CM2)
 
-                    __line_indices = []
+    n_chars = n_garbage = 0
+    for it in raw_spans:
+        if it.get("level") == "line":
+            continue
+        t = it.get("text") or ""
+        n_chars += len(t)
+        n_garbage += sum(1 for ch in t if _is_garbage_char(ch))
+
+    coverage, n_images = _image_coverage(page, page_area)
+
+    texts_join = " ".join(_norm_sp(it.get("text", "")) for it in page_items if it.get("text"))
+    has_small_parts = ("small parts" in texts_join)
+    has_mbg_keyword = ("small parts may be generat" in texts_join)
+    has_iws_heading = ("international warning statement" in texts_join)
+
+    return {
+        "image_coverage": round(coverage, 4),
+        "n_images": n_images,
+        "text_chars": n_chars,
+        "text_density": round(n_chars / area_cm2, 3),
+        "garbage_ratio": round(n_garbage / n_chars, 3) if n_chars else 0.0,
+        "vector_density": round(geom.n_paths / area_cm2, 3),
+        "outline_glyphs": geom.n_outline_glyphs(),
+        "n_items": len(page_items),
+        "readable_size": any((it.get("size_mm") or 0) >= 1.0 for it in page_items),
+        # หน้า "เสี่ยง SP": มี small parts บน text-layer แต่ยังไม่เห็น may be generat... หรือพบหัวข้อ IWS
+        "sp_risk": (has_small_parts and not has_mbg_keyword) or has_iws_heading,
+    }
+
+def _triage_page(f, ocr_only_suspect_pages=True):
+    """
+    คืน (decision, reasons): "skip" ไม่ OCR, "fast" OCR รอบเร็ว (ยกระดับเป็น full ได้), "full" OCR เต็มทันที
+    """
+    if not ocr_only_suspect_pages:
+        return "fast", ["ocr_only_suspect_pages=False"]
+    if f["text_chars"] and f["garbage_ratio"] >= TRIAGE_MAX_GARBAGE:
+        return "full", [f"unmapped glyphs {f['garbage_ratio']:.0%}"]
+    if not f["text_chars"] and f["image_coverage"] >= TRIAGE_RASTER_COVERAGE:
+        return "full", [f"no text layer, images cover {f['image_coverage']:.0%}"]
+
+    reasons = []
+    if f["sp_risk"]:
+        reasons.append("small-parts warning incomplete on text layer")
+    if f["image_coverage"] >= TRIAGE_MIN_IMAGE_COVERAGE:
+        reasons.append(f"images cover {f['image_coverage']:.0%}")
+    if f["vector_density"] >= TRIAGE_VECTOR_DENSITY and f["text_density"] < TRIAGE_SPARSE_TEXT:
+        reasons.append(f"dense vector paths ({f['vector_density']:.1f}/cm²) with sparse text")
+    if f["outline_glyphs"] >= OUTLINE_MIN_GLYPHS:
+        reasons.append(f"outlined text ({f['outline_glyphs']} glyph paths)")
+    if f["n_items"] < 5 or not f["readable_size"]:
+        reasons.append(f"thin text layer ({f['n_items']} items)")
+    if reasons:
+        return "fast", reasons
+
+    reasons = ["text layer sufficient"]
+    if f["n_images"]:
+        reasons.append(f"{f['n_images']} small image(s) cover {f['image_coverage']:.1%}")
+    return "skip", reasons
+
+def _extract_page_items(page, enable_ocr=True, ocr_only_suspect_pages=True,
+                        ocr_lang_fast="eng", ocr_lang_full="eng", max_tile_px=None,
+                        auto_ocr_lang=True, ocr_lang_override=None,
+                        on_stage=None, cancel=None, collect_stats=False, ocr_cache=None):
+    """
+    ไปป์ไลน์ต่อหน้า: spans + underline → line items → สังเคราะห์ 3+ → OCR triage → OCR fallback
+    ภาพเรนเดอร์ของหน้าใช้ร่วมกันทุกขั้นตอน และคืนหน่วยความจำทันทีเมื่อจบหน้า
+    คืน (items, triage, stats) โดย triage = {"decision", "reasons", "features"}
+    stats = dict เวลา/จำนวนครั้งต่อขั้นตอน + การเรียก OCR (extract_stats.PageStats) เมื่อ collect_stats ไม่งั้น None
+    on_stage(ชื่อขั้นตอน) ถูกเรียกก่อนแต่ละขั้นตอน; cancel (job_control.CancelToken) ถูกเช็กระหว่างขั้นตอน
+    → ยกเลิกกลางหน้าจะ raise job_control.Cancelled
+    auto_ocr_lang → แคบชุดภาษา OCR ของหน้าตาม script ที่ตรวจพบ (ภายในชุด ocr_lang_fast/full)
+    ocr_lang_override → (fast, full) ของหน้านี้ ใช้ตามนั้นไม่ตรวจ script
+    ocr_cache → extract_cache.OcrCache ที่ผู้เรียกเปิดไว้ (ส่งต่อให้ทุกการเรียก OCR ของหน้านี้; None = ไม่ใช้)
+    """
+    def _stage(name):
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        if on_stage is not None:
+            on_stage(name)
 
-                    for span in line["spans"]:
-                        text = (span.get("text") or "").strip()
-                        if not text:
-                            continue
+    raster = _PageRaster(page, max_zoom=4.0, max_tile_px=max_tile_px)
+    try:
+        with extract_stats.page_scope(page.number + 1, enabled=collect_stats) as ps:
+            items, triage = _extract_page_items_impl(page, raster, enable_ocr, ocr_only_suspect_pages,
+                                                     ocr_lang_fast, ocr_lang_full, _stage,
+                                                     auto_ocr_lang, ocr_lang_override, ocr_cache)
+        if ps is not None:
+            ps.add_count("items", len(items))
+        return items, triage, (ps.to_dict() if ps is not None else None)
+    finally:
+        raster.release()
+
+def _extract_page_items_impl(page, raster, enable_ocr, ocr_only_suspect_pages,
+                             ocr_lang_fast, ocr_lang_full, stage,
+                             auto_ocr_lang=True, ocr_lang_override=None, ocr_cache=None):
+    # สถานะ OCR ของทั้งหน้า (cache, งบการเรียก, ภาษาที่โหลดไม่ได้, จำนวนครั้งที่ล้มเหลว) ใช้ร่วมทุกขั้นตอน
+    ocr_plan = _OcrPagePlan(cache=ocr_cache)
+    stage("text layer")
+    with timed("get_text"):
+        blocks = page.get_text("dict")["blocks"]
+
+    raw_spans = []
+    line_groups = []
+
+    for block in blocks:
+        if "lines" not in block:
+            continue
 
-                        size_pt  = float(span.get("size", 0) or 0)
-                        size_mm  = _pt_to_mm(size_pt)
-                        fontname = span.get("font", "") or ""
-                        flags    = int(span.get("flags", 0) or 0)
-                        bbox     = span.get("bbox", None)
-
-                        raw_spans.append({
-                            "text": text,
-                            "bold": (flags & 2) != 0 or (
-                                "bold" in fontname.lower()
-                                or re.search(
-                                    r"(?i)(?:-|_)?("
-                                    r"black|heavy|ultra\s*bold|extra\s*bold|semi\s*bold|semibold|demi\s*bold|demibold|"
-                                    r"medium|med|md|boldmt|blk|bd|sb"
-                                    r")\b",
-                                    fontname
-                                ) is not None
-                            ),
-                            "italic": (flags & 1) != 0,
-                            "underline": ((flags & 8) != 0) or ("underline" in fontname.lower()),
-                            "size_pt": size_pt,
-                            "size_mm": size_mm,
-                            "size_unit": "pt",
-                            "font": fontname,
-                            "bbox": bbox,
-                            "source": "pdf",
-                        })
-                        __line_indices.append(len(raw_spans) - 1)
-
-                    if __line_indices:
-                        line_groups.append(__line_indices)
-
-            # เติม underline จากเส้นกราฟิก
-            segs = _collect_underline_segments(page)
-            if segs:
-                for it in raw_spans:
-                    if it.get("underline"):
-                        continue
-                    b = it.get("bbox")
-                    if not b:
-                        continue
-                    x0, y0, x1, y1 = b
-                    width = max(1.0, x1 - x0)
-                    for sx0, sy, sx1 in segs:
-                        if abs(sy - y1) <= 2.0 and _x_overlap(x0, x1, sx0, sx1) >= 0.5 * width:
-                            it["underline"] = True
-                            break
+        for line in block["lines"]:
+            if "spans" not in line:
+                continue
 
-            # รวมเป็น line-items ต่อบรรทัด 
-            for __idxs in line_groups:
-                if not __idxs:
-                    continue
-                __spans = [raw_spans[i] for i in __idxs if 0 <= i < len(raw_spans)]
-                if not __spans:
-                    continue
-                __texts = [s.get("text","") for s in __spans if (s.get("text") or "").strip()]
-                if not __texts:
+            __line_indices = []
+
+            for span in line["spans"]:
+                text = (span.get("text") or "").strip()
+                if not text:
                     continue
 
-                __bold      = any(bool(s.get("bold")) for s in __spans)
-                __italic    = any(bool(s.get("italic")) for s in __spans)
-                __underline = any(bool(s.get("underline")) for s in __spans)
-                __size_mm   = 0.0
-                for s in __spans:
-                    try:
-                        __size_mm = max(__size_mm, float(s.get("size_mm") or 0.0))
-                    except Exception:
-                        pass
-
-                raw_spans.append({
-                    "text": " ".join(__texts),
-                    "bold": __bold,
-                    "italic": __italic,
-                    "underline": __underline,
-                    "size_mm": __size_mm,
-                    "size_unit": "mm",
-                    "font": "",
-                    "level": "line",
+                size_pt  = float(span.get("size", 0) or 0)
+                size_mm  = _pt_to_mm(size_pt)
+                fontname = span.get("font", "") or ""
+                flags    = int(span.get("flags", 0) or 0)
+                bbox     = span.get("bbox", None)
+
+                raw_spans.append(PageItem({
+                    "text": text,
+                    "bold": (flags & 2) != 0 or (
+                        "bold" in fontname.lower()
+                        or re.search(
+                            r"(?i)(?:-|_)?("
+                            r"black|heavy|ultra\s*bold|extra\s*bold|semi\s*bold|semibold|demi\s*bold|demibold|"
+                            r"medium|med|md|boldmt|blk|bd|sb"
+                            r")\b",
+                            fontname
+                        ) is not None
+                    ),
+                    "italic": (flags & 1) != 0,
+                    "underline": ((flags & 8) != 0) or ("underline" in fontname.lower()),
+                    "size_pt": size_pt,
+                    "size_mm": size_mm,
+                    "size_unit": "pt",
+                    "font": fontname,
+                    "bbox": bbox,
                     "source": "pdf",
-                })
+                }))
+                __line_indices.append(len(raw_spans) - 1)
+
+            if __line_indices:
+                line_groups.append(__line_indices)
+
+    # เติม underline จากเส้นกราฟิก
+    geom = _PageGeometry(page)
+    with timed("drawings"):
+        geom.underline_segments()
+    if geom.underline_segments():
+        for it in raw_spans:
+            if it.get("underline"):
+                continue
+            b = it.get("bbox")
+            if not b:
+                continue
+            if geom.has_underline(b):
+                it["underline"] = True
 
-            page_items = [dict(it) for it in raw_spans]
+    # รวมเป็น line-items ต่อบรรทัด 
+    for __idxs in line_groups:
+        if not __idxs:
+            continue
+        __spans = [raw_spans[i] for i in __idxs if 0 <= i < len(raw_spans)]
+        if not __spans:
+            continue
+        __texts = [s.get("text","") for s in __spans if (s.get("text") or "").strip()]
+        if not __texts:
+            continue
 
+        __bold      = any(bool(s.get("bold")) for s in __spans)
+        __italic    = any(bool(s.get("italic")) for s in __spans)
+        __underline = any(bool(s.get("underline")) for s in __spans)
+        __size_mm   = 0.0
+        for s in __spans:
             try:
-                if not _page_has_3plus_text(page_items):
-                    plus_boxes_vec = _detect_vector_plus_signs(page)
-                    if plus_boxes_vec:
-                        synth_vec = _synthesize_3plus_items_from_vectors(raw_spans, plus_boxes_vec, proximity_pt=14.0)
-                        if synth_vec:
-                            page_items = _dedup_extend_items(page_items, synth_vec)
-
-                    plus_boxes_tok = _find_token_plus_boxes_from_spans(raw_spans)
-                    if plus_boxes_tok:
-                        synth_tok = _synthesize_3plus_items_from_tokens(raw_spans, proximity_pt=14.0)
-                        if synth_tok:
-                            page_items = _dedup_extend_items(page_items, synth_tok)
-
-                    three_boxes = []
-                    for it in raw_spans:
-                        if (it.get("source") or "pdf") == "pdf" and (it.get("text") or "").strip() == "3" and it.get("bbox"):
-                            three_boxes.append(tuple(it["bbox"]))
-                    for it in page_items:
-                        if (it.get("text") or "").strip() == "3" and it.get("bbox"):
-                            three_boxes.append(tuple(it["bbox"]))
-
-                    anchors = (plus_boxes_vec or []) + (plus_boxes_tok or [])
-                    if anchors:
-                        def _center(b): return ((b[0]+b[2])/2.0, (b[1]+b[3])/2.0)
-                        def _score(box):
-                            x0, y0, x1, y1 = box
-                            area = max(1e-6, (x1 - x0) * (y1 - y0))
-                            if three_boxes:
-                                cx, cy = _center(box)
-                                d = min((((cx - _center(tb)[0]) ** 2) + ((cy - _center(tb)[1]) ** 2)) ** 0.5 for tb in three_boxes)
-                            else:
-                                d = 1e3
-                            return (d, -area) 
-
-                        anchors_sorted = sorted(anchors, key=_score)
-                        anchors_top = anchors_sorted[:4] 
-
-                        roi_items = _ocr_3plus_via_roi(page, anchors_top, zoom=4.0)
-                        if roi_items:
-                            page_items = _dedup_extend_items(page_items, roi_items)
-
-                    if not _page_has_3plus_text(page_items) and three_boxes:
-                        roi_from_three = _ocr_plus_next_to_three(page, three_boxes, zoom=4.0, max_targets=4)
-                        if roi_from_three:
-                            page_items = _dedup_extend_items(page_items, roi_from_three)
-
+                __size_mm = max(__size_mm, float(s.get("size_mm") or 0.0))
             except Exception:
                 pass
 
-            # OCR fallback 
-            if enable_ocr:
-                has_images = False
+        __bbox = None
+        for s in __spans:
+            if s.get("bbox"):
+                __bbox = tuple(s["bbox"]) if __bbox is None else _merge_bbox_px(__bbox, s["bbox"])
+
+        raw_spans.append(PageItem({
+            "text": " ".join(__texts),
+            "bold": __bold,
+            "italic": __italic,
+            "underline": __underline,
+            "size_mm": __size_mm,
+            "size_unit": "mm",
+            "font": "",
+            "bbox": tuple(__bbox) if __bbox else None,
+            "level": "line",
+            "source": "pdf",
+        }))
+
+    page_items = _PageItemStore(raw_spans)
+
+    stage("3+ detection")
+    try:
+        with timed("3+ synthesis"):
+            if not _page_has_3plus_text(page_items):
+                plus_boxes_vec = _detect_vector_plus_signs(page, geom=geom)
+                if plus_boxes_vec:
+                    synth_vec = _synthesize_3plus_items_from_vectors(raw_spans, plus_boxes_vec, proximity_pt=14.0)
+                    if synth_vec:
+                        page_items.extend(synth_vec)
+
+                plus_boxes_tok = _find_token_plus_boxes_from_spans(raw_spans)
+                if plus_boxes_tok:
+                    synth_tok = _synthesize_3plus_items_from_tokens(raw_spans, proximity_pt=14.0)
+                    if synth_tok:
+                        page_items.extend(synth_tok)
+
+                three_boxes = []
+                for it in raw_spans:
+                    if (it.get("source") or "pdf") == "pdf" and (it.get("text") or "").strip() == "3" and it.get("bbox"):
+                        three_boxes.append(tuple(it["bbox"]))
+                for it in page_items:
+                    if (it.get("text") or "").strip() == "3" and it.get("bbox"):
+                        three_boxes.append(tuple(it["bbox"]))
+
+                anchors = (plus_boxes_vec or []) + (plus_boxes_tok or [])
+                if anchors:
+                    def _center(b): return ((b[0]+b[2])/2.0, (b[1]+b[3])/2.0)
+                    def _score(box):
+                        x0, y0, x1, y1 = box
+                        area = max(1e-6, (x1 - x0) * (y1 - y0))
+                        if three_boxes:
+                            cx, cy = _center(box)
+                            d = min((((cx - _center(tb)[0]) ** 2) + ((cy - _center(tb)[1]) ** 2)) ** 0.5 for tb in three_boxes)
+                        else:
+                            d = 1e3
+                        return (d, -area) 
+
+                    anchors_sorted = sorted(anchors, key=_score)
+                    anchors_top = anchors_sorted[:4] 
+
+                    roi_items = _ocr_3plus_via_roi(page, anchors_top, zoom=4.0, raster=raster,
+                                                   plan=ocr_plan)
+                    if roi_items:
+                        page_items.extend(roi_items)
+
+                if not _page_has_3plus_text(page_items) and three_boxes:
+                    roi_from_three = _ocr_plus_next_to_three(page, three_boxes, zoom=4.0, max_targets=4, raster=raster,
+                                                             plan=ocr_plan)
+                    if roi_from_three:
+                        page_items.extend(roi_from_three)
+
+    except Exception:
+        pass
+
+    # OCR triage → OCR fallback
+    with timed("triage"):
+        features = _page_triage_features(page, raw_spans, page_items, geom)
+    if enable_ocr:
+        decision, reasons = _triage_page(features, ocr_only_suspect_pages)
+    else:
+        decision, reasons = "skip", ["OCR disabled"]
+    triage = {"decision": decision, "reasons": reasons, "features": features}
+
+    if decision != "skip":
+        # ขอบเขต OCR: เฉพาะภาพ (ชั้นข้อความใช้ได้) / เฉพาะกลุ่มตัวอักษร outline (ซูมตามความสูง glyph)
+        #             / เฉพาะแถวข้อความที่หาได้ (ไม่มีชั้นข้อความ) / ทั้งหน้า
+        regions, scope = None, "page"
+        fast_zooms = full_zooms = None
+        if features["n_images"] and _text_layer_trusted(features):
+            regions = _image_ocr_regions(page)
+            scope = "images"
+        else:
+            outlines = _outlined_text_regions(page, geom) if features["outline_glyphs"] else []
+            if outlines:
+                triage["outline_regions"] = [
+                    {"bbox": [round(v, 1) for v in o["rect"]], "glyph_h": o["glyph_h"],
+                     "glyphs": o["glyphs"], "zoom": o["zoom"]}
+                    for o in outlines
+                ]
+            if outlines and not features["n_images"]:
+                regions = [o["rect"] for o in outlines]
+                fast_zooms = full_zooms = [[o["zoom"]] for o in outlines]
+                scope = "outlines"
+            elif not features["text_chars"] or features["garbage_ratio"] >= TRIAGE_MAX_GARBAGE:
+                regions = _detect_text_regions(raster)
+                scope = "text-regions"
+        if regions is None:
+            scope = "page"
+        triage["ocr_scope"] = scope
+        if regions is not None:
+            triage["ocr_regions"] = [[round(v, 1) for v in r] for r in regions]
+
+        # ซูมต่อบริเวณ (หรือทั้งหน้า) จากความสูงตัวอักษรที่วัดได้ → OCR ครั้งเดียวที่ซูมนั้น
+        # วัดไม่ได้ → ชุดซูมเดิม (OCR_FAST_ZOOMS / OCR_FULL_ZOOMS)
+        page_fast_zooms, page_full_zooms = OCR_FAST_ZOOMS, OCR_FULL_ZOOMS
+        if fast_zooms is None:
+            with timed("glyph height"):
+                est = [_estimate_ocr_zoom(raster, r, raw_spans)
+                       for r in (regions if regions is not None else [page.rect])]
+            triage["ocr_zoom"] = est
+            if regions is not None:
+                fast_zooms = [[e["zoom"]] if e else OCR_FAST_ZOOMS for e in est]
+                full_zooms = [[e["zoom"]] if e else OCR_FULL_ZOOMS for e in est]
+            elif est[0]:
+                page_fast_zooms = page_full_zooms = [est[0]["zoom"]]
+
+        # ชุดภาษา OCR ของหน้านี้ (บันทึกใน triage เสมอ)
+        if ocr_lang_override:
+            ocr_lang_fast, ocr_lang_full = ocr_lang_override
+            lang_info = {"source": "override"}
+        elif auto_ocr_lang:
+            stage("OCR language")
+            with timed("ocr lang"):
+                ocr_lang_fast, ocr_lang_full, lang_info = _select_page_ocr_langs(
+                    raster, raw_spans, features, ocr_lang_fast, ocr_lang_full, scope)
+        else:
+            lang_info = {"source": "requested"}
+        triage["ocr_lang"] = dict(lang_info, fast=ocr_lang_fast, full=ocr_lang_full)
+
+        ocr_items = []
+        if decision == "fast":
+            stage("OCR fast")
+            with timed("ocr fast"):
+                ocr_items = _ocr_extract_items(
+                    page,
+                    ocr_lang=ocr_lang_fast,
+                    zooms=page_fast_zooms,
+                    conf_threshold=OCR_FAST_CONF,
+                    configs=OCR_FAST_CONFIGS,
+                    raster=raster,
+                    regions=regions,
+                    region_zooms=fast_zooms,
+                    plan=ocr_plan
+                )
+
+        # ยกระดับรายบรรทัดเป็นทางหลัก (_escalate_low_conf_lines ด้านล่าง); OCR ใหม่ทั้งหน้า/บริเวณด้วยรอบ full
+        # เฉพาะเมื่อรอบเร็วไม่ได้คำที่ใช้ได้เลย (นับเฉพาะ item ระดับคำ ไม่นับบรรทัด)
+        need_full = decision == "full" or not any(
+            not it.get("level") and (it.get("text") or "").strip() for it in ocr_items)
+
+        # triage สั่ง full → ข้ามรอบเร็ว; รอบเร็วว่างเปล่า → รอบ full (config/เกณฑ์ conf กว้างกว่า แม้ภาษาชุดเดียวกัน)
+        run_full = need_full and bool(ocr_lang_full)
+        triage["escalated"] = run_full and decision == "fast"
+        if run_full:
+            stage("OCR full")
+            with timed("ocr full"):
+                ocr_items = _ocr_extract_items(
+                    page,
+                    ocr_lang=ocr_lang_full,
+                    zooms=page_full_zooms,
+                    conf_threshold=OCR_FULL_CONF,
+                    configs=OCR_FULL_CONFIGS,
+                    raster=raster,
+                    regions=regions,
+                    region_zooms=full_zooms,
+                    plan=ocr_plan
+                )
+
+        # บรรทัดที่ confidence ต่ำ: OCR ซ้ำเฉพาะกล่องบรรทัดแทนการ OCR ทั้งหน้าใหม่
+        if ocr_items:
+            stage("OCR lines")
+            with timed("ocr lines"):
+                ocr_items, triage["line_escalation"] = _escalate_low_conf_lines(
+                    page, ocr_items, ocr_lang_full or ocr_lang_fast, raster.max_tile_px, ocr_plan)
+
+        if ocr_items and regions is not None:
+            ocr_items = _drop_ocr_covered_by_text_layer(ocr_items, raw_spans, regions)
+        blocks = _ocr_block_meta(ocr_items)
+        if blocks:
+            triage["ocr_blocks"] = blocks
+        if ocr_items:
+            page_items.extend(ocr_items)
+
+        # หลังรวม OCR แล้ว ลอง join '3' และ '+' ที่อยู่ชิดกันเป็น '3+'
+        try:
+            if not _page_has_3plus_text(page_items):
+                has3 = any((it.get("text") or "").strip() == "3" for it in page_items)
+                hasPlus = any((it.get("text") or "").strip() in {"+", "＋"} for it in page_items)
+                if has3 and hasPlus:
+                    synth_join = _join_adjacent_3_plus(page_items)
+                    if synth_join:
+                        page_items.extend(synth_join)
+        except Exception:
+            pass
+
+        try:
+            if not _page_has_3plus_text(page_items):
+                three_boxes_ocr = [
+                tuple(it["bbox"])
+                for it in page_items
+                if (it.get("source") or "").lower() == "ocr"
+                    and (it.get("text") or "").strip() == "3"
+                    and it.get("bbox") is not None
+                ]
+                if three_boxes_ocr:
+                    roi_from_three = _ocr_plus_next_to_three(page, three_boxes_ocr, zoom=4.0, max_targets=6,
+                                                             raster=raster, plan=ocr_plan)
+                    if roi_from_three:
+                        page_items.extend(roi_from_three)
+        except Exception:
+            pass
+
+    if ocr_plan.failed:
+        triage["ocr_failed"] = ocr_plan.failed
+    return page_items.items, triage
+
+# ---- Page cache: key = hash ของ content streams + resources ของหน้า + พารามิเตอร์ OCR ----
+# เพิ่มเลขนี้เมื่อเปลี่ยนไปป์ไลน์จนผลลัพธ์เดิมใน cache ใช้ไม่ได้
+_PAGE_CACHE_VERSION = 20
+
+def _page_cache_key(doc, page, opts):
+    h = hashlib.sha256()
+    params = dict(opts)
+    params.update({
+        "version": _PAGE_CACHE_VERSION,
+        # backend + รุ่น tesseract ("" = ไม่มี engine): ผลที่ได้ตอนไม่มี OCR ไม่ถูกใช้เมื่อมี engine แล้ว
+        "ocr_engine": ocr_engine.engine_id(),
+        "fast": [OCR_FAST_ZOOMS, OCR_FAST_CONF, OCR_FAST_CONFIGS],
+        "full": [OCR_FULL_ZOOMS, OCR_FULL_CONF, OCR_FULL_CONFIGS],
+    })
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    h.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    h.update(page.read_contents() or b"")
+
+    # resources อ้างด้วยชื่อ (/Im0, /F1) ใน content stream → hash ตามชื่อ+เนื้อหา ไม่ใช้เลข xref
+    # เพื่อให้หน้าเดิมใน revision ใหม่ของไฟล์ (xref เปลี่ยน) ยังใช้ cache ได้
+    for img in sorted(page.get_images(full=True), key=lambda t: str(t[7])):
+        xref, _smask, w, hgt, bpc, cs, _alt, name, flt = img[:9]
+        h.update(repr((name, w, hgt, bpc, cs, flt)).encode("utf-8"))
+        try:
+            h.update(doc.xref_stream_raw(xref) or b"")
+        except Exception:
+            pass
+    for xo in sorted(page.get_xobjects(), key=lambda t: str(t[1])):
+        xref, name = xo[0], xo[1]
+        h.update(repr((name, tuple(xo[3]) if len(xo) > 3 else None)).encode("utf-8"))
+        try:
+            h.update(doc.xref_stream_raw(xref) or b"")
+        except Exception:
+            pass
+    for f in sorted(page.get_fonts(full=True), key=lambda t: str(t[4])):
+        xref = f[0]
+        h.update(repr(tuple(f[1:6])).encode("utf-8"))
+        try:
+            kind, val = doc.xref_get_key(xref, "ToUnicode")
+            if kind == "xref":
+                h.update(doc.xref_stream_raw(int(val.split()[0])) or b"")
+        except Exception:
+            pass
+    try:
+        for annot in page.annots() or []:
+            h.update(repr((annot.type[0], tuple(annot.rect))).encode("utf-8"))
+    except Exception:
+        pass
+    return h.hexdigest()
+
+# ---- Process pool: แต่ละ worker เปิดเอกสารของตัวเองครั้งเดียวตอนเริ่ม pool ----
+_POOL_DOC = None
+_POOL_OPTS = None
+_POOL_STATS = False
+_POOL_OCR_CACHE = None   # OcrCache ของ worker (แต่ละโปรเซสเปิด connection ของตัวเอง)
+_POOL_CANCEL = None      # CancelToken บน Event ของ Manager (ตั้งจากโปรเซสหลัก) หรือ None
+_POOL_STAGES = None      # Queue ของ Manager: worker ส่งชื่อขั้นตอนกลับไปรายงาน progress หรือ None
+
+# ช่วงเวลาที่โปรเซสหลักรอผลจาก pool ก่อนส่งต่อ progress ขั้นตอน / ส่งธงยกเลิกไปยัง worker (วินาที)
+POOL_POLL_S = 0.2
+
+def _pool_init(source, opts, collect_stats=False, ocr_cache_dir=None, cancel_event=None, stage_queue=None):
+    """
+    source = path หรือไบต์ของไฟล์ (PdfSession.source → worker ไม่ต้องอ่านไฟล์จากดิสก์ซ้ำ)
+    cancel_event / stage_queue = proxy จาก multiprocessing.Manager (None = ไม่ใช้)
+    """
+    global _POOL_DOC, _POOL_OPTS, _POOL_STATS, _POOL_OCR_CACHE, _POOL_CANCEL, _POOL_STAGES
+    _POOL_DOC = open_pdf_source(source)
+    _POOL_OCR_CACHE = _open_ocr_cache(ocr_cache_dir) if ocr_cache_dir else None
+    _POOL_OPTS = dict(opts)
+    _POOL_STATS = bool(collect_stats)
+    _POOL_CANCEL = CancelToken(cancel_event) if cancel_event is not None else None
+    _POOL_STAGES = stage_queue
+
+def _pool_stage(name):
+    try:
+        _POOL_STAGES.put(name)
+    except Exception:
+        pass
+
+def _close_pool(ex, mgr):
+    ex.shutdown(wait=True, cancel_futures=True)
+    if mgr is not None:
+        mgr.shutdown()
+
+def _pool_extract_page(page_index, ocr_lang_override=None):
+    page = _POOL_DOC.load_page(page_index)
+    return _extract_page_items(page, **_POOL_OPTS, ocr_lang_override=ocr_lang_override,
+                               collect_stats=_POOL_STATS, ocr_cache=_POOL_OCR_CACHE, cancel=_POOL_CANCEL,
+                               on_stage=_pool_stage if _POOL_STAGES is not None else None)
+
+def extract_text_by_page(pdf_path, enable_ocr=True, ocr_lang="eng+tha", ocr_only_suspect_pages=True,
+                         ocr_lang_fast=None, ocr_lang_full=None, workers=None, cache_dir=None,
+                         triage_log=None, max_tile_px=None, progress=None, cancel=None,
+                         with_stats=False, stats_jsonl=None, session=None,
+                         auto_ocr_lang=True, page_ocr_langs=None, ocr_cache=True):
+    """
+    คืน list ต่อหน้าของ item (page_items.PageItem) แต่ละ item มี bbox (พิกัด PDF, pt) และ page_no (เริ่มที่ 1)
+    workers > 1 → กระจายหน้าไปยัง process pool (ผลลัพธ์เรียงตามลำดับหน้าเหมือนเดิม)
+    cache_dir   → เก็บผลต่อหน้าลงดิสก์ หน้าที่เนื้อหาไม่เปลี่ยนจะโหลดจาก cache ทันที
+                  (หน้าที่เสร็จแล้วถูกบันทึกทันที ถ้างานถูกขัดจังหวะรอบหน้าจะทำต่อเฉพาะหน้าที่เหลือ)
+                  หน้าที่มีการเรียก OCR ล้มเหลว/หมดเวลาไม่ถูกบันทึก (triage_log["ocr_failed"] = จำนวนครั้ง)
+    max_tile_px → ด้านยาวสุด (px) ของ tile เมื่อเรนเดอร์/OCR หน้าใหญ่ (ดีฟอลต์ OCR_MAX_TILE_PX)
+                  หน้าที่ภาพเกิน max_tile_px² พิกเซลจะถูกแบ่ง tile → หน่วยความจำสูงสุดคงที่ไม่ว่าหน้าจะใหญ่แค่ไหน
+    triage_log  → list ที่จะถูกเติมผล OCR triage ต่อหน้า (เรียงตามหน้า):
+                  {"page_no", "decision": skip|fast|full, "reasons", "features", "escalated", "cached"}
+                  + "ocr_blocks" (บล็อก OCR หลายบรรทัด ดู _ocr_block_meta) → ส่งต่อให้ checklist_loader.start_check
+    progress    → progress(หน้าที่เสร็จ, จำนวนหน้า, ขั้นตอน) เช่น "cache", "text layer", "OCR fast", "OCR full"
+                  (โหมด process pool: worker ส่งขั้นตอนกลับผ่าน Queue ของ multiprocessing.Manager)
+    cancel      → job_control.CancelToken; หน้าที่กำลังทำถูกขัดระหว่างขั้นตอน (process pool: ผ่าน Event ของ Manager)
+                  เมื่อยกเลิกจะคืนผลบางส่วน: หน้าที่ยังไม่เสร็จเป็น [] และ
+                  triage_log ของหน้านั้นมี "cancelled": True (หน้าที่เสร็จแล้วยังถูกบันทึกลง cache)
+    with_stats  → คืน (pages, extract_stats.ExtractStats): เวลา/จำนวนครั้งต่อขั้นตอนต่อหน้า, การเรียก OCR
+                  ทุกครั้ง (ซูม, PSM, ภาษา, ขนาดภาพ), จำนวน item ก่อน/หลังตัดซ้ำ
+    stats_jsonl → path ไฟล์ JSON lines ที่จะต่อท้ายผลการวัด (เปิดการวัดโดยอัตโนมัติ)
+    session     → pdf_session.PdfSession ของไฟล์นี้: ใช้ Document/ไบต์ที่ session โหลดไว้แล้ว ไม่เปิดไฟล์ซ้ำ
+                  (ถือ session.lock ตลอดการอ่าน; pdf_path ใช้เป็นชื่อใน log/สถิติเท่านั้น)
+    auto_ocr_lang → เลือกชุดภาษา OCR ต่อหน้าอัตโนมัติจาก script ของชั้นข้อความ + tesseract OSD
+                  โดยเป็นชุดย่อยของ ocr_lang_fast/full (ภาษาที่ขอคือขอบเขตสูงสุด); บันทึกใน triage_log["ocr_lang"]
+    page_ocr_langs → {เลขหน้า (เริ่มที่ 1): "lang" หรือ (fast, full)} บังคับชุดภาษาของหน้านั้น
+    ocr_cache   → (เมื่อมี cache_dir) เก็บผล OCR ตาม hash ของภาพ+ภาษา+config ใน cache_dir/ocr.sqlite3
+                  ใช้ข้ามเอกสาร: ป้าย/ไอคอน/บล็อกข้อความที่ซ้ำใน SKU อื่นไม่ต้อง OCR ใหม่
+                  (hit/miss อยู่ในตัวนับ ocr_cache_hit / ocr_cache_miss ของ stats)
+    ปิดการวัด (ดีฟอลต์) ต้นทุนแทบเป็นศูนย์
+    """
+    if session is not None and not pdf_path:
+        pdf_path = session.path
+    collect_stats = bool(with_stats or stats_jsonl)
+    stats = ExtractStats(pdf_path) if collect_stats else None
+    t_start = time.perf_counter()
+    if (ocr_lang_fast is None) and (ocr_lang_full is None):
+        ocr_lang_fast = ocr_lang or "eng"
+        ocr_lang_full = ocr_lang_fast
+    elif (ocr_lang_fast is None) and (ocr_lang_full is not None):   
+        ocr_lang_fast = ocr_lang_full     
+    elif (ocr_lang_full is None) and (ocr_lang_fast is not None):
+        ocr_lang_full = ocr_lang_fast
+
+    opts = {
+        "enable_ocr": enable_ocr,
+        "ocr_only_suspect_pages": ocr_only_suspect_pages,
+        "ocr_lang_fast": ocr_lang_fast,
+        "ocr_lang_full": ocr_lang_full,
+        "max_tile_px": int(max_tile_px or OCR_MAX_TILE_PX),
+        "auto_ocr_lang": bool(auto_ocr_lang),
+    }
+    lang_overrides = {}
+    for pno, lang in (page_ocr_langs or {}).items():
+        if isinstance(lang, str):
+            lang = (lang, lang)
+        lang_overrides[int(pno) - 1] = (lang[0], lang[1] or lang[0])
+
+    def _page_opts(page_index):
+        ov = lang_overrides.get(page_index)
+        return opts if ov is None else dict(opts, ocr_lang_override=ov)
+
+    if session is not None:
+        session.lock.acquire()
+        doc = session.doc
+        source = session.source
+    else:
+        doc = fitz.open(pdf_path)
+        source = pdf_path
+    cache = None
+    if cache_dir:
+        try:
+            cache = PageCache(cache_dir)
+        except Exception as e:
+            logging.warning(f"Page cache unavailable ({cache_dir}): {e}")
+            cache = None
+    ocr_cache_dir = cache_dir if (cache_dir and ocr_cache) else None
+    # handle ของงานนี้เท่านั้น ส่งต่อลงไปตรงๆ (งาน extract หลายงานในโปรเซสเดียวกันไม่แย่ง cache กัน)
+    ocr_db = _open_ocr_cache(ocr_cache_dir) if ocr_cache_dir else None
+
+    try:
+        n_pages = len(doc)
+        all_pages = [None] * n_pages
+        triages = [None] * n_pages
+        keys = [None] * n_pages
+
+        if cache is not None:
+            for page_index in range(n_pages):
                 try:
-                    has_images = bool(page.get_images(full=True))
+                    keys[page_index] = _page_cache_key(doc, doc.load_page(page_index), _page_opts(page_index))
+                    cached = cache.get_page(keys[page_index])
+                    if cached is not None:
+                        items, meta = cached
+                        all_pages[page_index] = [PageItem.from_dict(d) for d in items]
+                        triages[page_index] = dict(meta or {}, cached=True)
+                        if stats is not None:
+                            stats.add_page({"page_no": page_index + 1, "cached": True})
                 except Exception:
-                    has_images = False
-
-                do_ocr = True
-
-                base_skip = False
-                force_sp_ocr = False
-
-                if ocr_only_suspect_pages and not has_images:
-                    enough_items = len(page_items) >= 5
-                    has_readable_size = any((it.get("size_mm") or 0) >= 1.0 for it in page_items)
-                    base_skip = (enough_items and has_readable_size)
-
-                    # บังคับ OCR เฉพาะหน้า "เสี่ยง SP":
-                    # มี small parts บน text-layer แต่ยังไม่เห็น may be generat...
-                    # หรือพบหัวข้อ International warning statement
-                    texts_join = " ".join(_norm_sp(it.get("text", "")) for it in page_items if it.get("text"))
-                    has_small_parts  = ("small parts" in texts_join)
-                    has_mbg_keyword  = ("small parts may be generat" in texts_join)
-                    has_iws_heading  = ("international warning statement" in texts_join)
-
-                    force_sp_ocr = (has_small_parts and not has_mbg_keyword) or has_iws_heading
-
-                # สรุปว่าจะ OCR ไหม (ครอบคลุมทุกกรณี)
-                do_ocr = (not base_skip) or force_sp_ocr
-
-                if do_ocr:
-                    fast_zooms   = [2.6, 3.0]
-                    fast_cfgs    = [
-                        "--oem 3 --psm 6 -c preserve_interword_spaces=1",
-                        "--oem 3 --psm 11 -c preserve_interword_spaces=1",
-                    ]
-                    ocr_items = _ocr_extract_items(
-                        page,
-                        ocr_lang=ocr_lang_fast,
-                        zooms=fast_zooms,
-                        conf_threshold=35,
-                        configs=fast_cfgs
-                    )
-
-                    need_full = False
-                    if not ocr_items:
-                        need_full = True
-                    else:
-                        text_join = " ".join([(it.get("text") or "") for it in ocr_items])[:600]
-                        few_words = sum(1 for it in ocr_items if (it.get("text") or "").strip()) < 8
-                        miss_plus = ("+" not in text_join) and ("＋" not in text_join)
-                        need_full = (few_words and miss_plus)
-
-                    if need_full and (ocr_lang_full and (ocr_lang_full != ocr_lang_fast)):
-                        full_zooms = [3.6, 4.0]
-                        full_cfgs  = [
-                            "--oem 3 --psm 6 -c preserve_interword_spaces=1",
-                            "--oem 3 --psm 7 -c preserve_interword_spaces=1",
-                            "--oem 3 --psm 11 -c preserve_interword_spaces=1",
-                        ]
-                        ocr_items = _ocr_extract_items(
-                            page,
-                            ocr_lang=ocr_lang_full,
-                            zooms=full_zooms,
-                            conf_threshold=30,  
-                            configs=full_cfgs
-                        )
-
-                    if ocr_items:
-                        page_items = _dedup_extend_items(page_items, ocr_items)
-
-                    # หลังรวม OCR แล้ว ลอง join '3' และ '+' ที่อยู่ชิดกันเป็น '3+'
-                    try:
-                        if not _page_has_3plus_text(page_items):
-                            has3 = any((it.get("text") or "").strip() == "3" for it in page_items)
-                            hasPlus = any((it.get("text") or "").strip() in {"+", "＋"} for it in page_items)
-                            if has3 and hasPlus:
-                                synth_join = _join_adjacent_3_plus(page_items)
-                                if synth_join:
-                                    page_items = _dedup_extend_items(page_items, synth_join)
-                    except Exception:
-                        pass
-
-                    try:
-                        if not _page_has_3plus_text(page_items):
-                            three_boxes_ocr = [
-                            tuple(it["bbox"])
-                            for it in page_items
-                            if (it.get("source") or "").lower() == "ocr"
-                                and (it.get("text") or "").strip() == "3"
-                                and it.get("bbox") is not None
-                            ]
-                            if three_boxes_ocr:
-                                roi_from_three = _ocr_plus_next_to_three(page, three_boxes_ocr, zoom=4.0, max_targets=6)
-                                if roi_from_three:
-                                    page_items = _dedup_extend_items(page_items, roi_from_three)
-                    except Exception:
-                        pass
+                    all_pages[page_index] = None
+            logging.info("Page cache: %d/%d pages reused",
+                         sum(1 for p in all_pages if p is not None), n_pages)
+
+        todo = [i for i in range(n_pages) if all_pages[i] is None]
+        n_done = n_pages - len(todo)
+        report(progress, n_done, n_pages, "cache")
+
+        def _done(page_index, result):
+            nonlocal n_done
+            page_items, triage, page_stats = result
+            if stats is not None and page_stats is not None:
+                stats.add_page(page_stats)
+            all_pages[page_index] = page_items
+            triages[page_index] = dict(triage, cached=False)
+            # หน้าที่มีการเรียก OCR ล้มเหลว/หมดเวลา ไม่ลง cache → รอบหน้า OCR ใหม่
+            if cache is not None and keys[page_index] and not triage.get("ocr_failed"):
+                cache.put_page(keys[page_index], page_items, triage)
+            n_done += 1
+
+        workers = max(1, min(int(workers or 1), len(todo)))
+        if workers > 1 and not is_cancelled(cancel):
+            # ธงยกเลิก/ขั้นตอนข้ามโปรเซส: worker เช็กธงระหว่างขั้นตอนของหน้า และส่งชื่อขั้นตอนกลับมา
+            mgr = multiprocessing.Manager() if (progress is not None or cancel is not None) else None
+            cancel_event = mgr.Event() if (mgr is not None and cancel is not None) else None
+            stage_queue = mgr.Queue() if (mgr is not None and progress is not None) else None
+            ex = ProcessPoolExecutor(max_workers=workers, initializer=_pool_init,
+                                     initargs=(source, opts, collect_stats, ocr_cache_dir,
+                                               cancel_event, stage_queue))
+            try:
+                futs = {ex.submit(_pool_extract_page, i, lang_overrides.get(i)): i for i in todo}
+                pending = set(futs)
+                while pending:
+                    finished, pending = wait(pending, timeout=POOL_POLL_S, return_when=FIRST_COMPLETED)
+                    while stage_queue is not None and not stage_queue.empty():
+                        report(progress, n_done, n_pages, stage_queue.get_nowait())
+                    for fut in finished:
+                        try:
+                            result = fut.result()
+                        except Cancelled:
+                            continue
+                        _done(futs[fut], result)
+                        report(progress, n_done, n_pages, "page")
+                    if is_cancelled(cancel):
+                        # worker ที่กำลังทำหน้าอยู่หยุดที่ขั้นตอนถัดไป; หน้าที่เสร็จแล้วถูกเก็บไว้ด้านบน ที่เหลือไม่รอ
+                        cancel_event.set()
+                        break
+            finally:
+                if is_cancelled(cancel):
+                    # ไม่รอ worker ที่กำลังหยุด; Manager ต้องอยู่จนกว่า worker จะเลิกใช้ธง/Queue
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    threading.Thread(target=_close_pool, args=(ex, mgr), name="pool-close", daemon=True).start()
+                else:
+                    _close_pool(ex, mgr)
+        else:
+            for page_index in todo:
+                if is_cancelled(cancel):
+                    break
+                page = doc.load_page(page_index)
+                try:
+                    _done(page_index, _extract_page_items(
+                        page, **_page_opts(page_index), cancel=cancel, collect_stats=collect_stats,
+                        ocr_cache=ocr_db, on_stage=lambda st: report(progress, n_done, n_pages, st)))
+                except Cancelled:
+                    break
+                report(progress, n_done, n_pages, "page")
 
-            for it in page_items:
-                it.pop("bbox", None)
-            all_pages.append(page_items)
+        if is_cancelled(cancel):
+            logging.info("Extraction cancelled: %d/%d pages done", n_done, n_pages)
+            for page_index in range(n_pages):
+                if all_pages[page_index] is None:
+                    all_pages[page_index] = []
+                    triages[page_index] = {"cancelled": True}
 
-        return all_pages 
+        # เลขหน้า (1-based) ใส่หลังโหลดจาก cache ด้วย เพราะ key เป็น hash เนื้อหา ไม่ผูกกับตำแหน่งหน้า
+        for page_index, page_items in enumerate(all_pages):
+            for it in page_items:
+                it["page_no"] = page_index + 1
+
+        counts = {"skip": 0, "fast": 0, "full": 0}
+        for t in triages:
+            d = (t or {}).get("decision")
+            if d in counts:
+                counts[d] += 1
+        logging.info("OCR triage: skip=%d fast=%d (escalated %d) full=%d",
+                     counts["skip"], counts["fast"],
+                     sum(1 for t in triages if t and t.get("escalated")), counts["full"])
+        if triage_log is not None:
+            for page_index, t in enumerate(triages):
+                triage_log.append(dict(t or {}, page_no=page_index + 1))
+
+        if stats is None:
+            return all_pages
+        stats.wall_s = time.perf_counter() - t_start
+        if stats_jsonl:
+            try:
+                stats.write_jsonl(stats_jsonl)
+            except Exception as e:
+                logging.warning(f"Cannot write extraction stats ({stats_jsonl}): {e}")
+        return (all_pages, stats) if with_stats else all_pages
     except Exception as e:
 
         raise
     finally:
-        try:
-            doc.close()
-        except Exception:
-            pass
+        if session is not None:
+            session.lock.release()
+        else:
+            try:
+                doc.close()
+            except Exception:
+                pass
+        if cache is not None:
+            cache.close()
+        if ocr_db is not None:
+            c = ocr_db.counters()
+            if c["hits"] or c["misses"]:
+                logging.info("OCR cache: %d hits / %d misses", c["hits"], c["misses"])
+            ocr_db.close()
 
 def extract_product_info_by_page(pages, size_threshold=1.6):
     product_infos = []
@@ -0,0 +1,88 @@
+import os
+import logging
+import threading
+
+import fitz
+
+
+# ไฟล์ที่ใหญ่กว่านี้ไม่อ่านเข้าหน่วยความจำทั้งก้อน: เปิดจาก path ให้ MuPDF อ่านเฉพาะส่วนที่ใช้
+# (PyMuPDF คัดลอก stream ทุกชนิดเป็น bytes อยู่แล้ว mmap จึงไม่ช่วยลดหน่วยความจำ)
+SESSION_MAX_INMEMORY_BYTES = 512 * 1024 * 1024
+
+
+class PdfSession:
+    """
+    PDF หนึ่งไฟล์ต่อหนึ่งงาน: อ่านไฟล์จากดิสก์/network share ครั้งเดียว แล้วใช้ร่วมกันระหว่าง
+    part-code detection, extract_text_by_page และ PDFViewer
+
+    - data            → ไบต์ของไฟล์ (None ถ้าไฟล์ใหญ่เกิน SESSION_MAX_INMEMORY_BYTES)
+    - source          → data หรือ path (ส่งให้ process pool เปิดเอกสารเองโดยไม่อ่านไฟล์ซ้ำ)
+    - doc             → fitz.Document ของ session; ใช้ภายใต้ lock เพราะ MuPDF ไม่ thread-safe
+    - open_document() → Document ใหม่จากไบต์ชุดเดิม สำหรับ thread อื่น (เช่น viewer บน GUI thread)
+    - page_text(i)    → get_text("text") ของหน้า (อ่านครั้งเดียวแล้วแคช)
+    """
+    def __init__(self, pdf_path):
+        self.path = pdf_path
+        self.size = os.path.getsize(pdf_path)
+        self.data = None
+        if self.size <= SESSION_MAX_INMEMORY_BYTES:
+            with open(pdf_path, "rb") as f:
+                self.data = f.read()
+        else:
+            logging.info(f"PdfSession: {self.size / 1e6:.0f} MB file opened by path (not loaded into memory)")
+        self.lock = threading.RLock()
+        self._doc = None
+        self._texts = {}
+
+    @property
+    def source(self):
+        return self.data if self.data is not None else self.path
+
+    def open_document(self):
+        if self.data is not None:
+            return fitz.open(stream=self.data, filetype="pdf")
+        return fitz.open(self.path)
+
+    @property
+    def doc(self):
+        with self.lock:
+            if self._doc is None:
+                self._doc = self.open_document()
+            return self._doc
+
+    @property
+    def page_count(self):
+        with self.lock:
+            return len(self.doc)
+
+    def page_text(self, page_index):
+        with self.lock:
+            txt = self._texts.get(page_index)
+            if txt is None:
+                txt = self.doc.load_page(page_index).get_text("text") or ""
+                self._texts[page_index] = txt
+            return txt
+
+    def close(self):
+        with self.lock:
+            if self._doc is not None:
+                try:
+                    self._doc.close()
+                except Exception:
+                    pass
+                self._doc = None
+            self._texts.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_pdf_source(source):
+    """เปิด Document จาก path หรือไบต์ (PdfSession.source)"""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
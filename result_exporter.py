@@ -13,6 +13,9 @@ def export_result_to_excel(results, output_path="output/result.xlsx"):
     else:
         raise ValueError("❌ Invalid result format. Must be list or DataFrame.")
 
+    # หลักฐานตำแหน่ง (page/bbox) ใช้เฉพาะพรีวิวในแอป ไม่ต้องลง Excel
+    df = df.drop(columns=["__Evidence__"], errors="ignore")
+
     def _norm_cell(v):
         if v is None:
             return "-"
@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import extract_stats
+
+
+def test_concurrent_page_scopes_do_not_mix():
+    barrier = threading.Barrier(2)
+    out = {}
+
+    def _job(name, n):
+        with extract_stats.page_scope(1) as ps:
+            barrier.wait()
+            for _ in range(n):
+                extract_stats.count("calls")
+            barrier.wait()
+        out[name] = ps.counters.get("calls")
+
+    threads = [threading.Thread(target=_job, args=("a", 3)), threading.Thread(target=_job, args=("b", 5))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert out == {"a": 3, "b": 5}
+    assert not extract_stats.enabled()
+
+
+def test_bind_records_worker_threads_into_page():
+    with extract_stats.page_scope(1) as ps:
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            list(ex.map(extract_stats.bind(lambda _: extract_stats.count("ocr")), range(4)))
+    assert ps.counters == {"ocr": 4}
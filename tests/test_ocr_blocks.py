@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+import pdf_reader
+from page_items import PageItem
+
+
+def _line(text, bbox, block_bbox=None, size_mm=2.0):
+    it = PageItem({"text": text, "bbox": bbox, "source": "ocr", "level": "line", "size_mm": size_mm})
+    if block_bbox is not None:
+        it["block_bbox"] = block_bbox
+    return it
+
+
+def test_block_meta_built_once_from_final_lines():
+    blk = (10.0, 10.0, 200.0, 40.0)
+    items = [
+        _line("KEEP OUT OF REACH", (10, 10, 200, 22), blk),
+        _line("OF CHILDREN", (10, 26, 120, 40), blk, size_mm=2.5),
+        _line("SINGLE", (10, 60, 60, 70)),
+        PageItem({"text": "OF", "bbox": (10, 26, 30, 40), "source": "ocr"}),
+    ]
+    items[1]["text"] = "OF CHILDREN."   # บรรทัดที่ยกระดับแล้ว
+
+    blocks = pdf_reader._ocr_block_meta(items)
+
+    assert blocks == [{"text": "KEEP OUT OF REACH OF CHILDREN.", "bbox": list(blk),
+                       "size_mm": 2.5, "underline": False, "lines": 2}]
+    assert not any("block_bbox" in it for it in items)
+
+
+def test_checklist_reads_blocks_from_page_meta():
+    checklist_loader = pytest.importorskip("checklist_loader")
+    meta = {"ocr_blocks": [{"text": "A B", "bbox": [1, 2, 3, 4], "size_mm": 2.0,
+                            "underline": True, "lines": 2}]}
+    (blk,) = checklist_loader._ocr_block_items(meta, 3)
+    assert (blk["text"], blk["bbox"], blk["level"], blk["page_no"]) == ("A B", (1, 2, 3, 4), "block", 3)
+    assert checklist_loader._ocr_block_items(None, 1) == []
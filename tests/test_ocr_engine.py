@@ -0,0 +1,54 @@
+import types
+
+import ocr_engine
+
+
+class _FakeApi:
+    inits = 0
+
+    def __init__(self, lang, oem, psm):
+        type(self).inits += 1
+        self.vars = {}
+
+    def GetVariableAsString(self, k):
+        return self.vars.get(k)
+
+    def SetVariable(self, k, v):
+        self.vars[k] = v
+
+    def SetImage(self, img):
+        pass
+
+    def Recognize(self, timeout_ms):
+        return True
+
+    def GetIterator(self):
+        return None
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        pass
+
+
+class _FakeImage:
+    size = (40, 20)
+
+
+def test_tesserocr_engine_reused_for_same_lang_oem_psm(monkeypatch):
+    _FakeApi.inits = 0
+    fake = types.SimpleNamespace(iterate_level=lambda ri, level: [])
+    monkeypatch.setattr(ocr_engine, "tesserocr", fake)
+    monkeypatch.setattr(ocr_engine, "PyTessBaseAPI", _FakeApi, raising=False)
+    monkeypatch.setattr(ocr_engine, "RIL", types.SimpleNamespace(WORD=3), raising=False)
+    monkeypatch.setattr(ocr_engine, "_BACKEND", "tesserocr")
+    pool = ocr_engine._EnginePool()
+    monkeypatch.setattr(ocr_engine, "_POOL", pool)
+
+    for _ in range(3):
+        data = ocr_engine.image_to_data(_FakeImage(), lang="eng", config="--oem 1 --psm 6")
+        assert data["width"] == [40]
+
+    assert _FakeApi.inits == 1
+    assert list(pool._idle) == [("eng", 1, 6)]
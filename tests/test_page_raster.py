@@ -0,0 +1,53 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+import ocr_engine
+import pdf_reader
+
+
+@pytest.fixture
+def page():
+    doc = fitz.open()
+    pg = doc.new_page(width=300, height=200)
+    pg.insert_text((40, 100), "LARGE 3+", fontsize=40)
+    yield pg
+    doc.close()
+
+
+@pytest.fixture
+def render_zooms(monkeypatch):
+    zooms = []
+    real = pdf_reader._render_page_to_pil
+
+    def _render(page, zoom=2.0, clip=None):
+        zooms.append(round(float(zoom), 3))
+        return real(page, zoom=zoom, clip=clip)
+
+    monkeypatch.setattr(pdf_reader, "_render_page_to_pil", _render)
+    return zooms
+
+
+def test_low_zoom_renders_at_that_zoom(page, render_zooms):
+    raster = pdf_reader._PageRaster(page, max_zoom=4.0)
+    h, w = raster.rgb(2.0).shape[:2]
+    assert render_zooms == [2.0]
+    assert (w, h) == (600, 400)
+
+
+def test_lower_zoom_downsampled_from_rendered_one(page, render_zooms):
+    raster = pdf_reader._PageRaster(page, max_zoom=4.0)
+    raster.rgb(3.0)
+    raster.rgb(1.5)
+    assert render_zooms == [3.0]
+
+
+def test_region_ocr_renders_at_estimated_zoom(page, render_zooms, monkeypatch):
+    monkeypatch.setattr(ocr_engine, "available", lambda: True)
+    monkeypatch.setattr(pdf_reader, "_run_ocr", lambda *a, **k: None)
+    pdf_reader._ocr_extract_items(page, ocr_lang="eng", configs=["--oem 3 --psm 6"],
+                                  regions=[fitz.Rect(30, 50, 280, 120)], region_zooms=[[1.5]])
+    assert render_zooms and set(render_zooms) == {1.5}
@@ -0,0 +1,49 @@
+import multiprocessing
+import time
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import pdf_reader
+from job_control import CancelToken
+
+
+def _endless_page(page, raster, enable_ocr, ocr_only_suspect_pages, ocr_lang_fast, ocr_lang_full, stage,
+                  *rest):
+    # หน้าที่ไม่มีวันเสร็จเอง: จบได้ทางเดียวคือ stage() raise Cancelled
+    stage("text layer")
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        stage("OCR fast")
+        time.sleep(0.05)
+    return [], {"decision": "skip", "reasons": [], "features": {}}
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="patched page pipeline reaches workers only with fork")
+def test_pool_cancel_interrupts_page_in_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_reader, "_extract_page_items_impl", _endless_page)
+    doc = fitz.open()
+    for _ in range(4):
+        doc.new_page()
+    path = str(tmp_path / "pages.pdf")
+    doc.save(path)
+    doc.close()
+
+    token = CancelToken()
+    stages = []
+
+    def _progress(done, total, stage):
+        stages.append(stage)
+        if stage == "OCR fast":
+            token.cancel()
+
+    triage = []
+    t0 = time.time()
+    pages = pdf_reader.extract_text_by_page(path, workers=2, progress=_progress, cancel=token,
+                                            triage_log=triage)
+    assert time.time() - t0 < 15
+    assert "OCR fast" in stages
+    assert pages == [[], [], [], []]
+    assert all(t.get("cancelled") for t in triage)
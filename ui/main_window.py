@@ -9,11 +9,13 @@ from PyQt5.QtCore import Qt, QUrl
 from PyQt5 import QtWidgets, QtGui, QtCore
 from ui.pdf_viewer import PdfPreviewWindow
 from checklist_loader import load_checklist, start_check, extract_part_code_from_pdf
+from pdf_session import PdfSession
 from pdf_reader import extract_text_by_page
 from checker import check_term_in_page
 from result_exporter import export_result_to_excel
 from PyQt5.QtGui import QColor, QIcon, QPixmap, QDesktopServices
 from pdf_reader import extract_product_info_by_page
+from job_control import CancelToken
 from collections import defaultdict
 
 
@@ -50,6 +52,12 @@ PART_OCR_MAP_FULL = {
     "DC1": "eng+fra+deu+ita+nld+spa+por+pol+ces+hun+jpn",
 }
 
+# จำนวน process สำหรับแยกหน้า PDF ไป OCR พร้อมกัน (เว้นไว้ 1 core ให้ UI)
+PDF_EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# cache ผล extract ต่อหน้า (ล้างได้ด้วย extract_cache.clear_page_cache(PAGE_CACHE_DIR))
+PAGE_CACHE_DIR = os.path.join("cache", "pages")
+
 # ==== UI-only: hide entire SPW/SPG group if the whole group is "Not Found" (robust by Requirement) ====
 def _hide_empty_sp_group_ui(df):
     """
@@ -176,15 +184,24 @@ def _get_ocr_langs_for_part(part_code: str):
 class _PdfWorker(QtCore.QThread):
     finished = QtCore.pyqtSignal(list, list) 
     error = QtCore.pyqtSignal(str)
+    progress = QtCore.pyqtSignal(int, int, str)   # หน้าที่เสร็จ, จำนวนหน้า, ขั้นตอน
 
     def __init__(self, path):
         super().__init__()
         self.path = path
+        self.session = None
+        self.page_meta = []   # triage_log ต่อหน้า (รวมบล็อก OCR) ส่งต่อให้ start_check
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
 
     def run(self):
         try:
+            # อ่านไฟล์ครั้งเดียว แล้วใช้ร่วมกันทั้ง part code, extraction, checklist และ viewer
+            self.session = PdfSession(self.path)
             try:
-                codes = extract_part_code_from_pdf(self.path) or []
+                codes = extract_part_code_from_pdf(self.path, session=self.session) or []
             except Exception:
                 codes = []
             part_code = (codes[0] if codes else getattr(self, "part_code", "")) or ""
@@ -196,24 +213,38 @@ class _PdfWorker(QtCore.QThread):
                 enable_ocr=True,
                 ocr_only_suspect_pages=True,   
                 ocr_lang_fast=fast_lang,        
-                ocr_lang_full=full_lang         
+                ocr_lang_full=full_lang,
+                workers=PDF_EXTRACT_WORKERS,
+                cache_dir=PAGE_CACHE_DIR,
+                progress=self.progress.emit,
+                cancel=self.cancel_token,
+                session=self.session,
+                triage_log=self.page_meta
             )
             infos = extract_product_info_by_page(pages)
             self.finished.emit(pages, infos)
 
         except Exception as e:
-            self.finished.emit([], {"error": str(e)})
+            # session ส่งต่อให้ viewer เฉพาะเมื่อสำเร็จ → ล้มเหลวต้องปิดเอง (Document + ไบต์ของไฟล์ทั้งก้อน)
+            self.close_session()
+            self.error.emit(str(e))
+
+    def close_session(self):
+        session, self.session = self.session, None
+        if session is not None:
+            session.close()
 
 class _ExcelWorker(QtCore.QThread):
     finished = QtCore.pyqtSignal(object)     
     error = QtCore.pyqtSignal(str)
-    def __init__(self, path: str, pdf_basename: str):
+    def __init__(self, path: str, pdf_basename: str, session=None):
         super().__init__()
         self.path = path
         self.pdf_basename = pdf_basename
+        self.session = session
     def run(self):
         try:
-            df = load_checklist(self.path, self.pdf_basename)
+            df = load_checklist(self.path, self.pdf_basename, session=self.session)
             self.finished.emit(df)
         except Exception as e:
             self.error.emit(str(e))
@@ -221,13 +252,19 @@ class _ExcelWorker(QtCore.QThread):
 class _CheckWorker(QtCore.QThread):
     finished = QtCore.pyqtSignal(object)
     error = QtCore.pyqtSignal(str)
-    def __init__(self, df_checklist, pages):
+    progress = QtCore.pyqtSignal(int, int, str)   # แถวที่เสร็จ, จำนวนแถว, ขั้นตอน
+    def __init__(self, df_checklist, pages, page_meta=None):
         super().__init__()
         self.df_checklist = df_checklist
         self.pages = pages
+        self.page_meta = page_meta
+        self.cancel_token = CancelToken()
+    def cancel(self):
+        self.cancel_token.cancel()
     def run(self):
         try:
-            res = start_check(self.df_checklist, self.pages)
+            res = start_check(self.df_checklist, self.pages,
+                              progress=self.progress.emit, cancel=self.cancel_token, page_meta=self.page_meta)
             self.finished.emit(res)
         except Exception as e:
             self.error.emit(str(e))
@@ -271,8 +308,10 @@ class DSOApp(QtWidgets.QWidget):
 
         self.excel_path = ""
         self.pdf_path = ""
+        self.pdf_session = None
         self.checklist_df = None
         self.pages = None
+        self.page_meta = None
         self.result_df = None
         self.product_infos = []
         self._image_cache = {}
@@ -358,6 +397,20 @@ class DSOApp(QtWidgets.QWidget):
         action_layout.addWidget(self.preview_btn)
         action_layout.addStretch()
 
+        # Progress + Cancel (ซ่อนไว้จนกว่าจะมีงานทำอยู่)
+        progress_layout = QtWidgets.QHBoxLayout()
+        self.progress_label = QtWidgets.QLabel("")
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self._cancel_job)
+        progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.cancel_btn)
+        self._active_worker = None
+        self._progress_unit = ""
+        self._set_progress_visible(False)
+
         # Add to layout
         layout.addLayout(file_layout)
         layout.addWidget(self.pdf_label)
@@ -365,8 +418,49 @@ class DSOApp(QtWidgets.QWidget):
         layout.addLayout(search_layout)
         layout.addWidget(self.result_table)
         layout.addLayout(action_layout)
+        layout.addLayout(progress_layout)
         self.setLayout(layout)
 
+    def _set_progress_visible(self, visible):
+        for w in (self.progress_label, self.progress_bar, self.cancel_btn):
+            w.setVisible(visible)
+
+    def _begin_progress(self, worker, title, unit, cancellable=True):
+        """แสดง progress ของ worker; unit = "Page"/"Row" ใช้ในข้อความ"""
+        self._active_worker = worker
+        self._progress_unit = unit
+        self.progress_label.setText(title)
+        self.progress_bar.setRange(0, 0)   # ไม่ทราบจำนวน → แถบวิ่ง จนกว่าจะได้ progress แรก
+        self.cancel_btn.setEnabled(cancellable)
+        self.cancel_btn.setVisible(cancellable)
+        self.progress_label.setVisible(True)
+        self.progress_bar.setVisible(True)
+        if hasattr(worker, "progress"):
+            worker.progress.connect(self._on_progress)
+
+    def _on_progress(self, done, total, stage):
+        if total <= 0:
+            return
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(min(done, total))
+        current = min(done + 1, total)
+        self.progress_bar.setFormat(f"{self._progress_unit} {current}/{total} — {stage}")
+
+    def _end_progress(self):
+        self._active_worker = None
+        self._set_progress_visible(False)
+
+    def _cancel_job(self):
+        w = self._active_worker
+        if w is not None and hasattr(w, "cancel"):
+            w.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText("Cancelling…")
+
+    def _was_cancelled(self, worker):
+        tok = getattr(worker, "cancel_token", None)
+        return tok is not None and tok.cancelled
+
     def eventFilter(self, source, event):
         if source == self.result_table.viewport() and event.type() == QtCore.QEvent.MouseMove:
             index = self.result_table.indexAt(event.pos())
@@ -694,15 +788,27 @@ class DSOApp(QtWidgets.QWidget):
         self.check_btn.setEnabled(False)
 
         self._pdf_worker = _PdfWorker(self.pdf_path)
+        self._begin_progress(self._pdf_worker, "Reading PDF", "Page")
 
         def _ok(pages, infos):
+            cancelled = self._was_cancelled(self._pdf_worker)
+            self._end_progress()
+            self._set_pdf_session(self._pdf_worker.session)
             self.pages = pages
+            self.page_meta = self._pdf_worker.page_meta
             self.product_infos = infos or []
+            if cancelled:
+                n_done = sum(1 for p in (pages or []) if p)
+                QtWidgets.QMessageBox.information(
+                    self, "Cancelled",
+                    f"PDF reading was cancelled. Using the {n_done} page(s) read so far.")
             self.pdf_btn.setEnabled(True)
             self.excel_btn.setEnabled(True)
             self.check_btn.setEnabled(bool(self.checklist_df))
 
         def _err(msg):
+            self._end_progress()
+            self._pdf_worker.close_session()
             QtWidgets.QMessageBox.critical(self, "PDF Error", msg)
             self.pdf_btn.setEnabled(True)
             self.excel_btn.setEnabled(True)
@@ -712,6 +818,13 @@ class DSOApp(QtWidgets.QWidget):
         self._pdf_worker.error.connect(_err)
         self._pdf_worker.start()
 
+    def _set_pdf_session(self, session):
+        """เปลี่ยน PdfSession ของไฟล์ปัจจุบัน (ปิดของไฟล์ก่อน; viewer ที่เปิดอยู่มี Document ของตัวเอง)"""
+        old = self.pdf_session
+        self.pdf_session = session
+        if old is not None and old is not session:
+            old.close()
+
     def load_excel(self):
         if not getattr(self, "pdf_path", None):
             QtWidgets.QMessageBox.warning(self, "PDF Required", "Please upload a PDF file first.")
@@ -728,15 +841,19 @@ class DSOApp(QtWidgets.QWidget):
         self.excel_btn.setEnabled(False)
         self.check_btn.setEnabled(False)
 
-        self._excel_worker = _ExcelWorker(self.excel_path, os.path.basename(self.pdf_path))
+        self._excel_worker = _ExcelWorker(self.excel_path, os.path.basename(self.pdf_path),
+                                          session=self.pdf_session)
+        self._begin_progress(self._excel_worker, "Loading checklist", "Row", cancellable=False)
 
         def _ok(df):
+            self._end_progress()
             self.checklist_df = df
             self.pdf_btn.setEnabled(True)
             self.excel_btn.setEnabled(True)
             self.check_btn.setEnabled(bool(self.pages))
 
         def _err(msg):
+            self._end_progress()
             QtWidgets.QMessageBox.critical(self, "Checklist Load Error", msg)
             self.pdf_btn.setEnabled(True)
             self.excel_btn.setEnabled(True)
@@ -754,9 +871,15 @@ class DSOApp(QtWidgets.QWidget):
         self.check_btn.setEnabled(False)
         self.export_btn.setEnabled(False)
 
-        self._check_worker = _CheckWorker(self.checklist_df, self.pages)
+        self._check_worker = _CheckWorker(self.checklist_df, self.pages, self.page_meta)
+        self._begin_progress(self._check_worker, "Checking", "Row")
 
         def _ok(df):
+            cancelled = self._was_cancelled(self._check_worker)
+            self._end_progress()
+            if cancelled:
+                QtWidgets.QMessageBox.information(
+                    self, "Cancelled", "Checking was cancelled. Showing results for the rows checked so far.")
             self.result_df = df
             if not isinstance(self.result_df, pd.DataFrame) or self.result_df.empty:
                 QtWidgets.QMessageBox.information(self, "No Result", "No matching terms found.")
@@ -766,6 +889,7 @@ class DSOApp(QtWidgets.QWidget):
             self.export_btn.setEnabled(True)
 
         def _err(msg):
+            self._end_progress()
             QtWidgets.QMessageBox.critical(self, "Check Error", msg)
             self.check_btn.setEnabled(True)
             self.export_btn.setEnabled(True)
@@ -805,7 +929,7 @@ class DSOApp(QtWidgets.QWidget):
 
         # คอลัมน์ภายในที่ต้องซ่อนจาก UI
         internal_hide = {
-            "__Term_HTML__", "Image_Groups_Resolved", "Image_Groups",
+            "__Term_HTML__", "__Evidence__", "Image_Groups_Resolved", "Image_Groups",
             "Image Path Resolved", "Image Path", "_HasImage", "Language List"
         }
 
@@ -1412,6 +1536,7 @@ class DSOApp(QtWidgets.QWidget):
         col_found = "Found" if "Found" in cols else None
         col_ver   = "Verification" if "Verification" in cols else None
         col_pages = "Pages" if "Pages" in cols else None
+        col_ev    = "__Evidence__" if "__Evidence__" in cols else None
 
         if not (col_sym and col_found):
             QtWidgets.QMessageBox.information(self, "Preview PDF", "ไม่พบคอลัมน์ที่จำเป็น (Symbol/Exact wording, Found)")
@@ -1425,6 +1550,7 @@ class DSOApp(QtWidgets.QWidget):
             found  = str(row.get(col_found, "") or "")
             ver    = str(row.get(col_ver, "") or "").strip().lower() if col_ver else ""
             pages  = str(row.get(col_pages, "") or "") if col_pages else ""
+            evidence = row.get(col_ev) if col_ev else None
 
             # --- สถานะ + หน้าที่ใช้จริงในพรีวิว ---
             is_found = found.strip().startswith("✅")
@@ -1445,6 +1571,8 @@ class DSOApp(QtWidgets.QWidget):
                 "symbol": symbol,
                 "status": status,
                 "pages_spec": pages_spec,
+                # ตำแหน่งที่ start_check เจอจริง → viewer วาดไฮไลท์ได้เลยไม่ต้อง search
+                "evidence": list(evidence) if (status == "found" and isinstance(evidence, (list, tuple))) else [],
             })
 
         # ==== PRUNE rows: อย่าให้ SPW (สั้น) ที่ Not Found หลุดไปไฮไลท์ เมื่อมี SPG (Found) อยู่แล้ว ====
@@ -1489,7 +1617,8 @@ class DSOApp(QtWidgets.QWidget):
         self._pdf_preview_win = None
 
         # เปิดหน้าต่างพรีวิวแบบ top-level ที่ย่อ/ขยายได้
-        self._pdf_preview_win = PdfPreviewWindow(pdf_path=self.pdf_path, rows=rows, parent=None)
+        self._pdf_preview_win = PdfPreviewWindow(pdf_path=self.pdf_path, rows=rows, parent=None,
+                                                session=self.pdf_session)
         self._pdf_preview_win.destroyed.connect(lambda: setattr(self, "_pdf_preview_win", None))
         self._pdf_preview_win.show()
         self._pdf_preview_win.activateWindow()
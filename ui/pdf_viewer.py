@@ -154,10 +154,13 @@ class PDFViewer(QWidget):
                  pdf_path: str,
                  rows: List[Dict],
                  parent: Optional[QWidget] = None,
-                 lru_capacity: int = DEFAULT_LRU_CAPACITY):
+                 lru_capacity: int = DEFAULT_LRU_CAPACITY,
+                 session=None):
         super().__init__(parent)
         self.pdf_path = pdf_path
-        self.doc = fitz.open(self.pdf_path)
+        # session (pdf_session.PdfSession) → เปิดจากไบต์ที่โหลดไว้แล้ว ไม่อ่านไฟล์ซ้ำ
+        # Document แยกของ viewer เอง เพราะ session.doc อาจถูกใช้อยู่ใน worker thread
+        self.doc = session.open_document() if session is not None else fitz.open(self.pdf_path)
         self.page_count = len(self.doc)
         self.current_page = 0
         self.zoom = 1.75 
@@ -440,13 +443,26 @@ class PDFViewer(QWidget):
                 out.append(r)
         return out
 
-    def _active_terms_for_page(self, page_no: int) -> List[str]:
+    def _selected_rows_for_page(self, page_no: int) -> List[Dict]:
         rows = self._active_rows_for_page(page_no)
         if self.selected_row_id is not None:
             rows = [r for r in rows if r.get("id") == self.selected_row_id]
+        return rows
+
+    @staticmethod
+    def _row_evidence_on_page(r: Dict, page_no: int) -> List[Dict]:
+        # evidence.page เริ่มที่ 1 ส่วน page_no ของ viewer เริ่มที่ 0
+        return [e for e in (r.get("evidence") or [])
+                if e.get("page") == page_no + 1 and e.get("bbox")]
+
+    def _active_terms_for_page(self, page_no: int) -> List[str]:
+        rows = self._selected_rows_for_page(page_no)
 
         raw_terms: List[str] = []
         for r in rows:
+            # แถวที่มีหลักฐานตำแหน่งบนหน้านี้แล้วไม่ต้อง search ซ้ำ
+            if self._row_evidence_on_page(r, page_no):
+                continue
             raw_terms.extend(build_terms_from_symbol(r.get("symbol", "")))
 
         # --- SPW prefix suppression when the page is SPG-only, only in Filter=All ---
@@ -501,6 +517,29 @@ class PDFViewer(QWidget):
         except Exception:
             return []
 
+    def _evidence_for_page(self, page_no: int) -> List[fitz.Rect]:
+        """กรอบจากหลักฐานของ start_check (page + bbox) ไม่ต้อง search ตอน render"""
+        rects: List[fitz.Rect] = []
+        for r in self._selected_rows_for_page(page_no):
+            for e in self._row_evidence_on_page(r, page_no):
+                try:
+                    rect = fitz.Rect(e["bbox"])
+                except Exception:
+                    continue
+                if rect.is_empty:
+                    continue
+                # item ระดับ span กับ line ซ้อนกัน → เก็บกรอบที่ไม่ทับของเดิมเกินครึ่ง
+                overlapped = False
+                for k in rects:
+                    inter = fitz.Rect(rect) & k
+                    small = min(abs(rect), abs(k))
+                    if not inter.is_empty and small > 0 and abs(inter) >= 0.5 * small:
+                        overlapped = True
+                        break
+                if not overlapped:
+                    rects.append(rect)
+        return rects
+
     def _hits_for_page(self, page_no: int, terms: List[str]) -> List[fitz.Rect]:
         cache = self._get_cache(page_no)
         page = self.doc.load_page(page_no)
@@ -741,8 +780,10 @@ class PDFViewer(QWidget):
             self.scene.setSceneRect(QRectF(pixmap.rect()))
 
             # ไฮไลท์ terms (เหลืองโปร่ง)
+            rects = self._evidence_for_page(self.current_page)
             terms = self._active_terms_for_page(self.current_page)
-            rects = self._hits_for_page(self.current_page, terms) if terms else []
+            if terms:
+                rects += self._hits_for_page(self.current_page, terms)
             if rects:
                 pen = QPen(Qt.NoPen)
                 brush = QBrush(QColor(255, 235, 59, HIGHLIGHT_ALPHA))
@@ -784,12 +825,12 @@ class PDFViewer(QWidget):
 
 # ------------------------------ Top-level Window ------------------------------
 class PdfPreviewWindow(QMainWindow):
-    def __init__(self, pdf_path: str, rows: list, parent=None):
+    def __init__(self, pdf_path: str, rows: list, parent=None, session=None):
         super().__init__(parent)
         self.setWindowTitle("Preview PDF")
         self.setAttribute(Qt.WA_DeleteOnClose, True)
         self.resize(1200, 820)
-        self.viewer = PDFViewer(pdf_path=pdf_path, rows=rows, parent=None)
+        self.viewer = PDFViewer(pdf_path=pdf_path, rows=rows, parent=None, session=session)
         self.setCentralWidget(self.viewer)
 
         QShortcut(QKeySequence.ZoomIn,  self, activated=lambda: self.viewer.user_zoom(1.1))